@@ -4,11 +4,63 @@ __all__ = [
     "MosaicStitch",
     "MosaicTile",
     "read_mrms",
+    "read_points",
     "unzip",
     "extract",
 ]
-from . import extract
-from .io import read_mrms, unzip
-from ._mmmpy import MosaicDisplay, MosaicGrib, MosaicStitch, MosaicTile
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from . import extract
+    from .io import read_mrms, read_points, unzip
+    from ._mmmpy import MosaicGrib, MosaicStitch, MosaicTile
+    from .display import MosaicDisplay
 
 __version__ = "2.0.0"
+
+# attributes are imported on first access (PEP 562), so `import mmmpy` does
+# not pull in xarray, pandas, matplotlib or Basemap until they are needed
+LAZY_ATTRIBUTES = {
+    "read_mrms": ".io",
+    "read_points": ".io",
+    "unzip": ".io",
+    "MosaicDisplay": ".display",
+    "MosaicGrib": "._mmmpy",
+    "MosaicStitch": "._mmmpy",
+    "MosaicTile": "._mmmpy",
+}
+LAZY_MODULES = {
+    "animate",
+    "backends",
+    "binary",
+    "cache",
+    "constants",
+    "core",
+    "decorator",
+    "display",
+    "extract",
+    "io",
+    "overview",
+    "regions",
+    "sample",
+    "scratch",
+    "sniff",
+}
+
+
+def __getattr__(name: str):
+    if name in LAZY_ATTRIBUTES:
+        module = importlib.import_module(LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+    elif name in LAZY_MODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # cache it, later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__) | LAZY_MODULES)
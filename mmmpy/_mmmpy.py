@@ -30,14 +30,17 @@ import mmmpy
 
 Notes
 -----
-Dependencies: numpy, time, os, matplotlib, Basemap, struct,
-calendar, gzip, netCDF4, six, __future__, datetime
-Optional: pygrib
+Dependencies: numpy, time, os, struct, calendar, gzip, netCDF4, six,
+__future__, datetime
+Optional: pygrib, and matplotlib & Basemap for plotting. MosaicDisplay lives
+in mmmpy.display and is only imported when it is first used, so reading,
+stitching and writing mosaics never loads the plotting stack.
 """
 
 from __future__ import absolute_import, division, print_function
 
 import calendar
+import copy
 import datetime
 import gzip
 import os
@@ -46,10 +49,13 @@ from struct import unpack
 
 import numpy as np
 import six
-from matplotlib import pyplot as plt
-from mpl_toolkits.basemap import Basemap, cm
 from netCDF4 import Dataset
 
+from .binary import construct_dtype, open_binary
+from .overview import max_pool, mean_pool
+from .sample import Grid, cross_section, point_weights
+from .sniff import sniff
+
 try:
     import pygrib
 
@@ -66,7 +72,6 @@ DEFAULT_VAR_LABEL = "Reflectivity (dBZ)"
 V1_DURATION = 300.0  # seconds
 V2_DURATION = 120.0  # seconds
 ALTITUDE_SCALE_FACTOR = 1000.0  # Divide meters by this to get something else
-DEFAULT_CMAP = cm.GMT_wysiwyg
 DEFAULT_PARALLELS = 10  # [20, 37.5, 40, 55]
 DEFAULT_MERIDIANS = 10  # [230, 250, 265, 270, 280, 300]
 HORIZONTAL_PLOT = [0.1, 0.1, 0.8, 0.8]
@@ -180,26 +185,29 @@ class MosaicTile(object):
                 lonrange=lonrange,
             )
         else:
+            # Dispatch on the leading bytes rather than trying each reader
             try:
-                flag = self.read_mosaic_binary(filename, verbose=verbose)
-                if not flag:
-                    flag = self.read_mosaic_netcdf(filename, verbose=verbose)
-                    if not flag:
-                        try:
-                            self.read_mosaic_grib(
-                                [filename],
-                                verbose=verbose,
-                                wgrib2_path=wgrib2_path,
-                                keep_nc=keep_nc,
-                                wgrib2_name=wgrib2_name,
-                                nc_path=nc_path,
-                                latrange=latrange,
-                                lonrange=lonrange,
-                            )
-                        except:
-                            print("Unknown file format, nothing read")
+                engine, compression = sniff(filename)
             except:
                 print("No valid filename provided")
+                return
+            if engine == "binary" and compression != "zip":
+                self.read_mosaic_binary(filename, verbose=verbose)
+            elif engine == "netcdf4" and compression is None:
+                self.read_mosaic_netcdf(filename, verbose=verbose)
+            elif engine == "cfgrib" and compression != "zip":
+                self.read_mosaic_grib(
+                    [filename],
+                    verbose=verbose,
+                    wgrib2_path=wgrib2_path,
+                    keep_nc=keep_nc,
+                    wgrib2_name=wgrib2_name,
+                    nc_path=nc_path,
+                    latrange=latrange,
+                    lonrange=lonrange,
+                )
+            else:
+                print("Unknown file format, nothing read")
 
     def help(self):
         """Basic printout of module capabilities"""
@@ -210,7 +218,8 @@ class MosaicTile(object):
         print("    read_mosaic_binary(<FILE>):")
         print("    read_mosaic_grib(<FILE(S)>):")
         print("Other available methods:")
-        print("diag(), get_comp(),")
+        print("diag(), get_comp(), get_overview(), get_cross_section(),")
+        print("sample_points(), get_exceedance(),")
         print("subsection(), write_mosaic_binary(), output_composite()")
         print("To plot: display = MosaicDisplay(tile_instance)")
         print("Available plotting methods: plot_horiz(), plot_vert(),")
@@ -290,10 +299,7 @@ class MosaicTile(object):
             _method_header_printout("read_mosaic_binary")
             print("Reading", full_path_and_filename)
         # Check to see if a real MRMS binary file
-        if full_path_and_filename[-3:] == ".gz":
-            f = gzip.open(full_path_and_filename, "rb")
-        else:
-            f = open(full_path_and_filename, "rb")
+        f = open_binary(full_path_and_filename)
         try:
             self.Time = calendar.timegm(1 * np.array(_fill_list(f, 6, 0)))
         except:
@@ -316,9 +322,9 @@ class MosaicTile(object):
         (NR,) = unpack(ENDIAN + INTEGER, f.read(4))
         dt = self._construct_dtype(NR)
         # Rewind and then read everything into the pre-defined datatype.
-        # np.fromstring() nearly 3x faster performance than struct.unpack()!
+        # np.frombuffer() nearly 3x faster performance than struct.unpack()!
         f.seek(0)
-        fileobj = np.fromstring(
+        fileobj = np.frombuffer(
             f.read(
                 80 + 4 * self.nz + 82 + 4 * NR + 2 * self.nlon * self.nlat * self.nz
             ),
@@ -444,6 +450,81 @@ class MosaicTile(object):
         if verbose:
             _method_footer_printout()
 
+    def get_overview(self, factor=2, var=DEFAULT_VAR):
+        """
+        Returns a copy of the tile (or stitch) coarsened by factor in Latitude
+        and Longitude. Each gridpoint holds the maximum of the gridpoints it
+        covers, so storm cores are preserved. Only var (and its composite, if
+        computed) is kept. Overviews are built on demand and kept until
+        subsection() is called, so repeated quick-look plots are cheap.
+        """
+        if factor == 1:
+            return self
+        overviews = self.__dict__.setdefault("_overviews", {})
+        if (var, factor) not in overviews:
+            overviews[var, factor] = self._coarsen(factor, var)
+        return overviews[var, factor]
+
+    def get_cross_section(
+        self, start, end, npoints=None, var=DEFAULT_VAR, method="bilinear"
+    ):
+        """
+        Samples var along the great circle from start to end, each a
+        (lat, lon) pair, interpolating every height at once. Returns a
+        CrossSection with distance (km from start), height (km MSL) and
+        values (height, distance) arrays. Points off the grid are NaN.
+        npoints = Number of samples, default is about one per gridpoint.
+        method = 'bilinear' or 'nearest'.
+        """
+        if not hasattr(self, var):
+            _print_variable_does_not_exist("get_cross_section", var)
+            return
+        return cross_section(
+            getattr(self, var),
+            Grid.from_tile(self),
+            self.Height,
+            start,
+            end,
+            npoints=npoints,
+            method=method,
+        )
+
+    def sample_points(self, lat, lon, var=DEFAULT_VAR, method="nearest"):
+        """
+        Samples the column of var above every point, given as lat and lon
+        arrays (deg), in one vectorized call. Grid indices come from StartLat,
+        StartLon and the grid spacings. Returns an array (Height, point);
+        points off the grid are NaN.
+        method = 'nearest' or 'bilinear'.
+        The index is cached, so sampling the same points in tile after tile
+        (e.g., a list of stations) only computes it once.
+        """
+        if not hasattr(self, var):
+            _print_variable_does_not_exist("sample_points", var)
+            return
+        weights = point_weights(Grid.from_tile(self), lat, lon, method)
+        return weights(getattr(self, var))
+
+    def get_exceedance(self, thresholds, var=DEFAULT_VAR):
+        """
+        Computes, for a list of thresholds (dBZ) in one pass, the area (km**2)
+        where the composite of var is at or above each threshold and the
+        volume (km**3) of the gridpoints at or above it, with cells sized as
+        in compute_grid_attributes. Returns an Exceedance with thresholds,
+        area and volume arrays.
+        The grid is worked through a few rows at a time with per-row cell
+        areas, so no full-size composite, volume or boolean arrays are made
+        and many thresholds cost little more than one.
+        """
+        if not hasattr(self, var):
+            _print_variable_does_not_exist("get_exceedance", var)
+            return
+        from .regions import exceedance
+
+        return exceedance(
+            getattr(self, var), Grid.from_tile(self), self.Height, thresholds
+        )
+
     def diag(self, verbose=False):
         """
         Prints out diagnostic information and produces
@@ -461,6 +542,8 @@ class MosaicTile(object):
         print("Heights (km) =", self.Height)
         print("Grid shape =", np.shape(self.mrefl3d))
         print("Now plotting ...")
+        from .display import MosaicDisplay
+
         display = MosaicDisplay(self)
         display.plot_horiz(verbose=verbose)
         print("Done!")
@@ -522,6 +605,8 @@ class MosaicTile(object):
         self._subsection_in_latitude(latrange)
         self._subsection_in_longitude(lonrange)
         self._subsection_in_height(zrange)
+        # overviews of the old grid are stale now
+        self.__dict__.pop("_overviews", None)
         if verbose:
             _method_footer_printout()
 
@@ -554,6 +639,27 @@ class MosaicTile(object):
         if verbose:
             _method_footer_printout()
 
+    def _coarsen(self, factor, var=DEFAULT_VAR):
+        """Max-pooled copy of the tile, see get_overview()"""
+        tile = copy.copy(self)
+        tile.__dict__.pop("_overviews", None)
+        for name in getattr(self, "Variables", []):
+            if name != var:
+                tile.__dict__.pop(name, None)
+                tile.__dict__.pop(name + "_comp", None)
+        tile.Variables = [var]
+        for name in (var, var + "_comp"):
+            if hasattr(self, name):
+                setattr(tile, name, max_pool(getattr(self, name), factor))
+        tile.Latitude = mean_pool(self.Latitude, factor)
+        tile.Longitude = mean_pool(self.Longitude, factor)
+        tile.nlat, tile.nlon = np.shape(tile.Latitude)
+        tile.LatGridSpacing = self.LatGridSpacing * factor
+        tile.LonGridSpacing = self.LonGridSpacing * factor
+        tile.StartLat = tile.Latitude[0, 0]
+        tile.StartLon = tile.Longitude[0, 0]
+        return tile
+
     def _populate_v1_specific_data(self, fileobj=None, label="mrefl_mosaic"):
         """v1 MRMS netcdf data file"""
         self.StartLat = fileobj.Latitude
@@ -589,45 +695,10 @@ class MosaicTile(object):
     def _construct_dtype(self, NR=1):
         """
         This is the structure of a complete binary MRMS file.
-        This method breaks in Python 2.7 if you import the
-        unicode_literals module from __future__. However,
-        the method works fine under Python 3.4 as written.
+        The layout itself lives in mmmpy.binary so the xarray backend
+        can share it.
         """
-        dt = np.dtype(
-            [
-                ("year", "i4"),
-                ("month", "i4"),
-                ("day", "i4"),
-                ("hour", "i4"),
-                ("minute", "i4"),
-                ("second", "i4"),
-                ("nlon", "i4"),
-                ("nlat", "i4"),
-                ("nz", "i4"),
-                ("deprec1", "i4"),
-                ("map_scale", "i4"),
-                ("deprec2", "i4"),
-                ("deprec3", "i4"),
-                ("deprec4", "i4"),
-                ("StartLon", "i4"),
-                ("StartLat", "i4"),
-                ("deprec5", "i4"),
-                ("dlon", "i4"),
-                ("dlat", "i4"),
-                ("dxy_scale", "i4"),
-                ("Height", ("i4", self.nz)),
-                ("z_scale", "i4"),
-                ("placeholder1", ("i4", 10)),
-                ("VarName", "a20"),
-                ("VarUnit", "a6"),
-                ("var_scale", "i4"),
-                ("missing_value", "i4"),
-                ("NR", "i4"),
-                ("Radars", ("a4", NR)),
-                ("data3d", ("i2", (self.nz, self.nlat, self.nlon))),
-            ]
-        )
-        return dt
+        return construct_dtype(self.nz, self.nlat, self.nlon, NR)
 
     def _get_tile_number(self):
         """Returns tile number as a string based on starting lat/lon"""
@@ -1297,606 +1368,20 @@ class MosaicStitch(MosaicTile):
 
 
 ###################################################
-# MosaicDisplay class
+# Plotting, see mmmpy.display
 ###################################################
 
 
-class MosaicDisplay(object):
-
+def __getattr__(name):
     """
-    Class used for plotting MRMS data. To use:
-    display = MosaicDisplay(tile), where tile is MosaicTile or Stitch instance
+    MosaicDisplay and DEFAULT_CMAP used to be defined here; they are now
+    imported from mmmpy.display on first access.
     """
+    if name in ("MosaicDisplay", "DEFAULT_CMAP"):
+        from . import display
 
-    def __init__(self, mosaic):
-        self.mosaic = mosaic
-
-    def plot_horiz(
-        self,
-        var=DEFAULT_VAR,
-        latrange=DEFAULT_LATRANGE,
-        lonrange=DEFAULT_LONRANGE,
-        resolution="l",
-        level=None,
-        parallels=DEFAULT_PARALLELS,
-        area_thresh=10000,
-        meridians=DEFAULT_MERIDIANS,
-        title=None,
-        clevs=DEFAULT_CLEVS,
-        basemap=None,
-        embellish=True,
-        cmap=DEFAULT_CMAP,
-        save=None,
-        show_grid=True,
-        linewidth=DEFAULT_LINEWIDTH,
-        fig=None,
-        ax=None,
-        verbose=False,
-        return_flag=False,
-        colorbar_flag=True,
-        colorbar_loc="bottom",
-    ):
-        """
-        Plots a basemap projection with a plan view of the mosaic radar data.
-        The projection can be used to incorporate other data into figure
-        (e.g., lightning).
-        var = Variable to be plotted.
-        latrange = Desired latitude range of plot (2-element list).
-        lonrange = Desired longitude range of plot (2-element list).
-        level = If set, performs horizontal cross-section thru that altitude,
-                or as close as possible to it. If not set, will plot composite.
-        meridians, parallels = Scalars to denote desired gridline spacing.
-        linewidth = Width of gridlines (default=0).
-        show_grid = Set to False to suppress gridlines and lat/lon labels.
-        title = Plot title string, None = Basic time & date string as title.
-                So if you want a blank title use title='' as keyword.
-        clevs = Desired contour levels.
-        cmap = Desired color map.
-        basemap = Assign to basemap you want to use.
-        embellish = Set to false to suppress basemap changes.
-        colorbar_loc = Options: 'bottom', 'top', 'right', 'left'
-        save = File to save image to. Careful, PS/EPS/PDF can get large!
-        verbose = Set to True if you want a lot of text for debugging.
-        resolution = Resolution of Basemap instance (e.g., 'c', 'l', 'i', 'h')
-        area_thresh = Area threshold to show lakes, etc. (km^2)
-        return_flag = Set to True to return plot info.
-                      Order is Figure, Axis, Basemap
-        """
-        method_name = "plot_horiz"
-        ax, fig = self._parse_ax_fig(ax, fig)
-        if verbose:
-            _method_header_printout(method_name)
-        if not hasattr(self.mosaic, var):
-            _print_variable_does_not_exist(method_name, var)
-            if verbose:
-                _method_footer_printout()
-            return
-        if self.mosaic.nlon <= 1 or self.mosaic.nlat <= 1:
-            print("Latitude or Longitude too small to plot")
-            if verbose:
-                _method_footer_printout()
-            return
-        if verbose:
-            print("Executing plot")
-        zdata, slevel = self._get_horizontal_cross_section(var, level, verbose)
-        # Removed np.transpose() step from here as it was crashing
-        # map proj coordinates under Python 3.
-        plon = self.mosaic.Longitude
-        plat = self.mosaic.Latitude
-        if basemap is None:
-            m = self._create_basemap_instance(
-                latrange, lonrange, resolution, area_thresh
-            )
-        else:
-            m = basemap
-        if embellish:
-            m = self._add_gridlines_if_desired(
-                m, parallels, meridians, linewidth, latrange, lonrange, show_grid
-            )
-        x, y = m(plon, plat)  # compute map proj coordinates.
-        # Draw filled contours
-        # Note the need to transpose for plotting purposes
-        cs = m.contourf(x.T, y.T, zdata, clevs, cmap=cmap)
-        # cs = m.pcolormesh(x, y, zdata, vmin=np.min(clevs),
-        #                   vmax=np.max(clevs), cmap=cmap)
-        # Add colorbar, title, and save
-        if colorbar_flag:
-            cbar = m.colorbar(cs, location=colorbar_loc, pad="7%")
-            if var == DEFAULT_VAR:
-                cbar.set_label(DEFAULT_VAR_LABEL)
-            else:
-                # Placeholder for future dual-pol functionality
-                cbar.set_label(var)
-        if title is None:
-            title = epochtime_to_string(self.mosaic.Time) + slevel
-        plt.title(title)
-        if save is not None:
-            plt.savefig(save)
-        # Clean up
-        if verbose:
-            _method_footer_printout()
-        if return_flag:
-            return fig, ax, m
-
-    def plot_vert(
-        self,
-        var=DEFAULT_VAR,
-        lat=None,
-        lon=None,
-        xrange=None,
-        xlabel=None,
-        colorbar_flag=True,
-        zrange=None,
-        zlabel=DEFAULT_ZLABEL,
-        fig=None,
-        ax=None,
-        clevs=DEFAULT_CLEVS,
-        cmap=DEFAULT_CMAP,
-        title=None,
-        save=None,
-        verbose=False,
-        return_flag=False,
-    ):
-        """
-        Plots a vertical cross-section through mosaic radar data.
-        var = Variable to be plotted.
-        lat/lon = If set, performs vertical cross-section thru that lat/lon,
-                  or as close as possible to it. Only one or the other
-                  can be set.
-        xrange = Desired latitude or longitude range of plot (2-element list).
-        zrange = Desired height range of plot (2-element list).
-        xlabel, zlabel = Axes labels.
-        clevs = Desired contour levels.
-        cmap = Desired color map.
-        title = String for plot title, None = Basic time & date as title.
-                So if you want a blank title use title='' as keyword.
-        save = File to save image to. Careful, PS/EPS/PDF can get large!
-        verbose = Set to True if you want a lot of text for debugging.
-        return_flag = Set to True to return Figure, Axis objects
-        """
-        method_name = "plot_vert"
-        ax, fig = self._parse_ax_fig(ax, fig)
-        if verbose:
-            _method_header_printout(method_name)
-        if not hasattr(self.mosaic, var):
-            _print_variable_does_not_exist(method_name, var)
-            if verbose:
-                _method_footer_printout()
-            return
-        # Get the cross-section
-        vcut, xvar, xrange, xlabel, tlabel = self._get_vertical_slice(
-            var, lat, lon, xrange, xlabel, verbose
-        )
-        if vcut is None:
-            return
-        # Plot details
-        if not title:
-            title = epochtime_to_string(self.mosaic.Time) + " " + tlabel
-        if not zrange:
-            zrange = [0, np.max(self.mosaic.Height)]
-        # Plot execution
-        ax, cs = self._plot_vertical_cross_section(
-            ax,
-            vcut,
-            xvar,
-            xrange,
-            xlabel,
-            zrange,
-            zlabel,
-            clevs,
-            cmap,
-            title,
-            mappable=True,
-        )
-        if colorbar_flag:
-            cbar = fig.colorbar(cs)
-            if var == DEFAULT_VAR:
-                cbar.set_label(DEFAULT_VAR_LABEL, rotation=90)
-            else:
-                # Placeholder for future dual-pol functionality
-                cbar.set_label(var, rotation=90)
-        # Finish up
-        if save is not None:
-            plt.savefig(save)
-        if verbose:
-            _method_footer_printout()
-        if return_flag:
-            return fig, ax
-
-    def three_panel_plot(
-        self,
-        var=DEFAULT_VAR,
-        lat=None,
-        lon=None,
-        latrange=DEFAULT_LATRANGE,
-        lonrange=DEFAULT_LONRANGE,
-        meridians=None,
-        parallels=None,
-        linewidth=DEFAULT_LINEWIDTH,
-        resolution="l",
-        show_grid=True,
-        level=None,
-        area_thresh=10000,
-        lonlabel=DEFAULT_LONLABEL,
-        latlabel=DEFAULT_LATLABEL,
-        zrange=None,
-        zlabel=DEFAULT_ZLABEL,
-        clevs=DEFAULT_CLEVS,
-        cmap=DEFAULT_CMAP,
-        title_a=None,
-        title_b=None,
-        title_c=None,
-        xrange_b=None,
-        xrange_c=None,
-        save=None,
-        verbose=False,
-        return_flag=False,
-        show_crosshairs=True,
-    ):
-        """
-        Plots horizontal and vertical cross-sections through mosaic radar data.
-        Subplot (a) is the horizontal view, (b) is the
-        var = Variable to be plotted.
-        latrange = Desired latitude range of plot (2-element list).
-        lonrange = Desired longitude range of plot (2-element list).
-        level = If set, performs horizontal cross-section thru that altitude,
-                or as close as possible to it. If not set, will plot composite.
-        meridians, parallels = Scalars to denote desired gridline spacing.
-        linewidth = Width of gridlines (default=0).
-        show_grid = Set to False to suppress gridlines and lat/lon tick labels.
-        title_a, _b, _c = Strings for subplot titles, None = Basic time & date
-                          string as title for subplot (a), and constant lat/lon
-                          for (b) and (c). So if you want blank titles use
-                          title_?='' as keywords.
-        clevs = Desired contour levels.
-        cmap = Desired color map.
-        save = File to save image to. Careful, PS/EPS/PDF can get large!
-        verbose = Set to True if you want a lot of text for debugging.
-        zrange = Desired height range of plot (2-element list).
-        resolution = Resolution of Basemap instance (e.g., 'c', 'l', 'i', 'h')
-        area_thresh = Area threshold to show lakes, etc. (km^2)
-        lonlabel, latlabel, zlabel = Axes labels.
-        lat/lon = Performs vertical cross-sections thru those lat/lons,
-                  or as close as possible to them. Both are required to be set!
-        return_flag = Set to True to return plot info.
-                      Order is Figure, Axes (3 of them), Basemap.
-        show_crosshairs = Set to False to suppress the vertical cross-section
-                          crosshairs on the horizontal cross-section.
-        xrange_b, _c = Subplot (b) is constant latitude, so xrange_b is is a
-                       2-element list that allows the user to adjust the
-                       longitude domain of (b). Default lonrange if not set.
-                       Similar setup for xrange_c - subplot (c) - except for
-                       latitude (i.e., defaults to latrange if not set). The
-                       xrange_? variables determine length of crosshairs.
-        """
-        method_name = "three_panel_plot"
-        plt.close()  # mpl seems buggy if you don't clean up old windows
-        if verbose:
-            _method_header_printout(method_name)
-        if not hasattr(self.mosaic, var):
-            _print_variable_does_not_exist(method_name, var)
-            if verbose:
-                _method_footer_printout()
-            return
-        if self.mosaic.nlon <= 1 or self.mosaic.nlat <= 1:
-            print("Latitude or Longitude too small to plot")
-            if verbose:
-                _method_footer_printout()
-            return
-        if lat is None or lon is None:
-            print(
-                method_name + "(): Need both constant latitude and",
-                "constant longitude for slices",
-            )
-            if verbose:
-                _method_footer_printout()
-            return
-        fig = plt.figure()
-        fig.set_size_inches(11, 8.5)
-        # Horizontal Cross-Section + Color Bar (subplot a)
-        ax1 = fig.add_axes(THREE_PANEL_SUBPLOT_A)
-        if not title_a:
-            slevel, index = self._get_slevel(level, verbose)
-            title_a = "(a) " + epochtime_to_string(self.mosaic.Time) + slevel
-        fig, ax1, m = self.plot_horiz(
-            var=var,
-            title=title_a,
-            latrange=latrange,
-            lonrange=lonrange,
-            level=level,
-            meridians=meridians,
-            parallels=parallels,
-            return_flag=True,
-            linewidth=linewidth,
-            show_grid=show_grid,
-            clevs=clevs,
-            cmap=cmap,
-            verbose=verbose,
-            area_thresh=area_thresh,
-            resolution=resolution,
-        )
-        if xrange_b is None:
-            xrange_b = lonrange
-        if not xrange_c:
-            xrange_c = latrange
-        if show_crosshairs:
-            m = self._add_crosshairs(m, lat, lon, xrange_b, xrange_c)
-        # Vertical Cross-Section (subplot b)
-        if not title_b:
-            lat, tlabel2 = self._parse_lat_tlabel(lat)
-            title_b = "(b) " + tlabel2
-        ax2 = fig.add_axes(THREE_PANEL_SUBPLOT_B)
-        self.plot_vert(
-            var=var,
-            lat=lat,
-            zrange=zrange,
-            xrange=xrange_b,
-            xlabel=lonlabel,
-            zlabel=zlabel,
-            cmap=cmap,
-            clevs=clevs,
-            verbose=verbose,
-            colorbar_flag=False,
-            title=title_b,
-        )
-        # Vertical Cross-Section (subplot c)
-        if not title_c:
-            lon, tlabel3 = self._parse_lon_tlabel(lon)
-            title_c = "(c) " + tlabel3
-        ax3 = fig.add_axes(THREE_PANEL_SUBPLOT_C)
-        self.plot_vert(
-            var=var,
-            lon=lon,
-            zrange=zrange,
-            xrange=xrange_c,
-            xlabel=latlabel,
-            zlabel=zlabel,
-            cmap=cmap,
-            clevs=clevs,
-            verbose=verbose,
-            colorbar_flag=False,
-            title=title_c,
-        )
-        # Finish up
-        if save is not None:
-            plt.savefig(save)
-        if verbose:
-            _method_footer_printout()
-        if return_flag:
-            return fig, ax1, ax2, ax3, m
-
-    def _get_slevel(self, level, verbose, print_flag=False):
-        if level is None:
-            slevel = " Composite "
-            index = None
-        else:
-            if verbose and print_flag:
-                print("Attempting to plot cross-section thru", level, "km MSL")
-            if level < np.min(self.mosaic.Height):
-                level = np.min(self.mosaic.Height)
-            elif level > np.max(self.mosaic.Height):
-                level = np.max(self.mosaic.Height)
-            index = np.argmin(np.abs(level - self.mosaic.Height))
-            level = self.mosaic.Height[index]
-            slevel = " %.1f" % level + " km MSL"
-            if verbose and print_flag:
-                print("Actually taking cross-section thru", level, "km MSL")
-        return slevel, index
-
-    def _get_horizontal_cross_section(self, var=DEFAULT_VAR, level=None, verbose=False):
-        slevel, index = self._get_slevel(level, verbose, print_flag=True)
-        if index is None:
-            if verbose:
-                print("No vertical level specified,", "plotting composite reflectivity")
-            if not hasattr(self.mosaic, var + "_comp"):
-                if verbose:
-                    print(var + "_comp does not exist,", "computing it with get_comp()")
-                self.mosaic.get_comp(var=var, verbose=verbose)
-            zdata = 1.0 * getattr(self.mosaic, var + "_comp")
-            zdata = np.transpose(zdata)
-        else:
-            temp_3d = 1.0 * getattr(self.mosaic, var)
-            zdata = temp_3d[index, :, :]
-            zdata = np.transpose(zdata)
-        return zdata, slevel
-
-    def _create_basemap_instance(
-        self, latrange=None, lonrange=None, resolution="l", area_thresh=10000
-    ):
-        # create Basemap instance
-        lon_0 = np.mean(lonrange)
-        lat_0 = np.mean(latrange)
-        m = Basemap(
-            projection="merc",
-            lon_0=lon_0,
-            lat_0=lat_0,
-            lat_ts=lat_0,
-            llcrnrlat=np.min(latrange),
-            urcrnrlat=np.max(latrange),
-            llcrnrlon=np.min(lonrange),
-            urcrnrlon=np.max(lonrange),
-            resolution=resolution,
-            area_thresh=area_thresh,
-        )
-        # Draw coastlines, state and country boundaries, edge of map
-        m.drawcoastlines()
-        m.drawstates()
-        m.drawcountries()
-        return m
-
-    def _add_gridlines_if_desired(
-        self,
-        m=None,
-        parallels=DEFAULT_PARALLELS,
-        meridians=DEFAULT_MERIDIANS,
-        linewidth=DEFAULT_LINEWIDTH,
-        latrange=None,
-        lonrange=None,
-        show_grid=True,
-    ):
-        if show_grid:
-            # Draw parallels
-            vparallels = np.arange(
-                np.floor(np.min(latrange)), np.ceil(np.max(latrange)), parallels
-            )
-            m.drawparallels(
-                vparallels, labels=[1, 0, 0, 0], fontsize=10, linewidth=linewidth
-            )
-            # Draw meridians
-            vmeridians = np.arange(
-                np.floor(np.min(lonrange)), np.ceil(np.max(lonrange)), meridians
-            )
-            m.drawmeridians(
-                vmeridians, labels=[0, 0, 0, 1], fontsize=10, linewidth=linewidth
-            )
-        return m
-
-    def _add_crosshairs(self, m=None, lat=None, lon=None, xrange_b=None, xrange_c=None):
-        cross_xrange = [np.min(xrange_b), np.max(xrange_b)]
-        constant_lat = [lat, lat]
-        cross_yrange = [np.min(xrange_c), np.max(xrange_c)]
-        constant_lon = [lon, lon]
-        xc1, yc1 = m(cross_xrange, constant_lat)
-        xc2, yc2 = m(constant_lon, cross_yrange)
-        m.plot(xc1, yc1, "k--", linewidth=2)
-        m.plot(xc1, yc1, "r--", linewidth=1)
-        m.plot(xc2, yc2, "k--", linewidth=2)
-        m.plot(xc2, yc2, "r--", linewidth=1)
-        return m
-
-    def _get_vertical_slice(
-        self,
-        var=DEFAULT_VAR,
-        lat=None,
-        lon=None,
-        xrange=None,
-        xlabel=None,
-        verbose=False,
-    ):
-        """Execute slicing, get xvar, vcut"""
-        fail = [None, None, None, None, None]
-        if lat is None and lon is None:
-            print("plot_vert(): Need a constant lat or lon for slice")
-            if verbose:
-                _method_footer_printout()
-            return fail
-        elif lat is not None and lon is not None:
-            print("plot_vert(): Need either lat or lon for slice, not both!")
-            if verbose:
-                _method_footer_printout()
-            return fail
-        else:
-            if lon is None:
-                if self.mosaic.nlon <= 1:
-                    print("Available Longitude range too small to plot")
-                    if verbose:
-                        _method_footer_printout()
-                    return fail
-                if verbose:
-                    print("Plotting vertical cross-section thru", lat, "deg Latitude")
-                if not xrange:
-                    xrange = [
-                        np.min(self.mosaic.Longitude),
-                        np.max(self.mosaic.Longitude),
-                    ]
-                if not xlabel:
-                    xlabel = "Longitude (deg)"
-                vcut, xvar, tlabel = self._get_constant_latitude_cross_section(var, lat)
-            if lat is None:
-                if self.mosaic.nlat <= 1:
-                    print("Available Latitude range too small to plot")
-                    if verbose:
-                        _method_footer_printout()
-                    return fail
-                if verbose:
-                    print("Plotting vertical cross-section thru", lon, "deg Longitude")
-                if not xrange:
-                    xrange = [
-                        np.min(self.mosaic.Latitude),
-                        np.max(self.mosaic.Latitude),
-                    ]
-                if not xlabel:
-                    xlabel = "Latitude (deg)"
-                vcut, xvar, tlabel = self._get_constant_longitude_cross_section(
-                    var, lon
-                )
-        return vcut, xvar, xrange, xlabel, tlabel
-
-    def _parse_lat_tlabel(self, lat):
-        if lat > np.max(self.mosaic.Latitude):
-            lat = np.max(self.mosaic.Latitude)
-            print("Outside domain, plotting instead thru", lat, " deg Latitude")
-        if lat < np.min(self.mosaic.Latitude):
-            lat = np.min(self.mosaic.Latitude)
-            print("Outside domain, plotting instead thru", lat, "deg Latitude")
-        return lat, "Latitude = " + "%.2f" % lat + " deg"
-
-    def _get_constant_latitude_cross_section(self, var=DEFAULT_VAR, lat=None):
-        lat, tlabel = self._parse_lat_tlabel(lat)
-        index = np.round(
-            np.abs(lat - self.mosaic.StartLat) / self.mosaic.LatGridSpacing
-        )
-        index = np.int32(index)
-        xvar = self.mosaic.Longitude[index, :]
-        temp_3d = getattr(self.mosaic, var)
-        vcut = temp_3d[:, index, :]
-        return vcut, xvar, tlabel
-
-    def _parse_lon_tlabel(self, lon):
-        if lon > np.max(self.mosaic.Longitude):
-            lon = np.max(self.mosaic.Longitude)
-            print("max", lon, np.max(self.mosaic.Longitude))
-            print("Outside domain, plotting instead thru", lon, " deg Longitude")
-        if lon < np.min(self.mosaic.Longitude):
-            lon = np.min(self.mosaic.Longitude)
-            print("min", lon, np.min(self.mosaic.Longitude))
-            print("Outside domain, plotting instead thru", lon, "deg Longitude")
-        return lon, "Longitude = " + "%.2f" % lon + " deg"
-
-    def _get_constant_longitude_cross_section(self, var=DEFAULT_VAR, lon=None):
-        lon, tlabel = self._parse_lon_tlabel(lon)
-        index = np.round(
-            np.abs(lon - self.mosaic.StartLon) / self.mosaic.LonGridSpacing
-        )
-        index = np.int32(index)
-        xvar = self.mosaic.Latitude[:, index]
-        temp_3d = getattr(self.mosaic, var)
-        vcut = temp_3d[:, :, index]
-        return vcut, xvar, tlabel
-
-    def _plot_vertical_cross_section(
-        self,
-        ax=None,
-        vcut=None,
-        xvar=None,
-        xrange=None,
-        xlabel=None,
-        zrange=None,
-        zlabel=None,
-        clevs=DEFAULT_CLEVS,
-        cmap=DEFAULT_CMAP,
-        title=None,
-        mappable=False,
-    ):
-        cs = ax.contourf(xvar, self.mosaic.Height, vcut, clevs, cmap=cmap)
-        if title:
-            ax.set_title(title)
-        ax.set_xlim(np.min(xrange), np.max(xrange))
-        ax.set_ylim(np.min(zrange), np.max(zrange))
-        ax.set_xlabel(xlabel)
-        ax.set_ylabel(zlabel)
-        if mappable:
-            return ax, cs
-        else:
-            return ax
-
-    def _parse_ax_fig(self, ax=None, fig=None):
-        """Parse and return ax and fig parameters. Adapted from Py-ART."""
-        if ax is None:
-            ax = plt.gca()
-        if fig is None:
-            fig = plt.gcf()
-        return ax, fig
+        return getattr(display, name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 
 ###################################################
@@ -0,0 +1,189 @@
+"""
+render loops of mosaics, one plot_horiz frame per file or tile, in a process
+pool and optionally assemble them into an animated gif or mp4
+"""
+__all__ = ["render_frames", "write_animation"]
+
+import shutil
+import subprocess
+import multiprocessing
+from pathlib import Path
+from functools import partial
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Iterable, Optional, Sequence, Union
+
+import matplotlib
+
+from ._mmmpy import MosaicTile
+from .typing import StrPath
+
+FRAME_NAME = "frame_{:04d}.png"
+# frames per second of assembled animations
+DEFAULT_FPS = 4.0
+# the map background, projected grid and rendered boundaries are cached per
+# process; frames of a loop share one domain, so this is almost always a win
+DEFAULT_PLOT_KWARGS = {"cached": True}
+# backends that draw without a window, safe to fork from after drawing
+OFFSCREEN_BACKENDS = frozenset({"agg", "cairo", "pdf", "pgf", "ps", "svg", "template"})
+
+Mosaic = Union[StrPath, MosaicTile]
+
+
+def render_frames(
+    mosaics: Iterable[Mosaic],
+    directory: StrPath,
+    *,
+    workers: Optional[int] = None,
+    animation: Optional[StrPath] = None,
+    fps: float = DEFAULT_FPS,
+    figsize: Optional[tuple[float, float]] = None,
+    dpi: Optional[float] = None,
+    **kwargs: Any,
+) -> list[Path]:
+    """
+    render every mosaic, a MosaicTile/MosaicStitch or a file MosaicTile can
+    read, to `directory/frame_0000.png` ... with MosaicDisplay.plot_horiz and
+    the plot `kwargs`. returns the frames in input order.
+
+    frames are drawn with the Agg backend in `workers` processes. when this
+    process draws offscreen the first frame is drawn here, so on platforms
+    that fork the workers inherit the map background it cached rather than
+    each building their own; forking after a gui backend started drawing is
+    unsafe, so otherwise every frame is left to the workers. a mosaic that
+    cannot be read raises a ValueError.
+
+    `animation` is a .gif or .mp4 path to assemble the frames into, see
+    write_animation.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    kwargs = {**DEFAULT_PLOT_KWARGS, **kwargs}
+    render = partial(__render, figsize=figsize, dpi=dpi, kwargs=kwargs)
+    jobs = [
+        (mosaic, directory / FRAME_NAME.format(i)) for i, mosaic in enumerate(mosaics)
+    ]
+    if workers == 1 or len(jobs) <= 1:
+        for mosaic, frame in jobs:
+            render(mosaic, frame)
+    elif matplotlib.get_backend().lower() in OFFSCREEN_BACKENDS:
+        render(*jobs[0])
+        __render_concurrently(render, jobs[1:], workers)
+    else:
+        __render_concurrently(render, jobs, workers)
+
+    frames = [frame for _, frame in jobs]
+    if animation is not None:
+        write_animation(frames, animation, fps=fps)
+    return frames
+
+
+def write_animation(
+    frames: Sequence[StrPath], path: StrPath, *, fps: float = DEFAULT_FPS
+) -> Path:
+    """
+    assemble png frames into an animated gif (Pillow) or mp4 (ffmpeg), chosen
+    by the suffix of `path`
+    """
+    path = Path(path)
+    if not frames:
+        raise ValueError("no frames to animate")
+    suffix = path.suffix.lower()
+    if suffix == ".gif":
+        from PIL import Image
+
+        with ExitStack() as stack:
+            first, *rest = [stack.enter_context(Image.open(frame)) for frame in frames]
+            first.save(
+                path,
+                save_all=True,
+                append_images=rest,
+                duration=round(1000 / fps),
+                loop=0,
+            )
+    elif suffix == ".mp4":
+        __write_mp4(frames, path, fps)
+    else:
+        raise ValueError(f"cannot write a {suffix!r} animation, use .gif or .mp4")
+    return path
+
+
+def __render(
+    mosaic: Mosaic,
+    frame: Path,
+    *,
+    figsize: Optional[tuple[float, float]],
+    dpi: Optional[float],
+    kwargs: dict[str, Any],
+) -> Path:
+    from matplotlib import pyplot as plt
+    from .display import MosaicDisplay
+
+    if not isinstance(mosaic, MosaicTile):
+        path, mosaic = mosaic, MosaicTile(str(mosaic))
+        # MosaicTile reports the files it cannot read instead of raising
+        if not hasattr(mosaic, "mrefl3d"):
+            raise ValueError(f"could not read a mosaic from {path}")
+    fig = plt.figure(figsize=figsize, dpi=dpi)
+    try:
+        MosaicDisplay(mosaic).plot_horiz(fig=fig, ax=fig.gca(), save=frame, **kwargs)
+    finally:
+        plt.close(fig)
+    return frame
+
+
+def __init_worker() -> None:
+    # frames never show a window; Agg also needs no display server
+    matplotlib.use("Agg", force=True)
+
+
+def __render_concurrently(render, jobs, workers: Optional[int]) -> None:
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    with ProcessPoolExecutor(
+        workers, mp_context=context, initializer=__init_worker
+    ) as pool:
+        futures = [pool.submit(render, mosaic, frame) for mosaic, frame in jobs]
+        try:
+            for future in as_completed(futures):
+                future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def __write_mp4(frames: Sequence[StrPath], path: Path, fps: float) -> None:
+    ffmpeg = shutil.which(matplotlib.rcParams["animation.ffmpeg_path"])
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg is needed to write mp4 animations")
+    # the concat demuxer takes any frame names, even padding keeps yuv420p happy
+    listing = path.with_suffix(".txt")
+    duration = 1 / fps
+    listing.write_text(
+        "".join(
+            f"file '{Path(frame).resolve()}'\nduration {duration}\n" for frame in frames
+        )
+    )
+    args = [
+        ffmpeg,
+        "-y",
+        "-loglevel",
+        "error",
+        "-f",
+        "concat",
+        "-safe",
+        "0",
+        "-i",
+        str(listing),
+        "-vf",
+        "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+        "-pix_fmt",
+        "yuv420p",
+        "-r",
+        str(fps),
+        str(path),
+    ]
+    try:
+        subprocess.run(args, check=True)
+    finally:
+        listing.unlink()
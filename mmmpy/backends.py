@@ -0,0 +1,143 @@
+"""
+xarray backends for mrms formats that xarray cannot read natively
+"""
+
+__all__ = ["MRMSBinaryBackendArray", "MRMSBinaryBackendEntrypoint"]
+
+import io
+import os
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import xarray as xr
+from xarray.backends import BackendArray, BackendEntrypoint
+from xarray.core import indexing
+
+from .binary import BinaryHeader, Source, open_binary, read_header
+
+DATA3D_DTYPE = np.dtype("i2")
+
+
+class MRMSBinaryBackendArray(BackendArray):
+    """
+    lazily indexed view of the data3d block of an MRMS binary file.
+
+    raw files are memory mapped and raw buffers are viewed without a copy;
+    gzipped data is decompressed on demand, only up to the last height plane
+    that was requested.
+    """
+
+    def __init__(self, filename: Source, header: BinaryHeader) -> None:
+        self.filename = filename
+        self.header = header
+        self.shape = header.shape
+        self.dtype = DATA3D_DTYPE
+
+    def __getitem__(self, key: indexing.ExplicitIndexer) -> np.ndarray:
+        return indexing.explicit_indexing_adapter(
+            key, self.shape, indexing.IndexingSupport.BASIC, self._raw_indexing_method
+        )
+
+    def _raw_indexing_method(self, key: tuple) -> np.ndarray:
+        if self.header.gzipped:
+            return self._read_gzip(key)
+        if isinstance(self.filename, io.BytesIO):
+            data = np.frombuffer(
+                self.filename.getvalue(),
+                dtype=self.dtype,
+                count=np.prod(self.shape),
+                offset=self.header.offset,
+            ).reshape(self.shape)
+            return np.array(data[key])
+        data = np.memmap(
+            self.filename,
+            dtype=self.dtype,
+            mode="r",
+            offset=self.header.offset,
+            shape=self.shape,
+        )
+        return np.array(data[key])
+
+    def _read_gzip(self, key: tuple) -> np.ndarray:
+        """decompress the contiguous run of height planes covered by key"""
+        planes = np.arange(self.header.nz)[key[0]]
+        if not np.size(planes):
+            return np.empty(self.shape, dtype=self.dtype)[key]
+        first, last = np.min(planes), np.max(planes) + 1
+        plane_size = self.header.nlat * self.header.nlon * self.dtype.itemsize
+        with open_binary(self.filename) as f:
+            f.seek(self.header.offset + first * plane_size)
+            buffer = f.read((last - first) * plane_size)
+        data = np.frombuffer(buffer, dtype=self.dtype).reshape(
+            (last - first, self.header.nlat, self.header.nlon)
+        )
+        return np.array(data[(planes - first,) + key[1:]])
+
+
+class MRMSBinaryBackendEntrypoint(BackendEntrypoint):
+    """
+    `xr.open_dataset(file, engine=MRMSBinaryBackendEntrypoint)`
+
+    data3d is exposed as (heightAboveSea, latitude, longitude) with the
+    latitude axis ordered north to south like the other mrms engines.
+    """
+
+    open_dataset_parameters = ("filename_or_obj", "drop_variables", "mask_and_scale")
+    description = "Open legacy MRMS binary mosaics (raw or gzipped) in xarray"
+
+    def open_dataset(
+        self,
+        filename_or_obj,
+        *,
+        drop_variables: Iterable[str] = None,
+        mask_and_scale: bool = True,
+    ) -> xr.Dataset:
+        if isinstance(filename_or_obj, io.BytesIO):
+            # a member unpacked in memory, see mmmpy.io.unzip
+            filename = filename_or_obj
+            history = getattr(filename, "name", "")
+        else:
+            filename = Path(filename_or_obj)
+            history = os.fspath(filename)
+        header = read_header(filename)
+        name = header.var_name or "unknown"
+
+        data = indexing.LazilyIndexedArray(MRMSBinaryBackendArray(filename, header))
+        variable = xr.Variable(
+            ("heightAboveSea", "latitude", "longitude"),
+            data,
+            attrs={
+                "units": header.var_unit,
+                "scale_factor": 1.0 / header.var_scale,
+                "missing_value": np.int16(header.missing_value),
+            },
+        )
+        # one height plane per chunk when opened through dask
+        variable.encoding["preferred_chunks"] = {
+            "heightAboveSea": 1,
+            "latitude": header.nlat,
+            "longitude": header.nlon,
+        }
+        ds = xr.Dataset(
+            {name: variable},
+            coords={
+                "heightAboveSea": ("heightAboveSea", np.array(header.height)),
+                "latitude": ("latitude", header.latitude),
+                "longitude": ("longitude", header.longitude),
+                "validTime": np.datetime64(header.time, "s"),
+            },
+            attrs={"history": history},
+        )
+        ds = xr.decode_cf(ds, mask_and_scale=mask_and_scale, decode_times=False)
+        if drop_variables:
+            ds = ds.drop_vars(drop_variables, errors="ignore")
+        # binary files store latitude south to north
+        return ds.isel(latitude=slice(None, None, -1))
+
+    def guess_can_open(self, filename_or_obj) -> bool:
+        try:
+            read_header(filename_or_obj)
+        except (OSError, ValueError, TypeError):
+            return False
+        return True
@@ -0,0 +1,188 @@
+"""
+layout of the legacy MRMS binary mosaic format
+
+Major reference:
+ftp://ftp.nssl.noaa.gov/users/langston/MRMS_REFERENCE/MRMS_BinaryFormat.pdf
+"""
+
+__all__ = ["BinaryHeader", "construct_dtype", "read_header", "is_plausible_header"]
+
+import io
+import gzip
+import datetime
+from pathlib import Path
+from dataclasses import dataclass
+from typing import BinaryIO, Union
+
+import numpy as np
+
+from .typing import StrPath
+
+# a path on disk or a decompressed member held in memory
+Source = Union[StrPath, io.BytesIO]
+
+GZIP_MAGIC = b"\x1f\x8b"
+# year, month ... dxy_scale; the fixed 20 integers at the start of every file
+FIXED_HEADER_SIZE = 20 * 4
+# z_scale, placeholder, VarName, VarUnit, var_scale, missing_value
+VARIABLE_HEADER_SIZE = 4 + 40 + 20 + 6 + 4 + 4
+
+
+def construct_dtype(nz: int, nlat: int, nlon: int, nr: int = 1) -> np.dtype:
+    """This is the structure of a complete binary MRMS file."""
+    return np.dtype(
+        [
+            ("year", "i4"),
+            ("month", "i4"),
+            ("day", "i4"),
+            ("hour", "i4"),
+            ("minute", "i4"),
+            ("second", "i4"),
+            ("nlon", "i4"),
+            ("nlat", "i4"),
+            ("nz", "i4"),
+            ("deprec1", "i4"),
+            ("map_scale", "i4"),
+            ("deprec2", "i4"),
+            ("deprec3", "i4"),
+            ("deprec4", "i4"),
+            ("StartLon", "i4"),
+            ("StartLat", "i4"),
+            ("deprec5", "i4"),
+            ("dlon", "i4"),
+            ("dlat", "i4"),
+            ("dxy_scale", "i4"),
+            ("Height", ("i4", nz)),
+            ("z_scale", "i4"),
+            ("placeholder1", ("i4", 10)),
+            ("VarName", "S20"),
+            ("VarUnit", "S6"),
+            ("var_scale", "i4"),
+            ("missing_value", "i4"),
+            ("NR", "i4"),
+            ("Radars", ("S4", nr)),
+            ("data3d", ("i2", (nz, nlat, nlon))),
+        ]
+    )
+
+
+@dataclass(frozen=True)
+class BinaryHeader:
+    """
+    decoded header of an MRMS binary file; `offset` is the byte position of
+    data3d in the (decompressed) stream, data3d rows run south to north
+    """
+
+    time: datetime.datetime
+    nlon: int
+    nlat: int
+    nz: int
+    start_lat: float
+    start_lon: float
+    lat_spacing: float
+    lon_spacing: float
+    height: tuple[float, ...]
+    var_name: str
+    var_unit: str
+    var_scale: int
+    missing_value: int
+    offset: int
+    gzipped: bool
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        return self.nz, self.nlat, self.nlon
+
+    @property
+    def latitude(self) -> np.ndarray:
+        """latitudes in storage order (ascending)"""
+        lat = self.start_lat - self.lat_spacing * np.arange(self.nlat)
+        return lat[::-1]
+
+    @property
+    def longitude(self) -> np.ndarray:
+        return self.start_lon + self.lon_spacing * np.arange(self.nlon)
+
+
+def is_gzip(file: Source) -> bool:
+    if isinstance(file, io.BytesIO):
+        return file.getvalue()[:2] == GZIP_MAGIC
+    with open(file, "rb") as f:
+        return f.read(2) == GZIP_MAGIC
+
+
+def open_binary(file: Source) -> BinaryIO:
+    """
+    open a raw or gzipped binary file based on its magic bytes. buffers get a
+    cursor of their own over the same bytes, so concurrent readers are safe
+    """
+    if isinstance(file, io.BytesIO):
+        # getvalue shares the underlying bytes rather than copying them
+        f = io.BytesIO(file.getvalue())
+        return gzip.GzipFile(fileobj=f, mode="rb") if is_gzip(file) else f
+    return gzip.open(file, "rb") if is_gzip(file) else open(file, "rb")
+
+
+def read_header(file: Source) -> BinaryHeader:
+    """read only the header of an MRMS binary file"""
+    if not isinstance(file, io.BytesIO):
+        file = Path(file)
+    with open_binary(file) as f:
+        fixed = f.read(FIXED_HEADER_SIZE)
+        if not is_plausible_header(fixed):
+            name = getattr(file, "name", "buffer")
+            raise ValueError(f"{name} is not an MRMS binary file")
+        nz = int(np.frombuffer(fixed, dtype="i4", count=1, offset=8 * 4)[0])
+        f.seek(FIXED_HEADER_SIZE + 4 * nz + VARIABLE_HEADER_SIZE)
+        nr = int(np.frombuffer(f.read(4), dtype="i4")[0])
+        f.seek(0)
+        dt = construct_dtype(nz, 0, 0, nr)
+        (head,) = np.frombuffer(f.read(dt.itemsize), dtype=dt)
+
+    map_scale = float(head["map_scale"])
+    dxy_scale = float(head["dxy_scale"])
+    return BinaryHeader(
+        time=datetime.datetime(
+            *(int(head[key]) for key in ("year", "month", "day", "hour", "minute"))
+        )
+        + datetime.timedelta(seconds=int(head["second"])),
+        nlon=int(head["nlon"]),
+        nlat=int(head["nlat"]),
+        nz=nz,
+        start_lat=float(head["StartLat"] / map_scale),
+        start_lon=float(head["StartLon"] / map_scale),
+        lat_spacing=float(head["dlat"] / dxy_scale),
+        lon_spacing=float(head["dlon"] / dxy_scale),
+        height=tuple(np.atleast_1d(head["Height"] / float(head["z_scale"])).tolist()),
+        var_name=head["VarName"].decode(errors="ignore").strip(" \x00"),
+        var_unit=head["VarUnit"].decode(errors="ignore").strip(" \x00"),
+        var_scale=int(head["var_scale"]),
+        missing_value=int(head["missing_value"]),
+        offset=dt.fields["data3d"][1],
+        gzipped=is_gzip(file),
+    )
+
+
+def is_plausible_header(buffer: bytes) -> bool:
+    """
+    check the fixed header integers for sane values; used to recognize a
+    binary file (after decompression) without reading any of data3d
+    """
+    if len(buffer) < FIXED_HEADER_SIZE:
+        return False
+    fixed = np.frombuffer(buffer, dtype="i4", count=20).tolist()
+    year, month, day, hour, minute, second, nlon, nlat, nz = fixed[:9]
+    map_scale, dxy_scale = fixed[10], fixed[19]
+    return (
+        1990 <= year <= 2100
+        and 1 <= month <= 12
+        and 1 <= day <= 31
+        and 0 <= hour <= 23
+        and 0 <= minute <= 59
+        and 0 <= second <= 60
+        and 0 < nlon <= 100_000
+        and 0 < nlat <= 100_000
+        and 0 < nz <= 1_000
+        and map_scale > 0
+        and dxy_scale > 0
+    )
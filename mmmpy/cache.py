@@ -0,0 +1,163 @@
+"""
+on disk caches shared between processes
+"""
+__all__ = ["IndexCache", "ListingState"]
+
+import os
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+from typing import Iterable, Mapping, Optional
+
+from .typing import StrPath
+from .constants import INDEX_CACHE_DIR, INDEX_CACHE_MAX_BYTES, LISTING_STATE_PATH
+
+INDEX_SUFFIX = ".idx"
+
+
+class IndexCache:
+    """
+    size bounded directory of cfgrib index files.
+
+    index files mirror the absolute path of the grib file they describe, so
+    any process opening the same file reuses the index instead of rescanning
+    the grib messages. cfgrib itself discards an index that is older than its
+    grib file. the least recently used indexes are evicted once the
+    directory grows past `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        directory: StrPath = INDEX_CACHE_DIR,
+        max_bytes: int = INDEX_CACHE_MAX_BYTES,
+    ) -> None:
+        self.directory = Path(directory).expanduser().absolute()
+        self.max_bytes = max_bytes
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({str(self.directory)!r}, max_bytes={self.max_bytes})"
+
+    @property
+    def indexpath(self) -> str:
+        """template for the cfgrib `indexpath` backend kwarg"""
+        return str(self.directory) + "{path}.{short_hash}" + INDEX_SUFFIX
+
+    def prepare(self, files: Iterable[StrPath]) -> None:
+        """create the directories cfgrib will write the index files into"""
+        for file in files:
+            self._mirror(file).parent.mkdir(parents=True, exist_ok=True)
+
+    def touch(self, files: Iterable[StrPath]) -> None:
+        """mark the indexes of files as recently used"""
+        now = time.time()
+        for file in files:
+            mirror = self._mirror(file)
+            for index in mirror.parent.glob(mirror.name + ".*" + INDEX_SUFFIX):
+                try:
+                    os.utime(index, (now, now))
+                except FileNotFoundError:
+                    # evicted by another process
+                    continue
+
+    def evict(self) -> None:
+        """remove the least recently used indexes until under max_bytes"""
+        entries = []
+        for index in self.directory.rglob("*" + INDEX_SUFFIX):
+            try:
+                stat = index.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, index))
+        total = sum(size for _, size, _ in entries)
+        for _, size, index in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            index.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self) -> None:
+        for index in self.directory.rglob("*" + INDEX_SUFFIX):
+            index.unlink(missing_ok=True)
+
+    def _mirror(self, file: StrPath) -> Path:
+        # xarray hands cfgrib absolute paths
+        path = os.path.abspath(os.path.expanduser(file))
+        return Path(str(self.directory) + path)
+
+
+class ListingState:
+    """
+    small json state file for polling directory listings.
+
+    for every listing url the ETag/Last-Modified validators and the parsed
+    names are kept, so an unchanged page costs a conditional GET answered
+    with 304 instead of parsing its html again. urls of files that were
+    already fetched are kept until they drop out of the listings.
+    """
+
+    def __init__(self, path: StrPath = LISTING_STATE_PATH) -> None:
+        self.path = Path(path).expanduser().absolute()
+        self._lock = threading.Lock()
+        self._listings: dict[str, dict] = {}
+        self._fetched: set[str] = set()
+        if self.path.exists():
+            state = json.loads(self.path.read_text())
+            self._listings = state.get("listings", {})
+            self._fetched = set(state.get("fetched", []))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({str(self.path)!r})"
+
+    def validators(self, url: str) -> dict[str, str]:
+        """conditional request headers for the cached copy of url"""
+        entry = self._listings.get(url, {})
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def listing(self, url: str) -> Optional[list[str]]:
+        """the names parsed from url when it was last downloaded"""
+        entry = self._listings.get(url)
+        return None if entry is None else entry["names"]
+
+    def update(self, url: str, headers: Mapping[str, str], names: list[str]) -> None:
+        with self._lock:
+            self._listings[url] = {
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "names": list(names),
+            }
+
+    def is_fetched(self, url: str) -> bool:
+        return url in self._fetched
+
+    def mark_fetched(self, url: str) -> None:
+        with self._lock:
+            self._fetched.add(url)
+
+    def save(self) -> None:
+        """write the state atomically, forgetting files no longer listed"""
+        with self._lock:
+            listed = {
+                url + name
+                for url, entry in self._listings.items()
+                for name in entry["names"]
+            }
+            self._fetched &= listed
+            state = {"listings": self._listings, "fetched": sorted(self._fetched)}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # a unique name, other processes may be saving the same state
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.path.parent, prefix=self.path.name, delete=False
+            ) as f:
+                try:
+                    json.dump(state, f)
+                except BaseException:
+                    os.unlink(f.name)
+                    raise
+            os.replace(f.name, self.path)
@@ -1,9 +1,8 @@
-import uuid
+import os
+import tempfile
 from pathlib import Path
 import numpy as np
 
-# from mpl_toolkits.basemap import Basemap, cm
-
 # Hard coding of constants
 DEFAULT_CLEVS = np.arange(15) * 5.0
 DEFAULT_VAR = "mrefl3d"
@@ -11,7 +10,32 @@ DEFAULT_VAR_LABEL = "Reflectivity (dBZ)"
 V1_DURATION = 300.0  # seconds
 V2_DURATION = 120.0  # seconds
 ALTITUDE_SCALE_FACTOR = 1000.0  # Divide meters by this to get something else
-# DEFAULT_CMAP = cm.GMT_wysiwyg
+EARTH_RADIUS = 6371.0  # km, mean radius
+# km, the radius compute_grid_attributes sizes grid cells with
+CELL_EARTH_RADIUS = 6371.1
+# nodes of the GMT_wysiwyg colormap, evenly spaced; see mmmpy.display
+GMT_WYSIWYG = [
+    "#400040",
+    "#4000c0",
+    "#0040ff",
+    "#0080ff",
+    "#00a0ff",
+    "#40c0ff",
+    "#40e0ff",
+    "#40ffff",
+    "#40ffc0",
+    "#40ff40",
+    "#80ff40",
+    "#c0ff40",
+    "#ffff40",
+    "#ffe040",
+    "#ffa040",
+    "#ff6040",
+    "#ff2040",
+    "#ff60c0",
+    "#ffa0ff",
+    "#ffe0ff",
+]
 DEFAULT_PARALLELS = 10  # [20, 37.5, 40, 55]
 DEFAULT_MERIDIANS = 10  # [230, 250, 265, 270, 280, 300]
 HORIZONTAL_PLOT = [0.1, 0.1, 0.8, 0.8]
@@ -65,4 +89,15 @@ GRIB = CaseInsitiveString("grib")
 GRIB2 = CaseInsitiveString("grib2")
 NETCDF = CaseInsitiveString("netcdf")
 BINARY = CaseInsitiveString("binary")
-TMPDIR = Path(f"/tmp/mmmpy-{uuid.uuid1()}/")
+# tmpfs mount, files written here never reach the disk
+SHM_DIR = Path("/dev/shm")
+# unpacked archive members get a unique directory below SCRATCH_ROOT per call
+SCRATCH_ROOT = SHM_DIR if SHM_DIR.is_dir() else Path(tempfile.gettempdir())
+SCRATCH_MAX_BYTES = int(os.environ.get("MMMPY_SCRATCH_MAX_BYTES", 4 * 1024**3))
+
+# shared cfgrib index cache, override the location with MMMPY_CACHE_DIR
+CACHE_DIR = Path(os.environ.get("MMMPY_CACHE_DIR", Path.home() / ".cache" / "mmmpy"))
+INDEX_CACHE_DIR = CACHE_DIR / "cfgrib"
+INDEX_CACHE_MAX_BYTES = 256 * 1024**2
+# listings and fetched files remembered between ncep polls
+LISTING_STATE_PATH = CACHE_DIR / "ncep-listings.json"
@@ -4,7 +4,10 @@ from numpy.ma import MaskedArray
 import pandas as pd
 import dask.dataframe as dd
 import xarray as xr
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+from .overview import overview_factor
+from .sample import Grid, Method, point_weights
 
 
 @dataclass
@@ -82,11 +85,66 @@ class MRMSDataset(XARRAY_STORE):
     def plot(self) -> "MRMSDisplay":
         return MRMSDisplay(self)
 
+    def sample_points(
+        self, lat: np.ndarray, lon: np.ndarray, method: Method = "nearest"
+    ) -> xr.Dataset:
+        """
+        every variable sampled at the points lat, lon along a new `point`
+        dimension, in place of latitude and longitude, shaped (validTime,
+        point, heightAboveSea) like read_points; all times and heights are
+        sampled in one vectorized call. indices come from the regular grid
+        spacing and are cached for repeated point lists. NaN off the grid
+        """
+        data = self.data
+        weights = point_weights(
+            Grid.from_coords(data.latitude, data.longitude), lat, lon, method
+        )
+        npoints = weights.valid.size
+        sampled = xr.apply_ufunc(
+            weights,
+            data,
+            input_core_dims=[["latitude", "longitude"]],
+            output_core_dims=[["point"]],
+            dask="parallelized",
+            output_dtypes=["f8"],
+            dask_gufunc_kwargs={"output_sizes": {"point": npoints}},
+        )
+        # columns run along the last axis, as read_points returns them
+        return sampled.transpose(
+            ..., "point", "heightAboveSea", missing_dims="ignore"
+        ).assign_coords(
+            latitude=("point", np.ravel(lat)), longitude=("point", np.ravel(lon))
+        )
+
+    def overview(self, factor: int) -> "MRMSDataset":
+        """
+        the dataset coarsened by `factor` in latitude and longitude, every cell
+        the max of the cells it covers so storm cores are preserved. built on
+        first use and kept in memory (persisted when dask backed)
+        """
+        if factor == 1:
+            return self
+        overviews = self.__dict__.setdefault("_overviews", {})
+        if factor not in overviews:
+            coarse = self.data.coarsen(
+                latitude=factor, longitude=factor, boundary="pad"
+            )
+            overviews[factor] = MRMSDataset(coarse.max().persist(), self._name)
+        return overviews[factor]
+
 
 @dataclass
 class MRMSDisplay:
     mrms: MRMSDataset
-    bbox: BBox = BBox(1, 2, 3, 4)
+    bbox: BBox = field(default_factory=lambda: BBox(1, 2, 3, 4))
+
+    def overview(self, shape: tuple[int, int]) -> MRMSDataset:
+        """
+        the coarsest overview that still has a cell for every pixel of an
+        image `shape` (rows, columns) pixels in size
+        """
+        cells = (self.mrms.latitude.size, self.mrms.longitude.size)
+        return self.mrms.overview(overview_factor(cells, shape))
 
     """
     not to be instantiated directly
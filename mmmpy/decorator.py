@@ -1,13 +1,11 @@
 """module of utility decorator functions"""
 
-import uuid
-import gzip
-import shutil
-import zipfile
 import warnings
 from pathlib import Path
-from typing import Callable, TypeVar
+from typing import Callable, Optional, TypeVar
 
+from .io import unpack, unpacked_size
+from .scratch import SCRATCH
 
 StrPath = TypeVar("StrPath", str, Path)
 
@@ -17,18 +15,23 @@ GRIB = "grib"
 GRIB2 = "grib2"
 NETCDF = "netcdf"
 BINARY = "binary"
-TMPDIR = f"/tmp/mmmpy-{uuid.uuid1()}/"
 
 
-def unzip(tmpdir: StrPath):
+def unzip(tmpdir: Optional[StrPath] = None, workers: Optional[int] = None):
     """
     decorator function used to unzip various types of mrms archive data.
 
     - converts string like paths to Path objects
-    - unzips .zip & .gzip
-    - yields Path objects to the location the files were unziped too
+    - unzips .zip & .gzip, members are decompressed by a pool of `workers`
+      threads
+    - yields Path objects to the location the files were unziped too, in
+      archive order
     - yields the type of file passed netcdf, grib, binary...
 
+    every call unzips into its own directory below `tmpdir` (the shared
+    scratch root by default) that is removed when the function returns, so
+    decorated functions can run concurrently.
+
     ```
     @mmmpy.unzip("mytmp/folder/")
     def myfunction(files:Path,filetype:str):
@@ -36,29 +39,11 @@ def unzip(tmpdir: StrPath):
     myfunction("path/to/some.zip")
     ```
     """
-    if isinstance(tmpdir, str):
-        tmpdir = Path(tmpdir)
-
-    def iterfiles():
-        for file in tmpdir.glob("*"):
-            # handle any gziped files
-            if GZIP in file.suffixes:
-                with gzip.open(file) as ref:
-                    file = tmpdir / file.name.removesuffix(".gz")
-                    with file.open("wb") as fout:
-                        shutil.copyfileobj(ref, fout)
-            yield file
-        # shutil.rmtree(tmpdir)
 
     # callback functions intended to handle extracting various
     def __outter(func: Callable):
         # @wraps(func)
         def __inner(file: Path | str, *args, **kwargs):
-            if tmpdir.exists():
-                # clear the tmp directory
-                shutil.rmtree(tmpdir)
-                # and create an empty one
-                tmpdir.mkdir()
             # create Path object from string if string was passed
             if isinstance(file, str):
                 file = Path(file)
@@ -77,13 +62,11 @@ def unzip(tmpdir: StrPath):
                 warnings.warn(
                     f"unknown filetype; decoding with binary method {file.name}"
                 )
-            # handle any passed zipfiles
-            if ZIP in file.name:
-                with zipfile.ZipFile(file, "r") as ref:
-                    # dumpy every thing into the tmpdir
-                    ref.extractall(tmpdir)
-
-            return func(iterfiles(), filetype, **kwargs)
+            # a fresh directory per call, removed once func returns
+            with SCRATCH.directory(unpacked_size(file), root=tmpdir) as calldir:
+                # zip members and gzipped files are unpacked concurrently
+                files = unpack(file, calldir, workers=workers)
+                return func(files, filetype, **kwargs)
 
         return __inner
 
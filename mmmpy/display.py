@@ -0,0 +1,941 @@
+"""
+plotting for MosaicTile and MosaicStitch instances. kept apart from _mmmpy so
+that reading, stitching and writing mosaics never imports matplotlib, and
+Basemap is only imported when a map is actually drawn.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+from matplotlib import pyplot as plt
+from matplotlib import rcParams
+from matplotlib.colors import BoundaryNorm, LinearSegmentedColormap
+
+from .constants import GMT_WYSIWYG
+from .overview import overview_factor
+from ._mmmpy import (
+    DEFAULT_CLEVS,
+    DEFAULT_LATLABEL,
+    DEFAULT_LATRANGE,
+    DEFAULT_LINEWIDTH,
+    DEFAULT_LONLABEL,
+    DEFAULT_LONRANGE,
+    DEFAULT_MERIDIANS,
+    DEFAULT_PARALLELS,
+    DEFAULT_VAR,
+    DEFAULT_VAR_LABEL,
+    DEFAULT_ZLABEL,
+    THREE_PANEL_SUBPLOT_A,
+    THREE_PANEL_SUBPLOT_B,
+    THREE_PANEL_SUBPLOT_C,
+    _method_footer_printout,
+    _method_header_printout,
+    _print_variable_does_not_exist,
+    epochtime_to_string,
+)
+
+# same colors as Basemap's cm.GMT_wysiwyg, without importing Basemap for them
+DEFAULT_CMAP = LinearSegmentedColormap.from_list(
+    "GMT_wysiwyg", GMT_WYSIWYG, N=rcParams["image.lut"]
+)
+# map x depends only on longitude and map y only on latitude
+RASTER_PROJECTIONS = ("merc", "cyl")
+# map domains, and grids per domain, kept by map_background()
+MAP_CACHE_SIZE = 8
+GRID_CACHE_SIZE = 2
+
+
+class MosaicDisplay(object):
+
+    """
+    Class used for plotting MRMS data. To use:
+    display = MosaicDisplay(tile), where tile is MosaicTile or Stitch instance
+    """
+
+    def __init__(self, mosaic):
+        self.mosaic = mosaic
+
+    def plot_horiz(
+        self,
+        var=DEFAULT_VAR,
+        latrange=DEFAULT_LATRANGE,
+        lonrange=DEFAULT_LONRANGE,
+        resolution="l",
+        level=None,
+        parallels=DEFAULT_PARALLELS,
+        area_thresh=10000,
+        meridians=DEFAULT_MERIDIANS,
+        title=None,
+        clevs=DEFAULT_CLEVS,
+        basemap=None,
+        embellish=True,
+        cmap=DEFAULT_CMAP,
+        save=None,
+        show_grid=True,
+        linewidth=DEFAULT_LINEWIDTH,
+        fig=None,
+        ax=None,
+        verbose=False,
+        return_flag=False,
+        colorbar_flag=True,
+        colorbar_loc="bottom",
+        raster=False,
+        decimate=True,
+        cached=False,
+        overview=True,
+    ):
+        """
+        Plots a basemap projection with a plan view of the mosaic radar data.
+        The projection can be used to incorporate other data into figure
+        (e.g., lightning).
+        var = Variable to be plotted.
+        latrange = Desired latitude range of plot (2-element list).
+        lonrange = Desired longitude range of plot (2-element list).
+        level = If set, performs horizontal cross-section thru that altitude,
+                or as close as possible to it. If not set, will plot composite.
+        meridians, parallels = Scalars to denote desired gridline spacing.
+        linewidth = Width of gridlines (default=0).
+        show_grid = Set to False to suppress gridlines and lat/lon labels.
+        title = Plot title string, None = Basic time & date string as title.
+                So if you want a blank title use title='' as keyword.
+        clevs = Desired contour levels.
+        cmap = Desired color map.
+        basemap = Assign to basemap you want to use.
+        embellish = Set to false to suppress basemap changes.
+        colorbar_loc = Options: 'bottom', 'top', 'right', 'left'
+        save = File to save image to. Careful, PS/EPS/PDF can get large!
+        verbose = Set to True if you want a lot of text for debugging.
+        resolution = Resolution of Basemap instance (e.g., 'c', 'l', 'i', 'h')
+        area_thresh = Area threshold to show lakes, etc. (km^2)
+        return_flag = Set to True to return plot info.
+                      Order is Figure, Axis, Basemap
+        raster = Set to True to draw the data as an image instead of filled
+                 contours. Much faster for large (e.g., CONUS) grids, since
+                 only 1D lat/lon vectors are projected (Mercator and
+                 cylindrical maps only, otherwise contours are drawn).
+        decimate = Raster only. True samples the grid at the output pixel
+                   size and draws it with imshow; False draws every grid cell
+                   with pcolormesh.
+        cached = Set to True to reuse the map for this domain across calls,
+                 see map_background(). Only the data layer and gridlines are
+                 drawn for each frame. Ignored if basemap is set.
+        overview = Plot the coarsest max-pooled overview of the mosaic (see
+                   MosaicTile.get_overview) that still has a gridpoint for
+                   every pixel of the map. False always plots the full grid.
+        """
+        method_name = "plot_horiz"
+        ax, fig = self._parse_ax_fig(ax, fig)
+        if verbose:
+            _method_header_printout(method_name)
+        if not hasattr(self.mosaic, var):
+            _print_variable_does_not_exist(method_name, var)
+            if verbose:
+                _method_footer_printout()
+            return
+        if self.mosaic.nlon <= 1 or self.mosaic.nlat <= 1:
+            print("Latitude or Longitude too small to plot")
+            if verbose:
+                _method_footer_printout()
+            return
+        if verbose:
+            print("Executing plot")
+        background = None
+        if basemap is not None:
+            m = basemap
+        elif cached:
+            background = map_background(latrange, lonrange, resolution, area_thresh)
+            m = background.basemap
+        else:
+            m = self._create_basemap_instance(
+                latrange, lonrange, resolution, area_thresh
+            )
+        if embellish:
+            m = self._add_gridlines_if_desired(
+                m, parallels, meridians, linewidth, latrange, lonrange, show_grid
+            )
+        display = self._get_overview_display(m, ax, var) if overview else self
+        zdata, slevel = display._get_horizontal_cross_section(var, level, verbose)
+        if raster and m.projection not in RASTER_PROJECTIONS:
+            print(m.projection, "projection is not separable, drawing contours")
+            raster = False
+        if raster:
+            # zdata is (lon, lat), the raster is drawn in (lat, lon) order
+            cs = display._plot_raster(m, ax, zdata.T, clevs, cmap, decimate)
+        else:
+            # Removed np.transpose() step from here as it was crashing
+            # map proj coordinates under Python 3.
+            plon = display.mosaic.Longitude
+            plat = display.mosaic.Latitude
+            if background is None:
+                x, y = m(plon, plat)  # compute map proj coordinates.
+            else:
+                x, y = background.coordinates(plat, plon)
+            # Draw filled contours
+            # Note the need to transpose for plotting purposes
+            cs = m.contourf(x.T, y.T, zdata, clevs, cmap=cmap)
+        # cs = m.pcolormesh(x, y, zdata, vmin=np.min(clevs),
+        #                   vmax=np.max(clevs), cmap=cmap)
+        if background is not None:
+            background.draw(ax)
+        # Add colorbar, title, and save
+        if colorbar_flag:
+            cbar = m.colorbar(cs, location=colorbar_loc, pad="7%")
+            if var == DEFAULT_VAR:
+                cbar.set_label(DEFAULT_VAR_LABEL)
+            else:
+                # Placeholder for future dual-pol functionality
+                cbar.set_label(var)
+        if title is None:
+            title = epochtime_to_string(self.mosaic.Time) + slevel
+        plt.title(title)
+        if save is not None:
+            plt.savefig(save)
+        # Clean up
+        if verbose:
+            _method_footer_printout()
+        if return_flag:
+            return fig, ax, m
+
+    def plot_vert(
+        self,
+        var=DEFAULT_VAR,
+        lat=None,
+        lon=None,
+        xrange=None,
+        xlabel=None,
+        colorbar_flag=True,
+        zrange=None,
+        zlabel=DEFAULT_ZLABEL,
+        fig=None,
+        ax=None,
+        clevs=DEFAULT_CLEVS,
+        cmap=DEFAULT_CMAP,
+        title=None,
+        save=None,
+        verbose=False,
+        return_flag=False,
+    ):
+        """
+        Plots a vertical cross-section through mosaic radar data.
+        var = Variable to be plotted.
+        lat/lon = If set, performs vertical cross-section thru that lat/lon,
+                  or as close as possible to it. Only one or the other
+                  can be set.
+        xrange = Desired latitude or longitude range of plot (2-element list).
+        zrange = Desired height range of plot (2-element list).
+        xlabel, zlabel = Axes labels.
+        clevs = Desired contour levels.
+        cmap = Desired color map.
+        title = String for plot title, None = Basic time & date as title.
+                So if you want a blank title use title='' as keyword.
+        save = File to save image to. Careful, PS/EPS/PDF can get large!
+        verbose = Set to True if you want a lot of text for debugging.
+        return_flag = Set to True to return Figure, Axis objects
+        """
+        method_name = "plot_vert"
+        ax, fig = self._parse_ax_fig(ax, fig)
+        if verbose:
+            _method_header_printout(method_name)
+        if not hasattr(self.mosaic, var):
+            _print_variable_does_not_exist(method_name, var)
+            if verbose:
+                _method_footer_printout()
+            return
+        # Get the cross-section
+        vcut, xvar, xrange, xlabel, tlabel = self._get_vertical_slice(
+            var, lat, lon, xrange, xlabel, verbose
+        )
+        if vcut is None:
+            return
+        # Plot details
+        if not title:
+            title = epochtime_to_string(self.mosaic.Time) + " " + tlabel
+        if not zrange:
+            zrange = [0, np.max(self.mosaic.Height)]
+        # Plot execution
+        ax, cs = self._plot_vertical_cross_section(
+            ax,
+            vcut,
+            xvar,
+            xrange,
+            xlabel,
+            zrange,
+            zlabel,
+            clevs,
+            cmap,
+            title,
+            mappable=True,
+        )
+        if colorbar_flag:
+            cbar = fig.colorbar(cs)
+            if var == DEFAULT_VAR:
+                cbar.set_label(DEFAULT_VAR_LABEL, rotation=90)
+            else:
+                # Placeholder for future dual-pol functionality
+                cbar.set_label(var, rotation=90)
+        # Finish up
+        if save is not None:
+            plt.savefig(save)
+        if verbose:
+            _method_footer_printout()
+        if return_flag:
+            return fig, ax
+
+    def plot_cross_section(
+        self,
+        start,
+        end,
+        var=DEFAULT_VAR,
+        npoints=None,
+        method="bilinear",
+        xlabel="Distance (km)",
+        colorbar_flag=True,
+        zrange=None,
+        zlabel=DEFAULT_ZLABEL,
+        fig=None,
+        ax=None,
+        clevs=DEFAULT_CLEVS,
+        cmap=DEFAULT_CMAP,
+        title=None,
+        save=None,
+        verbose=False,
+        return_flag=False,
+    ):
+        """
+        Plots a vertical cross-section along the great circle from start to
+        end, each a (lat, lon) pair, e.g. a storm-relative transect.
+        start, end = Endpoints of the cross-section.
+        npoints = Number of samples along it, default is about one per
+                  gridpoint. See MosaicTile.get_cross_section().
+        method = Interpolation, 'bilinear' or 'nearest'.
+        Other keywords are as in plot_vert(). The x axis is distance (km)
+        from start.
+        return_flag = Set to True to return Figure, Axis, CrossSection
+        """
+        method_name = "plot_cross_section"
+        ax, fig = self._parse_ax_fig(ax, fig)
+        if verbose:
+            _method_header_printout(method_name)
+        if not hasattr(self.mosaic, var):
+            _print_variable_does_not_exist(method_name, var)
+            if verbose:
+                _method_footer_printout()
+            return
+        section = self.mosaic.get_cross_section(
+            start, end, npoints=npoints, var=var, method=method
+        )
+        if title is None:
+            title = epochtime_to_string(
+                self.mosaic.Time
+            ) + " (%.2f, %.2f) to (%.2f, %.2f)" % (tuple(start) + tuple(end))
+        if not zrange:
+            zrange = [0, np.max(self.mosaic.Height)]
+        xrange = [0, np.max(section.distance)]
+        ax, cs = self._plot_vertical_cross_section(
+            ax,
+            section.values,
+            section.distance,
+            xrange,
+            xlabel,
+            zrange,
+            zlabel,
+            clevs,
+            cmap,
+            title,
+            mappable=True,
+        )
+        if colorbar_flag:
+            cbar = fig.colorbar(cs)
+            if var == DEFAULT_VAR:
+                cbar.set_label(DEFAULT_VAR_LABEL, rotation=90)
+            else:
+                cbar.set_label(var, rotation=90)
+        if save is not None:
+            plt.savefig(save)
+        if verbose:
+            _method_footer_printout()
+        if return_flag:
+            return fig, ax, section
+
+    def three_panel_plot(
+        self,
+        var=DEFAULT_VAR,
+        lat=None,
+        lon=None,
+        latrange=DEFAULT_LATRANGE,
+        lonrange=DEFAULT_LONRANGE,
+        meridians=None,
+        parallels=None,
+        linewidth=DEFAULT_LINEWIDTH,
+        resolution="l",
+        show_grid=True,
+        level=None,
+        area_thresh=10000,
+        lonlabel=DEFAULT_LONLABEL,
+        latlabel=DEFAULT_LATLABEL,
+        zrange=None,
+        zlabel=DEFAULT_ZLABEL,
+        clevs=DEFAULT_CLEVS,
+        cmap=DEFAULT_CMAP,
+        title_a=None,
+        title_b=None,
+        title_c=None,
+        xrange_b=None,
+        xrange_c=None,
+        save=None,
+        verbose=False,
+        return_flag=False,
+        show_crosshairs=True,
+        raster=False,
+        cached=False,
+    ):
+        """
+        Plots horizontal and vertical cross-sections through mosaic radar data.
+        Subplot (a) is the horizontal view, (b) is the
+        var = Variable to be plotted.
+        latrange = Desired latitude range of plot (2-element list).
+        lonrange = Desired longitude range of plot (2-element list).
+        level = If set, performs horizontal cross-section thru that altitude,
+                or as close as possible to it. If not set, will plot composite.
+        meridians, parallels = Scalars to denote desired gridline spacing.
+        linewidth = Width of gridlines (default=0).
+        show_grid = Set to False to suppress gridlines and lat/lon tick labels.
+        title_a, _b, _c = Strings for subplot titles, None = Basic time & date
+                          string as title for subplot (a), and constant lat/lon
+                          for (b) and (c). So if you want blank titles use
+                          title_?='' as keywords.
+        clevs = Desired contour levels.
+        cmap = Desired color map.
+        save = File to save image to. Careful, PS/EPS/PDF can get large!
+        verbose = Set to True if you want a lot of text for debugging.
+        zrange = Desired height range of plot (2-element list).
+        resolution = Resolution of Basemap instance (e.g., 'c', 'l', 'i', 'h')
+        area_thresh = Area threshold to show lakes, etc. (km^2)
+        lonlabel, latlabel, zlabel = Axes labels.
+        lat/lon = Performs vertical cross-sections thru those lat/lons,
+                  or as close as possible to them. Both are required to be set!
+        return_flag = Set to True to return plot info.
+                      Order is Figure, Axes (3 of them), Basemap.
+        show_crosshairs = Set to False to suppress the vertical cross-section
+                          crosshairs on the horizontal cross-section.
+        xrange_b, _c = Subplot (b) is constant latitude, so xrange_b is is a
+                       2-element list that allows the user to adjust the
+                       longitude domain of (b). Default lonrange if not set.
+                       Similar setup for xrange_c - subplot (c) - except for
+                       latitude (i.e., defaults to latrange if not set). The
+                       xrange_? variables determine length of crosshairs.
+        raster = Set to True to draw subplot (a) as an image, see plot_horiz.
+        cached = Set to True to reuse the map of subplot (a), see plot_horiz.
+        """
+        method_name = "three_panel_plot"
+        plt.close()  # mpl seems buggy if you don't clean up old windows
+        if verbose:
+            _method_header_printout(method_name)
+        if not hasattr(self.mosaic, var):
+            _print_variable_does_not_exist(method_name, var)
+            if verbose:
+                _method_footer_printout()
+            return
+        if self.mosaic.nlon <= 1 or self.mosaic.nlat <= 1:
+            print("Latitude or Longitude too small to plot")
+            if verbose:
+                _method_footer_printout()
+            return
+        if lat is None or lon is None:
+            print(
+                method_name + "(): Need both constant latitude and",
+                "constant longitude for slices",
+            )
+            if verbose:
+                _method_footer_printout()
+            return
+        fig = plt.figure()
+        fig.set_size_inches(11, 8.5)
+        # Horizontal Cross-Section + Color Bar (subplot a)
+        ax1 = fig.add_axes(THREE_PANEL_SUBPLOT_A)
+        if not title_a:
+            slevel, index = self._get_slevel(level, verbose)
+            title_a = "(a) " + epochtime_to_string(self.mosaic.Time) + slevel
+        fig, ax1, m = self.plot_horiz(
+            var=var,
+            title=title_a,
+            latrange=latrange,
+            lonrange=lonrange,
+            level=level,
+            meridians=meridians,
+            parallels=parallels,
+            return_flag=True,
+            linewidth=linewidth,
+            show_grid=show_grid,
+            clevs=clevs,
+            cmap=cmap,
+            verbose=verbose,
+            area_thresh=area_thresh,
+            resolution=resolution,
+            raster=raster,
+            cached=cached,
+        )
+        if xrange_b is None:
+            xrange_b = lonrange
+        if not xrange_c:
+            xrange_c = latrange
+        if show_crosshairs:
+            m = self._add_crosshairs(m, lat, lon, xrange_b, xrange_c)
+        # Vertical Cross-Section (subplot b)
+        if not title_b:
+            lat, tlabel2 = self._parse_lat_tlabel(lat)
+            title_b = "(b) " + tlabel2
+        ax2 = fig.add_axes(THREE_PANEL_SUBPLOT_B)
+        self.plot_vert(
+            var=var,
+            lat=lat,
+            zrange=zrange,
+            xrange=xrange_b,
+            xlabel=lonlabel,
+            zlabel=zlabel,
+            cmap=cmap,
+            clevs=clevs,
+            verbose=verbose,
+            colorbar_flag=False,
+            title=title_b,
+        )
+        # Vertical Cross-Section (subplot c)
+        if not title_c:
+            lon, tlabel3 = self._parse_lon_tlabel(lon)
+            title_c = "(c) " + tlabel3
+        ax3 = fig.add_axes(THREE_PANEL_SUBPLOT_C)
+        self.plot_vert(
+            var=var,
+            lon=lon,
+            zrange=zrange,
+            xrange=xrange_c,
+            xlabel=latlabel,
+            zlabel=zlabel,
+            cmap=cmap,
+            clevs=clevs,
+            verbose=verbose,
+            colorbar_flag=False,
+            title=title_c,
+        )
+        # Finish up
+        if save is not None:
+            plt.savefig(save)
+        if verbose:
+            _method_footer_printout()
+        if return_flag:
+            return fig, ax1, ax2, ax3, m
+
+    def _get_slevel(self, level, verbose, print_flag=False):
+        if level is None:
+            slevel = " Composite "
+            index = None
+        else:
+            if verbose and print_flag:
+                print("Attempting to plot cross-section thru", level, "km MSL")
+            if level < np.min(self.mosaic.Height):
+                level = np.min(self.mosaic.Height)
+            elif level > np.max(self.mosaic.Height):
+                level = np.max(self.mosaic.Height)
+            index = np.argmin(np.abs(level - self.mosaic.Height))
+            level = self.mosaic.Height[index]
+            slevel = " %.1f" % level + " km MSL"
+            if verbose and print_flag:
+                print("Actually taking cross-section thru", level, "km MSL")
+        return slevel, index
+
+    def _get_horizontal_cross_section(self, var=DEFAULT_VAR, level=None, verbose=False):
+        slevel, index = self._get_slevel(level, verbose, print_flag=True)
+        if index is None:
+            if verbose:
+                print("No vertical level specified,", "plotting composite reflectivity")
+            if not hasattr(self.mosaic, var + "_comp"):
+                if verbose:
+                    print(var + "_comp does not exist,", "computing it with get_comp()")
+                self.mosaic.get_comp(var=var, verbose=verbose)
+            zdata = 1.0 * getattr(self.mosaic, var + "_comp")
+            zdata = np.transpose(zdata)
+        else:
+            temp_3d = 1.0 * getattr(self.mosaic, var)
+            zdata = temp_3d[index, :, :]
+            zdata = np.transpose(zdata)
+        return zdata, slevel
+
+    def _get_overview_display(self, m, ax, var=DEFAULT_VAR):
+        """
+        MosaicDisplay of the coarsest overview with at least as many gridpoints
+        inside the map as the map has pixels, self if there is none.
+        """
+        if not hasattr(self.mosaic, "get_overview"):
+            return self
+        # the map area of ax once Basemap has fixed its aspect
+        m.set_axes_limits(ax=ax)
+        ax.apply_aspect()
+        bbox = ax.get_window_extent()
+        lat = self.mosaic.Latitude[:, 0]
+        lon = self.mosaic.Longitude[0, :]
+        cells = (
+            np.count_nonzero((lat >= m.llcrnrlat) & (lat <= m.urcrnrlat)),
+            np.count_nonzero((lon >= m.llcrnrlon) & (lon <= m.urcrnrlon)),
+        )
+        factor = overview_factor(cells, (bbox.height, bbox.width))
+        if factor == 1:
+            return self
+        return MosaicDisplay(self.mosaic.get_overview(factor, var))
+
+    def _plot_raster(self, m, ax, zdata, clevs, cmap, decimate=True):
+        """
+        Draw zdata, a (lat, lon) array, without projecting the 2D grid. Map x
+        only depends on longitude and map y only on latitude, so projecting
+        the 1D coordinate vectors is enough to place every cell.
+        """
+        lat = self.mosaic.Latitude[:, 0]
+        lon = self.mosaic.Longitude[0, :]
+        x, _ = m(lon, np.full_like(lon, np.mean(lat)))
+        _, y = m(np.full_like(lat, np.mean(lon)), lat)
+        cmap = plt.get_cmap(cmap)
+        norm = BoundaryNorm(clevs, cmap.N)
+        if not decimate:
+            # cell edges, so every grid cell is drawn at full resolution
+            xedges = _cell_edges(np.asarray(x))
+            yedges = _cell_edges(np.asarray(y))
+            zdata = np.ma.masked_outside(zdata, np.min(clevs), np.max(clevs))
+            return m.pcolormesh(
+                xedges, yedges, zdata, cmap=cmap, norm=norm, ax=ax, shading="flat"
+            )
+        # one sample per output pixel of the map area, nearest grid cell
+        bbox = ax.get_window_extent()
+        nx = max(int(np.ceil(bbox.width)), 1)
+        ny = max(int(np.ceil(bbox.height)), 1)
+        cols = _nearest_cells(np.asarray(x), _pixel_centers(m.llcrnrx, m.urcrnrx, nx))
+        rows = _nearest_cells(np.asarray(y), _pixel_centers(m.llcrnry, m.urcrnry, ny))
+        image = zdata[np.ix_(np.maximum(rows, 0), np.maximum(cols, 0))]
+        outside = (rows[:, np.newaxis] < 0) | (cols[np.newaxis, :] < 0)
+        outside |= (image < np.min(clevs)) | (image > np.max(clevs))
+        image = np.ma.masked_where(outside, image)
+        return m.imshow(image, cmap=cmap, norm=norm, interpolation="nearest", ax=ax)
+
+    def _create_basemap_instance(
+        self, latrange=None, lonrange=None, resolution="l", area_thresh=10000
+    ):
+        m = _mercator_basemap(latrange, lonrange, resolution, area_thresh)
+        # Draw coastlines, state and country boundaries, edge of map
+        m.drawcoastlines()
+        m.drawstates()
+        m.drawcountries()
+        return m
+
+    def _add_gridlines_if_desired(
+        self,
+        m=None,
+        parallels=DEFAULT_PARALLELS,
+        meridians=DEFAULT_MERIDIANS,
+        linewidth=DEFAULT_LINEWIDTH,
+        latrange=None,
+        lonrange=None,
+        show_grid=True,
+    ):
+        if show_grid:
+            # Draw parallels
+            vparallels = np.arange(
+                np.floor(np.min(latrange)), np.ceil(np.max(latrange)), parallels
+            )
+            m.drawparallels(
+                vparallels, labels=[1, 0, 0, 0], fontsize=10, linewidth=linewidth
+            )
+            # Draw meridians
+            vmeridians = np.arange(
+                np.floor(np.min(lonrange)), np.ceil(np.max(lonrange)), meridians
+            )
+            m.drawmeridians(
+                vmeridians, labels=[0, 0, 0, 1], fontsize=10, linewidth=linewidth
+            )
+        return m
+
+    def _add_crosshairs(self, m=None, lat=None, lon=None, xrange_b=None, xrange_c=None):
+        cross_xrange = [np.min(xrange_b), np.max(xrange_b)]
+        constant_lat = [lat, lat]
+        cross_yrange = [np.min(xrange_c), np.max(xrange_c)]
+        constant_lon = [lon, lon]
+        xc1, yc1 = m(cross_xrange, constant_lat)
+        xc2, yc2 = m(constant_lon, cross_yrange)
+        m.plot(xc1, yc1, "k--", linewidth=2)
+        m.plot(xc1, yc1, "r--", linewidth=1)
+        m.plot(xc2, yc2, "k--", linewidth=2)
+        m.plot(xc2, yc2, "r--", linewidth=1)
+        return m
+
+    def _get_vertical_slice(
+        self,
+        var=DEFAULT_VAR,
+        lat=None,
+        lon=None,
+        xrange=None,
+        xlabel=None,
+        verbose=False,
+    ):
+        """Execute slicing, get xvar, vcut"""
+        fail = [None, None, None, None, None]
+        if lat is None and lon is None:
+            print("plot_vert(): Need a constant lat or lon for slice")
+            if verbose:
+                _method_footer_printout()
+            return fail
+        elif lat is not None and lon is not None:
+            print("plot_vert(): Need either lat or lon for slice, not both!")
+            if verbose:
+                _method_footer_printout()
+            return fail
+        else:
+            if lon is None:
+                if self.mosaic.nlon <= 1:
+                    print("Available Longitude range too small to plot")
+                    if verbose:
+                        _method_footer_printout()
+                    return fail
+                if verbose:
+                    print("Plotting vertical cross-section thru", lat, "deg Latitude")
+                if not xrange:
+                    xrange = [
+                        np.min(self.mosaic.Longitude),
+                        np.max(self.mosaic.Longitude),
+                    ]
+                if not xlabel:
+                    xlabel = "Longitude (deg)"
+                vcut, xvar, tlabel = self._get_constant_latitude_cross_section(var, lat)
+            if lat is None:
+                if self.mosaic.nlat <= 1:
+                    print("Available Latitude range too small to plot")
+                    if verbose:
+                        _method_footer_printout()
+                    return fail
+                if verbose:
+                    print("Plotting vertical cross-section thru", lon, "deg Longitude")
+                if not xrange:
+                    xrange = [
+                        np.min(self.mosaic.Latitude),
+                        np.max(self.mosaic.Latitude),
+                    ]
+                if not xlabel:
+                    xlabel = "Latitude (deg)"
+                vcut, xvar, tlabel = self._get_constant_longitude_cross_section(
+                    var, lon
+                )
+        return vcut, xvar, xrange, xlabel, tlabel
+
+    def _parse_lat_tlabel(self, lat):
+        if lat > np.max(self.mosaic.Latitude):
+            lat = np.max(self.mosaic.Latitude)
+            print("Outside domain, plotting instead thru", lat, " deg Latitude")
+        if lat < np.min(self.mosaic.Latitude):
+            lat = np.min(self.mosaic.Latitude)
+            print("Outside domain, plotting instead thru", lat, "deg Latitude")
+        return lat, "Latitude = " + "%.2f" % lat + " deg"
+
+    def _get_constant_latitude_cross_section(self, var=DEFAULT_VAR, lat=None):
+        lat, tlabel = self._parse_lat_tlabel(lat)
+        index = np.round(
+            np.abs(lat - self.mosaic.StartLat) / self.mosaic.LatGridSpacing
+        )
+        index = np.int32(index)
+        xvar = self.mosaic.Longitude[index, :]
+        temp_3d = getattr(self.mosaic, var)
+        vcut = temp_3d[:, index, :]
+        return vcut, xvar, tlabel
+
+    def _parse_lon_tlabel(self, lon):
+        if lon > np.max(self.mosaic.Longitude):
+            lon = np.max(self.mosaic.Longitude)
+            print("max", lon, np.max(self.mosaic.Longitude))
+            print("Outside domain, plotting instead thru", lon, " deg Longitude")
+        if lon < np.min(self.mosaic.Longitude):
+            lon = np.min(self.mosaic.Longitude)
+            print("min", lon, np.min(self.mosaic.Longitude))
+            print("Outside domain, plotting instead thru", lon, "deg Longitude")
+        return lon, "Longitude = " + "%.2f" % lon + " deg"
+
+    def _get_constant_longitude_cross_section(self, var=DEFAULT_VAR, lon=None):
+        lon, tlabel = self._parse_lon_tlabel(lon)
+        index = np.round(
+            np.abs(lon - self.mosaic.StartLon) / self.mosaic.LonGridSpacing
+        )
+        index = np.int32(index)
+        xvar = self.mosaic.Latitude[:, index]
+        temp_3d = getattr(self.mosaic, var)
+        vcut = temp_3d[:, :, index]
+        return vcut, xvar, tlabel
+
+    def _plot_vertical_cross_section(
+        self,
+        ax=None,
+        vcut=None,
+        xvar=None,
+        xrange=None,
+        xlabel=None,
+        zrange=None,
+        zlabel=None,
+        clevs=DEFAULT_CLEVS,
+        cmap=DEFAULT_CMAP,
+        title=None,
+        mappable=False,
+    ):
+        cs = ax.contourf(xvar, self.mosaic.Height, vcut, clevs, cmap=cmap)
+        if title:
+            ax.set_title(title)
+        ax.set_xlim(np.min(xrange), np.max(xrange))
+        ax.set_ylim(np.min(zrange), np.max(zrange))
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(zlabel)
+        if mappable:
+            return ax, cs
+        else:
+            return ax
+
+    def _parse_ax_fig(self, ax=None, fig=None):
+        """Parse and return ax and fig parameters. Adapted from Py-ART."""
+        if ax is None:
+            ax = plt.gca()
+        if fig is None:
+            fig = plt.gcf()
+        return ax, fig
+
+
+class MapBackground(object):
+
+    """
+    Everything about a map that is the same from frame to frame: the Basemap
+    instance, projected grid coordinates, and the coastlines, state and
+    country boundaries rendered once to a transparent image. Get one with
+    map_background() rather than creating it directly.
+    """
+
+    def __init__(self, latrange, lonrange, resolution="l", area_thresh=10000):
+        self.basemap = _mercator_basemap(latrange, lonrange, resolution, area_thresh)
+        self._grids = OrderedDict()
+        self._images = {}
+
+    def coordinates(self, lat, lon):
+        """Map x, y of the 2D lat/lon grid, projected once per grid."""
+        key = (np.shape(lat), lat[0, 0], lat[-1, -1], lon[0, 0], lon[-1, -1])
+        if key in self._grids:
+            self._grids.move_to_end(key)
+        else:
+            self._grids[key] = self.basemap(lon, lat)
+            while len(self._grids) > GRID_CACHE_SIZE:
+                self._grids.popitem(last=False)
+        return self._grids[key]
+
+    def draw(self, ax):
+        """
+        Draw the boundaries on ax as a single image over the data, rendering
+        it the first time ax's map area has this size in pixels.
+        """
+        m = self.basemap
+        m.set_axes_limits(ax=ax)
+        ax.apply_aspect()
+        bbox = ax.get_window_extent()
+        size = (max(int(round(bbox.width)), 1), max(int(round(bbox.height)), 1))
+        if size not in self._images:
+            self._images[size] = self._render(size)
+        extent = (m.llcrnrx, m.urcrnrx, m.llcrnry, m.urcrnry)
+        image = ax.imshow(
+            self._images[size],
+            extent=extent,
+            origin="upper",
+            interpolation="nearest",
+            zorder=2,
+        )
+        m.set_axes_limits(ax=ax)
+        return image
+
+    def _render(self, size):
+        # an offscreen figure exactly covered by the map, nothing else on it
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        dpi = rcParams["figure.dpi"]
+        fig = Figure(figsize=(size[0] / dpi, size[1] / dpi), dpi=dpi)
+        fig.patch.set_alpha(0)
+        canvas = FigureCanvasAgg(fig)
+        ax = fig.add_axes([0, 0, 1, 1])
+        ax.set_axis_off()
+        m = self.basemap
+        m.drawcoastlines(ax=ax)
+        m.drawstates(ax=ax)
+        m.drawcountries(ax=ax)
+        ax.set_xlim(m.llcrnrx, m.urcrnrx)
+        ax.set_ylim(m.llcrnry, m.urcrnry)
+        ax.set_aspect("auto")
+        canvas.draw()
+        return np.asarray(canvas.buffer_rgba()).copy()
+
+
+def map_background(
+    latrange=DEFAULT_LATRANGE,
+    lonrange=DEFAULT_LONRANGE,
+    resolution="l",
+    area_thresh=10000,
+):
+    """
+    The MapBackground of a domain, created on first use and shared by every
+    later call with the same (latrange, lonrange, resolution, area_thresh).
+    """
+    return _map_background(
+        tuple(np.ravel(latrange).tolist()),
+        tuple(np.ravel(lonrange).tolist()),
+        resolution,
+        area_thresh,
+    )
+
+
+@lru_cache(maxsize=MAP_CACHE_SIZE)
+def _map_background(latrange, lonrange, resolution, area_thresh):
+    return MapBackground(latrange, lonrange, resolution, area_thresh)
+
+
+def _mercator_basemap(latrange, lonrange, resolution="l", area_thresh=10000):
+    # Basemap is slow to import, so only load it once a map is requested
+    from mpl_toolkits.basemap import Basemap
+
+    # create Basemap instance
+    lon_0 = np.mean(lonrange)
+    lat_0 = np.mean(latrange)
+    return Basemap(
+        projection="merc",
+        lon_0=lon_0,
+        lat_0=lat_0,
+        lat_ts=lat_0,
+        llcrnrlat=np.min(latrange),
+        urcrnrlat=np.max(latrange),
+        llcrnrlon=np.min(lonrange),
+        urcrnrlon=np.max(lonrange),
+        resolution=resolution,
+        area_thresh=area_thresh,
+    )
+
+
+def _cell_edges(centers):
+    """edges of the cells around 1D, monotonic, cell centers"""
+    mid = (centers[1:] + centers[:-1]) / 2.0
+    first = 2 * centers[0] - mid[0]
+    last = 2 * centers[-1] - mid[-1]
+    return np.concatenate([[first], mid, [last]])
+
+
+def _pixel_centers(start, stop, n):
+    """centers of n equal pixels spanning start to stop"""
+    return start + (np.arange(n) + 0.5) * (stop - start) / n
+
+
+def _nearest_cells(centers, targets):
+    """
+    index of the cell (by its center) nearest to each target, -1 for targets
+    off the grid. centers may be ascending or descending.
+    """
+    order = np.argsort(centers)
+    edges = _cell_edges(centers[order])
+    index = np.searchsorted(edges, targets) - 1
+    inside = (index >= 0) & (index < len(centers))
+    return np.where(inside, order[np.clip(index, 0, len(centers) - 1)], -1)
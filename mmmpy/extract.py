@@ -1,22 +1,87 @@
 """
 functions to extract and archive mrms data from a few sources
 """
-__all__ = ["from_ncep", "from_mtarchive"]
+__all__ = [
+    "from_ncep",
+    "poll_ncep",
+    "ncep_to_zarr",
+    "from_mtarchive",
+    "stream_ncep",
+    "Level",
+]
 
+import io
+import re
+import time
 import gzip
+import zlib
+import queue
 import shutil
+import asyncio
+import warnings
+import threading
 from pathlib import Path
-from typing import Iterator
 from datetime import datetime
-from typing import Iterator
+from functools import partial
+from dataclasses import dataclass
+from collections import defaultdict
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Iterator,
+    Optional,
+    TypeVar,
+    Union,
+)
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import numpy as np
 import pandas as pd
-from requests import Session, HTTPError
-from .typing import Archive
-from .constants import GZ
+import xarray as xr
+from requests import Session, HTTPError, RequestException
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3Error
+from .binary import is_gzip
+from .cache import ListingState
+from .typing import Archive, StrPath
+from .constants import GZ, DEFAULT_VAR
+
+try:
+    import aiohttp
+
+    AIOHTTP_FLAG = True
+except ImportError:
+    AIOHTTP_FLAG = False
 
 
 HEADERS = {"accept": "gzip"}
+NCEP_3DREFL = "http://mrms.ncep.noaa.gov/data/3DRefl/"
+MTARCHIVE = "https://mtarchive.geol.iastate.edu/"
+# every day of the archive has a directory per product below this
+MTARCHIVE_DAY = "%Y/%m/%d/mrms/ncep/"
+VALID_TIME_PATTERN = re.compile(r"(\d{8}-\d{6})")
+HREF_PATTERN = re.compile(r'href="([^"?/.][^"?]*)"')
+# the most hosts a session keeps a connection pool for
+POOL_CONNECTIONS = 4
+TIMEOUT = 30
+# status codes that are worth another attempt
+RETRY_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+CHUNK_SIZE = 64 * 1024
+# seconds pipeline threads wait on a queue before checking for a shutdown
+QUEUE_POLL = 0.1
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class Level:
+    """a file fetched by stream_ncep, `values` is set when it was decoded"""
+
+    url: str
+    name: str
+    data: bytes
+    values: Optional[np.ndarray] = None
 
 
 def from_ncep(
@@ -26,69 +91,761 @@ def from_ncep(
     max_seconds: int = 300,
     archive: Archive = None,
     headers=HEADERS,
-) -> None:
+    baseurl: str = NCEP_3DREFL,
+    workers: int = 8,
+    retries: int = 3,
+    backoff: float = 0.5,
+    state: Optional[ListingState] = None,
+) -> list[Path]:
     """
-    baseurl = "http://mrms.ncep.noaa.gov/data/3DRefl/"
-
     downloads files the the mrms dataset
-    TODO: [SPECIFC PRODUCT SELECTION]
-    -
 
-    TODO: [MULTI-THREADING]
-    - add an option for multi-threading to alow for simultaneous downloads
+    the level pages are listed and the files fetched, gunzipped and written
+    by a pool of `workers` threads sharing one connection pool per host.
+    failed requests (listings included) and interrupted bodies are retried
+    `retries` times, waiting `backoff * 2**attempt` seconds in between; files
+    and levels that still fail are skipped. returns the files that were
+    written.
+
+    with a `state` the listings are requested conditionally, files fetched
+    by an earlier call are skipped and the state file is saved on return.
 
+    TODO: [SPECIFC PRODUCT SELECTION]
+    -
     """
-    baseurl = "http://mrms.ncep.noaa.gov/data/3DRefl/"
     if not destination.exists():
         destination.mkdir()
-    with Session() as session:
-        # iterating the first page provides the levels that are avaliable in the 3DRefl database
-        for url in __iterlevels(baseurl):
-            # all of the levels pages are read to get the validtimes to each of the files and file url
-            # then some logic to select only recent files
-            for file in __itertimes(url, input_dt, max_seconds):
-                try:
-                    # a request is made to hit the file url
-                    r = session.get(url + file, stream=True, headers=headers)
-                    r.raise_for_status()
-                except HTTPError:
-                    continue
-                # the response object is decompressed
-                with gzip.GzipFile(fileobj=r.raw, mode="rb") as fsrc:
-                    file = destination / file.removesuffix(GZ)
-                    # written to the local drive
-                    with file.open("wb") as fdst:
-                        shutil.copyfileobj(fsrc, fdst)
+    with __session(workers) as session, ThreadPoolExecutor(workers) as pool:
+        files = list(
+            __fetch_recent(
+                session,
+                pool,
+                destination,
+                input_dt=input_dt,
+                max_seconds=max_seconds,
+                headers=headers,
+                baseurl=baseurl,
+                retries=retries,
+                backoff=backoff,
+                state=state,
+            )
+        )
+    if state is not None:
+        state.save()
     if archive:
         # passing an archive argument will archive the files
         # this is useful for the git purposes
         __make_archive(destination, destination.with_suffix(f".{archive}"))
+    return files
+
+
+def poll_ncep(
+    destination: Path,
+    *,
+    interval: float = 120.0,
+    max_seconds: int = 300,
+    headers=HEADERS,
+    baseurl: str = NCEP_3DREFL,
+    workers: int = 8,
+    retries: int = 3,
+    backoff: float = 0.5,
+    state: Union[ListingState, StrPath, None] = None,
+    cycles: Optional[int] = None,
+) -> Iterator[Path]:
+    """
+    poll the ncep listings every `interval` seconds and yield each new file
+    as soon as it is written.
+
+    listings are cached with their ETag/Last-Modified validators in the
+    `state` file (ListingState, path or the default location), so unchanged
+    pages cost a 304 rather than an html parse, and only files that were not
+    fetched before, in this or an earlier process, are downloaded. polls
+    forever unless `cycles` is given.
+    """
+    if not isinstance(state, ListingState):
+        state = ListingState() if state is None else ListingState(state)
+    if not destination.exists():
+        destination.mkdir()
+    with __session(workers) as session, ThreadPoolExecutor(workers) as pool:
+        cycle = 0
+        try:
+            while cycles is None or cycle < cycles:
+                start = time.monotonic()
+                yield from __fetch_recent(
+                    session,
+                    pool,
+                    destination,
+                    input_dt=datetime.utcnow(),
+                    max_seconds=max_seconds,
+                    headers=headers,
+                    baseurl=baseurl,
+                    retries=retries,
+                    backoff=backoff,
+                    state=state,
+                )
+                state.save()
+                cycle += 1
+                if cycles is None or cycle < cycles:
+                    time.sleep(max(0.0, interval - (time.monotonic() - start)))
+        finally:
+            # the consumer may stop polling in the middle of a cycle
+            state.save()
+
 
+def ncep_to_zarr(
+    store: StrPath,
+    *,
+    input_dt: Optional[datetime] = None,
+    max_seconds: int = 300,
+    headers=HEADERS,
+    baseurl: str = NCEP_3DREFL,
+    workers: int = 8,
+    decoders: int = 2,
+    queue_size: Optional[int] = None,
+    retries: int = 3,
+    backoff: float = 0.5,
+    state: Optional[ListingState] = None,
+    name: str = DEFAULT_VAR,
+) -> list[np.datetime64]:
+    """
+    fetch, decode and append the recent volumes to a zarr `store` in one pass.
 
-def from_mtarchive(start: datetime, stop: datetime) -> NotImplemented:
+    `workers` threads download and gunzip files into memory and hand them
+    through a bounded queue to `decoders` threads (pygrib), which pass the
+    decoded levels through a second bounded queue to a single writer. a
+    volume is appended along validTime as soon as every level of its valid
+    time has arrived, so the network, decompression, decoding and writing
+    overlap. a volume is complete when it holds every level of the product
+    listing, not just the levels published so far; volumes are appended in
+    time order and the first incomplete one (a level that is not published
+    yet or could not be fetched) is not written, nor are the ones after it.
+    none of them are marked fetched in `state`, so a later call picks them up.
+    returns the valid times written.
+
+    the store is created on the first write and chunked per height plane,
+    `read_mrms(store, engine="zarr")` reads it back.
+    """
+    input_dt = input_dt or datetime.utcnow()
+    queue_size = queue_size or 2 * workers
+    fetched: queue.Queue = queue.Queue(maxsize=queue_size)
+    decoded: queue.Queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    written = []
+    with __session(workers) as session, ThreadPoolExecutor(workers) as pool:
+        levels, urls = __recent_urls(
+            session, pool, baseurl, input_dt, max_seconds, state, retries, backoff
+        )
+        # files of one volume share the timestamp in their name
+        listed = defaultdict(int)
+        for url in urls:
+            listed[__stamp(url)] += 1
+
+        def fetch(url: str) -> None:
+            data = None
+            try:
+                data = __fetch(session, url, headers, retries, backoff)
+            finally:
+                __put(fetched, (url, data), stop)
+
+        futures = [pool.submit(fetch, url) for url in urls]
+        threads = [
+            threading.Thread(target=__decode_worker, args=(fetched, decoded, stop))
+            for _ in range(decoders)
+        ]
+        for thread in threads:
+            thread.start()
+        volumes = defaultdict(dict)
+        # volumes are appended in time order, a volume waits for the earlier
+        # ones to be written or left for a later call
+        pending = sorted(listed)
+        complete = True
+        try:
+            for _ in urls:
+                url, level = __get(decoded, threads)
+                volumes[__stamp(url)][url] = level
+                while pending and len(volumes[pending[0]]) == listed[pending[0]]:
+                    volume = volumes.pop(pending.pop(0))
+                    found = {
+                        __level_url(url)
+                        for url, level in volume.items()
+                        if level is not None
+                    }
+                    # appending anything after a gap would put times out of order
+                    complete = complete and found == set(levels)
+                    if not complete:
+                        continue
+                    written.append(__append_volume(store, list(volume.values()), name))
+                    if state is not None:
+                        for url in volume:
+                            state.mark_fetched(url)
+        finally:
+            stop.set()
+            for future in futures:
+                future.cancel()
+            for thread in threads:
+                thread.join()
+    if state is not None:
+        state.save()
+    return written
+
+
+async def stream_ncep(
+    *,
+    input_dt: Optional[datetime] = None,
+    max_seconds: int = 300,
+    headers=HEADERS,
+    baseurl: str = NCEP_3DREFL,
+    workers: int = 8,
+    retries: int = 3,
+    backoff: float = 0.5,
+    decode: bool = False,
+) -> AsyncIterator[Level]:
+    """
+    asyncio counterpart of from_ncep that never writes files.
+
+    every response body is gunzipped incrementally as it streams in and the
+    levels are yielded in the order they finish downloading. with `decode`
+    the grib message is also decoded by pygrib (off the event loop) into
+    `Level.values`, the same float32 plane ncep_to_zarr writes with masked
+    points as nan. requires aiohttp.
+
+    ```
+    async for level in stream_ncep(decode=True):
+        composite.add(level.values)
+    ```
+    """
+    if not AIOHTTP_FLAG:
+        raise ImportError("stream_ncep requires aiohttp")
+    input_dt = input_dt or datetime.utcnow()
+    connector = aiohttp.TCPConnector(limit_per_host=workers)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=TIMEOUT, sock_read=TIMEOUT)
+    limit = asyncio.Semaphore(workers)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        get_text = partial(__aget_text, session, retries=retries, backoff=backoff)
+        levels = __parse_levels(await get_text(baseurl))
+        levels = [baseurl + level for level in levels]
+        listings = await asyncio.gather(*(get_text(url) for url in levels))
+        tasks = [
+            asyncio.create_task(
+                __afetch(session, limit, url + file, headers, retries, backoff, decode)
+            )
+            for url, html in zip(levels, listings)
+            for file in __recent(__parse_files(html), input_dt, max_seconds)
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                level = await task
+                if level is not None:
+                    yield level
+        finally:
+            # the consumer stopped early, the session closes once they are done
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def from_mtarchive(
+    start: datetime,
+    stop: datetime,
+    destination: Path,
+    *,
+    products: Iterable[str] = ("MergedReflectivityQC",),
+    baseurl: str = MTARCHIVE,
+    workers: int = 8,
+    retries: int = 3,
+    backoff: float = 0.5,
+    verify: bool = True,
+) -> list[Path]:
     """
     baseurl = https://mtarchive.geol.iastate.edu/{year}/{month}/{day}/mrms/ncep/
+
+    backfill every file of `products` valid between start and stop (inclusive)
+    into `destination`, mirroring the archive layout. the files are kept as
+    published (gzipped).
+
+    the product listings and the files are fetched by a pool of `workers`
+    threads, failed requests are retried `retries` times waiting
+    `backoff * 2**attempt` seconds in between; a day whose listing still
+    fails is skipped with a warning. a file is first written as `.part`; an
+    interrupted transfer is resumed with a byte range request on the next
+    attempt or the next call. the size is checked against the server and with
+    `verify` the gzip crc is checked before the file gets its final name, so
+    files that are present are complete and skipped without a request.
+    returns the files in the range, including the ones that were already
+    present.
     """
-    url_template = "https://mtarchive.geol.iastate.edu/%Y/%m/%d/mrms/ncep/"
-    dr = pd.date_range(start=start, stop=stop, freq="D")
-    for url in dr.strftime(url_template):
-        print(url)
-    return NotImplemented
+    days = pd.date_range(start=pd.Timestamp(start).normalize(), end=stop, freq="D")
+    urls = [
+        baseurl + day.strftime(MTARCHIVE_DAY) + product + "/"
+        for day in days
+        for product in products
+    ]
+    with __session(workers) as session, ThreadPoolExecutor(workers) as pool:
+        listings = pool.map(
+            partial(__list_archive, session, retries=retries, backoff=backoff), urls
+        )
+        futures = [
+            pool.submit(
+                __resume,
+                session,
+                url + name,
+                destination / (url + name).removeprefix(baseurl),
+                retries,
+                backoff,
+                verify,
+            )
+            for url, names in zip(urls, listings)
+            for name in names
+            if start <= __valid_time(name) <= stop
+        ]
+        files = [future.result() for future in as_completed(futures)]
+    return [file for file in files if file is not None]
+
+
+def __session(workers: int) -> Session:
+    """a session that keeps up to `workers` connections open per host"""
+    session = Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def __retry(attempt: Callable[[], T], retries: int, backoff: float) -> Optional[T]:
+    """
+    call attempt until it succeeds, at most retries + 1 times with exponential
+    backoff, None when every attempt failed or the status is not retryable.
+    only network and stream errors are retried, local ones are raised
+    """
+    for i in range(retries + 1):
+        try:
+            return attempt()
+        except HTTPError as e:
+            if e.response.status_code not in RETRY_STATUS:
+                break
+        except (RequestException, Urllib3Error, EOFError, gzip.BadGzipFile, zlib.error):
+            # dropped connections, truncated and corrupt gzip streams
+            pass
+        if i < retries:
+            time.sleep(backoff * 2**i)
+    return None
+
+
+def __download(
+    session: Session,
+    url: str,
+    destination: Path,
+    headers: dict[str, str],
+    retries: int,
+    backoff: float,
+) -> Optional[Path]:
+    """fetch, gunzip and write a single file, None if it could not be fetched"""
+    file = destination / url.rsplit("/", 1)[-1].removesuffix(GZ)
+    # written under a temporary name so a failed attempt never leaves a part file
+    part = file.with_name(file.name + ".part")
+
+    def attempt() -> Path:
+        # a request is made to hit the file url
+        with session.get(url, stream=True, headers=headers, timeout=TIMEOUT) as r:
+            r.raise_for_status()
+            # the response object is decompressed
+            with gzip.GzipFile(fileobj=r.raw, mode="rb") as fsrc:
+                # written to the local drive
+                with part.open("wb") as fdst:
+                    shutil.copyfileobj(fsrc, fdst)
+        return part.replace(file)
+
+    file = __retry(attempt, retries, backoff)
+    if file is None:
+        part.unlink(missing_ok=True)
+    return file
+
+
+def __fetch(
+    session: Session, url: str, headers: dict[str, str], retries: int, backoff: float
+) -> Optional[bytes]:
+    """fetch and gunzip a single file into memory, None if it could not be fetched"""
+
+    def attempt() -> bytes:
+        with session.get(url, stream=True, headers=headers, timeout=TIMEOUT) as r:
+            r.raise_for_status()
+            with gzip.GzipFile(fileobj=r.raw, mode="rb") as f:
+                return f.read()
+
+    return __retry(attempt, retries, backoff)
+
+
+def __put(q: queue.Queue, item, stop: threading.Event) -> None:
+    """put on a bounded queue, giving up once the pipeline shuts down"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=QUEUE_POLL)
+            return
+        except queue.Full:
+            continue
+
+
+def __decode_worker(
+    fetched: queue.Queue, decoded: queue.Queue, stop: threading.Event
+) -> None:
+    while not stop.is_set():
+        try:
+            url, data = fetched.get(timeout=QUEUE_POLL)
+        except queue.Empty:
+            continue
+        level = None
+        if data is not None:
+            try:
+                level = __decode_level(data)
+            except Exception:
+                # a message pygrib cannot decode (or no pygrib), the level is
+                # reported missing rather than the writer waiting on it
+                pass
+        __put(decoded, (url, level), stop)
+
+
+def __get(q: queue.Queue, threads: list[threading.Thread]):
+    """get from a queue, failing rather than waiting on threads that stopped"""
+    while True:
+        try:
+            return q.get(timeout=QUEUE_POLL)
+        except queue.Empty:
+            if not any(thread.is_alive() for thread in threads):
+                raise RuntimeError("the decoder threads stopped") from None
+
+
+def __decode_level(data: bytes) -> xr.DataArray:
+    """a single height plane from a grib message, masked points are nan"""
+    import pygrib
+
+    msg = pygrib.fromstring(data)
+    lats, lons = msg.latlons()
+    values = np.ma.filled(np.ma.asarray(msg.values, dtype="f4"), np.nan)
+    return xr.DataArray(
+        values,
+        dims=("latitude", "longitude"),
+        coords={
+            "heightAboveSea": float(msg.level),
+            "latitude": lats[:, 0],
+            "longitude": lons[0, :],
+            "validTime": np.datetime64(msg.validDate, "ns"),
+        },
+    )
+
+
+def __append_volume(
+    store: StrPath, levels: list[xr.DataArray], name: str
+) -> np.datetime64:
+    levels = sorted(levels, key=lambda level: float(level.heightAboveSea))
+    volume = xr.concat(levels, dim="heightAboveSea").expand_dims("validTime")
+    ds = volume.to_dataset(name=name)
+    if Path(store).exists():
+        ds.to_zarr(store, append_dim="validTime")
+    else:
+        # one chunk per height plane, like read_mrms
+        _, _, nlat, nlon = volume.shape
+        encoding = {
+            name: {"chunks": (1, 1, nlat, nlon)},
+            # appended volumes are minutes apart
+            "validTime": {"units": "seconds since 1970-01-01", "dtype": "int64"},
+        }
+        ds.to_zarr(store, mode="w-", encoding=encoding)
+    return volume.validTime.values[0]
+
+
+def __level_url(url: str) -> str:
+    """the listing of the level a file url belongs to"""
+    return url.rsplit("/", 1)[0] + "/"
+
+
+def __stamp(url: str) -> str:
+    (stamp,) = VALID_TIME_PATTERN.findall(url.rsplit("/", 1)[-1])
+    return stamp
+
+
+async def __afetch(
+    session: "aiohttp.ClientSession",
+    limit: asyncio.Semaphore,
+    url: str,
+    headers: dict[str, str],
+    retries: int,
+    backoff: float,
+    decode: bool,
+) -> Optional[Level]:
+    """stream and gunzip a single file, None if it could not be fetched"""
+
+    async def attempt() -> bytes:
+        async with limit, session.get(url, headers=headers) as r:
+            r.raise_for_status()
+            return await __agunzip(r)
+
+    data = await __aretry(attempt, retries, backoff)
+    if data is None:
+        return None
+    values = None
+    if decode:
+        # decoding is cpu bound, it runs in a thread while other bodies stream in
+        values = (await asyncio.to_thread(__decode_level, data)).values
+    name = url.rsplit("/", 1)[-1].removesuffix(GZ)
+    return Level(url, name, data, values)
+
+
+async def __agunzip(r: "aiohttp.ClientResponse") -> bytes:
+    # 16 + MAX_WBITS expects a gzip header and trailer
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    chunks = []
+    async for chunk in r.content.iter_chunked(CHUNK_SIZE):
+        chunks.append(decompressor.decompress(chunk))
+    chunks.append(decompressor.flush())
+    if not decompressor.eof:
+        raise EOFError(f"truncated gzip stream {r.url}")
+    return b"".join(chunks)
+
+
+async def __aget_text(
+    session: "aiohttp.ClientSession", url: str, retries: int, backoff: float
+) -> str:
+    """a listing page, retried like the files; raises when it cannot be read"""
+
+    async def attempt() -> str:
+        async with session.get(url) as r:
+            r.raise_for_status()
+            return await r.text()
+
+    text = await __aretry(attempt, retries, backoff)
+    if text is None:
+        raise aiohttp.ClientError(f"could not list {url}")
+    return text
+
+
+async def __aretry(
+    attempt: Callable[[], Awaitable[T]], retries: int, backoff: float
+) -> Optional[T]:
+    """the asyncio counterpart of __retry"""
+    for i in range(retries + 1):
+        try:
+            return await attempt()
+        except aiohttp.ClientResponseError as e:
+            if e.status not in RETRY_STATUS:
+                break
+        except (aiohttp.ClientError, asyncio.TimeoutError, zlib.error, EOFError):
+            # dropped connections and truncated gzip streams
+            pass
+        if i < retries:
+            await asyncio.sleep(backoff * 2**i)
+    return None
+
+
+def __fetch_recent(
+    session: Session,
+    pool: ThreadPoolExecutor,
+    destination: Path,
+    *,
+    input_dt: datetime,
+    max_seconds: int,
+    headers: dict[str, str],
+    baseurl: str,
+    retries: int,
+    backoff: float,
+    state: Optional[ListingState],
+) -> Iterator[Path]:
+    """download the recent files of every level, yielding them as they finish"""
+    _, urls = __recent_urls(
+        session, pool, baseurl, input_dt, max_seconds, state, retries, backoff
+    )
+    futures = {
+        pool.submit(
+            __download, session, url, destination, headers, retries, backoff
+        ): url
+        for url in urls
+    }
+    try:
+        for future in as_completed(futures):
+            file = future.result()
+            if file is None:
+                continue
+            if state is not None:
+                state.mark_fetched(futures[future])
+            yield file
+    finally:
+        # the consumer stopped early, drop the downloads that have not started
+        for future in futures:
+            future.cancel()
+
+
+def __recent_urls(
+    session: Session,
+    pool: ThreadPoolExecutor,
+    baseurl: str,
+    input_dt: datetime,
+    max_seconds: int,
+    state: Optional[ListingState],
+    retries: int,
+    backoff: float,
+) -> tuple[list[str], list[str]]:
+    """
+    the url of every level of the product and the urls of their recent files
+    that were not fetched before
+    """
+    get_listing = partial(
+        __get_listing, session, state=state, retries=retries, backoff=backoff
+    )
+    # iterating the first page provides the levels that are avaliable in the 3DRefl database
+    levels = [baseurl + level for level in get_listing(baseurl, __parse_levels)]
+    # all of the levels pages are read to get the validtimes to each of the files and file url
+    # then some logic to select only recent files
+    listings = pool.map(partial(get_listing, parse=__parse_files), levels)
+    urls = [
+        url + file
+        for url, files in zip(levels, listings)
+        for file in __recent(files, input_dt, max_seconds)
+    ]
+    if state is not None:
+        urls = [url for url in urls if not state.is_fetched(url)]
+    return levels, urls
+
+
+def __resume(
+    session: Session,
+    url: str,
+    file: Path,
+    retries: int,
+    backoff: float,
+    verify: bool,
+) -> Optional[Path]:
+    """download url to file, resuming a partial download, None on failure"""
+    # only complete, verified downloads are ever given the final name
+    if file.exists():
+        return file
+    file.parent.mkdir(parents=True, exist_ok=True)
+    part = file.with_name(file.name + ".part")
+
+    def attempt() -> Path:
+        # a failed attempt leaves the part behind to be resumed
+        offset = part.stat().st_size if part.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        with session.get(url, headers=headers, stream=True, timeout=TIMEOUT) as r:
+            if r.status_code == 416:
+                # the part already holds every byte
+                total = offset
+            else:
+                r.raise_for_status()
+                total = __total_size(r)
+                # servers that ignore the range send the whole file again
+                mode = "ab" if r.status_code == 206 else "wb"
+                with part.open(mode) as f:
+                    # the published bytes, not a content-encoding decoded copy
+                    for chunk in r.raw.stream(CHUNK_SIZE, decode_content=False):
+                        f.write(chunk)
+        size = part.stat().st_size
+        if total is not None and size != total:
+            raise EOFError(f"{url} holds {size} of {total} bytes")
+        if verify and not __is_intact(part):
+            # corrupt rather than short, start over
+            part.unlink()
+            raise EOFError(f"{url} failed the gzip crc check")
+        return part.replace(file)
+
+    return __retry(attempt, retries, backoff)
+
+
+def __total_size(r) -> Optional[int]:
+    """the full size of the file from Content-Range or Content-Length"""
+    if r.status_code == 206:
+        return int(r.headers["Content-Range"].rsplit("/", 1)[-1])
+    length = r.headers.get("Content-Length")
+    return None if length is None else int(length)
+
+
+def __is_intact(file: Path) -> bool:
+    """gzip checks the crc32 and size trailer of every member while reading"""
+    if not is_gzip(file):
+        return True
+    try:
+        with gzip.open(file, "rb") as f:
+            while f.read(CHUNK_SIZE):
+                pass
+    except (OSError, EOFError, zlib.error):
+        return False
+    return True
+
+
+def __list_archive(
+    session: Session, url: str, retries: int, backoff: float
+) -> list[str]:
+    """
+    names of the timestamped files on an archive listing page, empty with a
+    warning when the page could not be fetched
+    """
+
+    def attempt() -> list[str]:
+        r = session.get(url, timeout=TIMEOUT)
+        if r.status_code == 404:
+            # the product was not archived that day
+            return []
+        r.raise_for_status()
+        names = dict.fromkeys(HREF_PATTERN.findall(r.text))
+        return [name for name in names if VALID_TIME_PATTERN.search(name)]
+
+    names = __retry(attempt, retries, backoff)
+    if names is None:
+        warnings.warn(f"could not list {url}; its files are skipped")
+        return []
+    return names
+
+
+def __valid_time(name: str) -> datetime:
+    (stamp,) = VALID_TIME_PATTERN.findall(name)
+    return datetime.strptime(stamp, "%Y%m%d-%H%M%S")
+
+
+def __get_listing(
+    session: Session,
+    url: str,
+    parse: Callable[[str], list[str]],
+    state: Optional[ListingState],
+    retries: int,
+    backoff: float,
+) -> list[str]:
+    """
+    the names on a listing page, reusing the parsed copy while it is
+    unchanged, empty when the page could not be fetched
+    """
+
+    def attempt() -> list[str]:
+        headers = {} if state is None else state.validators(url)
+        r = session.get(url, headers=headers, timeout=TIMEOUT)
+        cached = None if state is None else state.listing(url)
+        if r.status_code == 304 and cached is not None:
+            return cached
+        r.raise_for_status()
+        names = parse(r.text)
+        if state is not None:
+            state.update(url, r.headers, names)
+        return names
+
+    names = __retry(attempt, retries, backoff)
+    return [] if names is None else names
+
+
+def __parse_levels(html: str) -> list[str]:
+    (table,) = pd.read_html(io.StringIO(html))
+    levels = table["Name"].dropna()
+    return levels[levels.str.contains("MergedReflectivityQC")].tolist()
 
 
-def __iterlevels(baseurl: str) -> Iterator[str]:
-    (html,) = pd.read_html(baseurl)
-    levels = html["Name"].dropna()
-    yield from baseurl + levels[levels.str.contains("MergedReflectivityQC")]
+def __parse_files(html: str) -> list[str]:
+    (table,) = pd.read_html(io.StringIO(html), skiprows=[1, 2, 3], parse_dates=True)
+    return table["Name"].dropna().tolist()
 
 
-def __itertimes(url: str, input_dt: datetime, max_seconds: int) -> Iterator[str]:
-    (html,) = pd.read_html(url, skiprows=[1, 2, 3], parse_dates=True)
-    files = html["Name"].dropna()
+def __recent(files: list[str], input_dt: datetime, max_seconds: int) -> list[str]:
+    files = pd.Series(files, dtype=object)
     time_delta: pd.Series[datetime] = abs(
-        input_dt - files.str.extract(r"(\d{8}-\d{6})").astype("datetime64[s]").squeeze()
+        input_dt
+        - files.str.extract(r"(\d{8}-\d{6})", expand=False).astype("datetime64[s]")
     )
-    yield from files[time_delta.dt.total_seconds() <= max_seconds]
+    return files[time_delta.dt.total_seconds() <= max_seconds].tolist()
 
 
 def __make_archive(
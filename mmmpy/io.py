@@ -2,24 +2,50 @@
 input output
 """
 
+import io
 import re
 import gzip
 import shutil
 import zipfile
 from pathlib import Path
-from contextlib import contextmanager
-from typing import Iterable, Union, Hashable
-
+from functools import partial
+from contextlib import contextmanager, ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    BinaryIO,
+    Callable,
+    Hashable,
+    Iterable,
+    Iterator,
+    Optional,
+    TypeVar,
+    Union,
+)
+
+import dask
+import numpy as np
 import xarray as xr
 
 from .core import MRMSDataset
+from .backends import MRMSBinaryBackendEntrypoint
+from .binary import GZIP_MAGIC
+from .cache import IndexCache
+from .sniff import sniff
+from .sample import Grid, Method, point_weights
 from .typing import Engine, StrPath
-from .constants import ZIP, GZ, TMPDIR
+from .scratch import SCRATCH, ScratchSpace
+from .constants import GZ, DEFAULT_VAR
 
+INDEX_CACHE = IndexCache()
+# dimensions read_mrms splits into single element chunks by default
+PLANE_DIMS = ("validTime", "heightAboveSea")
+T = TypeVar("T")
 FILE_PATTERN = re.compile(r"/([A-Za-z]+(?:-|_)?[A-Za-z]+)+")
 
 
 class CFGribBackend:
+    # each file is a single height plane
+    chunks = {"latitude": -1, "longitude": -1}
     kwargs = {
         "concat_dim": ["heightAboveSea"],
         "backend_kwargs": dict(
@@ -51,26 +77,73 @@ class CFGribBackend:
 
 
 class NETCDFBackend:
+    # one height plane per chunk, on the dimension names of v1 and v2 files;
+    # chunking when opening keeps every plane a read of its own
+    chunks = {"Height": 1, "Ht": 1}
     kwargs = {
-        # "data_vars":["unknown"],
-        "concat_dim": ["heightAboveSea"],
-        "backend_kwargs": dict(
-            mask_and_scale=True,
-            decode_times=True,
-            concat_characters=True,
-            decode_coords=True,
-            # use_cftime="%Y-%m",
-            decode_timedelta=None,
-            lock=None,
-            indexpath="{path}.{short_hash}.idx",
-            filter_by_keys={},
-            read_keys=[],
-            encode_cf=("parameter", "time", "geography", "vertical"),
-            squeeze=True,
-            time_dims={"valid_time"},
-        ),
+        # every netcdf file is a full volume, so files are stacked in time
+        "concat_dim": "validTime",
+        "mask_and_scale": True,
+        "decode_times": True,
+    }
+    # v1 (<= 7/30/2013) and v2 (>= 7/30/2013) reflectivity variables
+    labels = {"mrefl_mosaic": 1, "MREFL": 2}
+
+    def preprocess(self, ds: xr.Dataset) -> xr.Dataset:
+        """
+        normalize a single v1 or v2 mosaic to the cfgrib style layout, without
+        reading the reflectivity, whether it is dask backed or lazily indexed
+        """
+        version = next((self.labels[key] for key in self.labels if key in ds), None)
+        if version is None:
+            raise VariableError(f"unknown MRMS netcdf version {list(ds.data_vars)}")
+        label = "mrefl_mosaic" if version == 1 else "MREFL"
+        mrefl3d = ds[label].variable.copy(deep=False)
+        mrefl3d.dims = ("heightAboveSea", "latitude", "longitude")
+        mrefl3d.attrs = {"units": "dBZ", "version": version}
+        if version == 1:
+            _, nlat, nlon = mrefl3d.shape
+            attrs = ds.attrs
+            # Scale is not a CF attribute, decoded as a scale_factor it stays lazy
+            mrefl3d.attrs["scale_factor"] = 1 / ds[label].attrs["Scale"]
+            mrefl3d = xr.conventions.decode_cf_variable(label, mrefl3d)
+            # Note the subtraction in lat!
+            lat = attrs["Latitude"] - attrs["LatGridSpacing"] * np.arange(nlat)
+            lon = attrs["Longitude"] + attrs["LonGridSpacing"] * np.arange(nlon)
+            height = ds["Height"].values
+            time = np.datetime64(int(attrs["Time"]), "s")
+        else:
+            lat = ds["Lat"].values
+            lon = ds["Lon"].values
+            height = ds["Ht"].values
+            time = ds["time"].values.ravel()[0]
+            if not np.issubdtype(np.asarray(time).dtype, np.datetime64):
+                time = np.datetime64(int(time), "s")
+
+        ds = xr.Dataset(
+            {DEFAULT_VAR: mrefl3d},
+            coords={
+                "heightAboveSea": ("heightAboveSea", np.asarray(height, dtype=float)),
+                "latitude": ("latitude", np.asarray(lat, dtype=float)),
+                "longitude": ("longitude", np.asarray(lon, dtype=float)),
+                "validTime": time,
+            },
+        )
+        return ds
+
+    def pipe(self, ds: xr.Dataset) -> xr.Dataset:
+        return ds
+
+
+class BinaryBackend:
+    engine = MRMSBinaryBackendEntrypoint
+    # the backend prefers one height plane per chunk
+    chunks = {}
+    kwargs = {
+        # every binary file is a full volume, so files are stacked in time
+        "concat_dim": "validTime",
+        "backend_kwargs": dict(mask_and_scale=True),
     }
-    rename = {"valid_time": "validTime"}
 
     def pipe(self, ds: xr.Dataset) -> xr.Dataset:
         return ds
@@ -80,10 +153,11 @@ class ZarrBackend:
     ...
 
 
-Store = dict[Engine, Union[CFGribBackend, NETCDFBackend, ZarrBackend]]
+Store = dict[Engine, Union[CFGribBackend, NETCDFBackend, BinaryBackend, ZarrBackend]]
 store: Store = {
     "cfgrib": CFGribBackend(),
-    "netcdf": NETCDFBackend(),
+    "netcdf4": NETCDFBackend(),
+    "binary": BinaryBackend(),
     "zarr": ZarrBackend(),
 }
 
@@ -107,12 +181,32 @@ def read_mrms(
     name: Hashable = None,
     latrange: tuple[float, float] = None,
     lonrange: tuple[float, float] = None,
+    index_cache: Optional[IndexCache] = INDEX_CACHE,
+    parallel: bool = True,
+    chunks: Optional[dict[Hashable, int]] = None,
 ) -> MRMSDataset:
     """
     single function that will attempt to resolve several various mrms filetypes
+
+    without an engine the format is sniffed from the leading bytes of each
+    file; zip archives and gzipped grib/netcdf files are decompressed in
+    memory (grib members to memory backed scratch space, eccodes needs a
+    path) and loaded before the buffers are released.
+
+    cfgrib indexes are kept in `index_cache` so reopening the same grib files
+    skips scanning their messages; pass None to write them next to the data.
+
+    with `parallel` the files are opened concurrently through dask. unless
+    `chunks` are given (they are passed on to xr.open_mfdataset) every chunk
+    holds a single height plane of a single validTime.
     """
+    if isinstance(files, (str, Path)):
+        files = [files]
+    files = list(__to_path(*files))
     if not engine:
-        files, engine = __infer_engine(files)
+        engine, packed = __infer_engine(files)
+        if packed:
+            return __read_packed(files, engine=engine, name=name)
 
     backend = store.get(engine)
 
@@ -120,20 +214,45 @@ def read_mrms(
         raise EngineResolutionError
 
     elif engine == "cfgrib":
+        kwargs = backend.kwargs
+        if index_cache is not None:
+            index_cache.prepare(files)
+            backend_kwargs = kwargs["backend_kwargs"] | {
+                "indexpath": index_cache.indexpath
+            }
+            kwargs = kwargs | {"backend_kwargs": backend_kwargs}
         ds = xr.open_mfdataset(
             files,
-            chunks={},
+            chunks=backend.chunks if chunks is None else chunks,
             engine=engine,
             data_vars="minimal",
             combine="nested",
-            **backend.kwargs,
+            parallel=parallel,
+            **kwargs,
         ).pipe(backend.pipe)
+        if index_cache is not None:
+            index_cache.touch(files)
+            index_cache.evict()
 
     elif engine == "zarr":
-        ds = xr.open_zarr(files)
+        (zarr_store,) = files
+        ds = xr.open_zarr(zarr_store)
 
     elif engine == "netcdf4":
-        return NotImplemented
+        open_engine = engine
+        if any(isinstance(file, io.BytesIO) for file in files):
+            # netCDF4 opens in memory buffers, xarray reads them as data stores
+            files = [__netcdf4_store(file) for file in files]
+            open_engine = "store"
+        ds = xr.open_mfdataset(
+            files,
+            chunks=backend.chunks if chunks is None else chunks,
+            engine=open_engine,
+            combine="nested",
+            parallel=parallel,
+            preprocess=backend.preprocess,
+            **backend.kwargs,
+        ).pipe(backend.pipe)
 
     elif engine == "pygrib":
         return NotImplemented
@@ -142,12 +261,22 @@ def read_mrms(
         return NotImplemented
 
     elif engine == "binary":
-        return NotImplemented
+        ds = xr.open_mfdataset(
+            files,
+            chunks=backend.chunks if chunks is None else chunks,
+            engine=backend.engine,
+            combine="nested",
+            parallel=parallel,
+            **backend.kwargs,
+        ).pipe(backend.pipe)
 
     elif engine == "legacy":
         return NotImplemented
     else:
         raise NotImplementedError
+    if chunks is None and engine != "zarr":
+        # align chunks with height planes, whatever the files held
+        ds = ds.chunk({dim: 1 for dim in PLANE_DIMS if dim in ds.dims})
     # the dataset should only contain a single variable
     if len(ds.data_vars) != 1:
         raise VariableError
@@ -162,23 +291,44 @@ def read_mrms(
     return ds.rename({ds_name: name}).pipe(MRMSDataset, name=name)
 
 
-def __infer_engine(
-    files: Iterable[Path] | Path,
-) -> tuple[Iterable[Path] | Path, Engine]:
-    engine = NotImplemented
-
-    def infer() -> Iterable[Path]:
+def __infer_engine(files: list[Path]) -> tuple[Engine, bool]:
+    """
+    resolve a single engine for every file by content sniffing, also reports
+    if the files have to be unpacked before that engine can read them
+    """
+    formats = {sniff(file) for file in files}
+    if len(formats) != 1:
+        raise EngineResolutionError(f"files are of mixed formats {formats}")
+    ((engine, compression),) = formats
+    if engine is None:
+        raise EngineResolutionError(f"unknown mrms file format {files[0]}")
+    # the binary backend decompresses gzip itself
+    packed = compression == "zip" or (compression == "gzip" and engine != "binary")
+    return engine, packed
+
+
+def __read_packed(files: list[Path], engine: Engine, name: Hashable) -> MRMSDataset:
+    # scratch paths are unique per call, so their indexes are not worth caching
+    with ExitStack() as stack:
+        unpacked = []
         for file in files:
-            # engine = "cfgrib"...
-            yield file
+            if engine == "cfgrib":
+                # SCRATCH is memory backed (/dev/shm) where available
+                members = unzip(file)
+            else:
+                members = unzip(file, in_memory=True)
+            unpacked.extend(stack.enter_context(members))
+        mrms = read_mrms(unpacked, engine=engine, name=name, index_cache=None)
+        # the unpacked members are released on exit
+        mrms.data.load()
+    return mrms
 
-    if isinstance(files, Path):
-        # engine = "cfgrib"...
-        ...
-    else:
-        files = infer()
 
-    return files, engine
+def __netcdf4_store(buffer: io.BytesIO) -> xr.backends.NetCDF4DataStore:
+    import netCDF4
+
+    name = getattr(buffer, "name", "buffer")
+    return xr.backends.NetCDF4DataStore(netCDF4.Dataset(name, memory=buffer.getvalue()))
 
 
 def __infer_name_from_file(hist: str) -> Hashable:
@@ -189,29 +339,161 @@ def __infer_name_from_file(hist: str) -> Hashable:
     return "UNABLE_TO_RESOLVE_NAME"
 
 
+def read_points(
+    files: Iterable[StrPath] | StrPath,
+    lat: np.ndarray,
+    lon: np.ndarray,
+    *,
+    method: Method = "nearest",
+    workers: Optional[int] = None,
+) -> xr.DataArray:
+    """
+    the column above each point lat, lon in every file, shaped (validTime,
+    point, heightAboveSea). binary, netcdf and zarr files are opened lazily
+    and only the rows of the grid that hold the points are read: hyperslabs
+    of netcdf variables, memory mapped (or, gzipped, decompressed) byte
+    ranges of binary files, and the chunks of zarr stores that cover them.
+    files are read concurrently by up to `workers` threads.
+    """
+    if isinstance(files, (str, Path)):
+        files = [files]
+    files = list(__to_path(*files))
+    read = partial(__read_columns, lat=lat, lon=lon, method=method)
+    with ThreadPoolExecutor(workers) as pool:
+        columns = list(pool.map(read, files))
+    return xr.concat(columns, dim="validTime")
+
+
+def __read_columns(
+    file: Path, lat: np.ndarray, lon: np.ndarray, method: Method
+) -> xr.DataArray:
+    with __open_lazily(file) as ds:
+        if len(ds.data_vars) != 1:
+            raise VariableError(f"{file} holds {list(ds.data_vars)}")
+        (name,) = ds
+        da = ds[name]
+        grid = Grid.from_coords(da.latitude.values, da.longitude.values)
+        weights = point_weights(grid, lat, lon, method)
+        rows, cols = np.divmod(weights.gridpoints, grid.nlon)
+        # a row segment per row, a basic slice that reads only that range;
+        # nothing else may touch the data, reshaping lazy arrays reads them
+        segments = []
+        for row in np.unique(rows):
+            first, last = cols[rows == row].min(), cols[rows == row].max()
+            segments.append(da.isel(latitude=row, longitude=slice(first, last + 1)))
+        # the files are already read concurrently
+        segments = dask.compute(*segments, scheduler="synchronous")
+        gathered = []
+        for row, segment in zip(np.unique(rows), segments):
+            if "validTime" not in segment.dims:
+                segment = segment.expand_dims("validTime")
+            segment = segment.transpose("validTime", "heightAboveSea", "longitude")
+            gathered.append(
+                segment.values[..., cols[rows == row] - cols[rows == row].min()]
+            )
+        shape = (da.sizes.get("validTime", 1), da.sizes["heightAboveSea"], 0)
+        values = weights.combine(np.concatenate([np.empty(shape), *gathered], axis=-1))
+        return xr.DataArray(
+            values.swapaxes(1, 2),
+            dims=("validTime", "point", "heightAboveSea"),
+            coords={
+                "validTime": np.atleast_1d(da.validTime.values),
+                "heightAboveSea": da.heightAboveSea.values,
+                "latitude": ("point", np.ravel(lat)),
+                "longitude": ("point", np.ravel(lon)),
+            },
+            name=name,
+            attrs=da.attrs,
+        )
+
+
+@contextmanager
+def __open_lazily(file: Path) -> Iterator[xr.Dataset]:
+    """open a single file or store without reading any of its data"""
+    engine, compression = sniff(file)
+    if compression == "zip" or (compression == "gzip" and engine != "binary"):
+        raise EngineResolutionError(f"{file} is packed, unzip it first")
+    if engine == "binary":
+        ds = xr.open_dataset(file, engine=BinaryBackend.engine, cache=False)
+    elif engine == "netcdf4":
+        # lazily indexed, not dask: every row segment is a hyperslab read
+        ds = xr.open_dataset(file, engine=engine, mask_and_scale=True, cache=False)
+    elif engine == "zarr":
+        ds = xr.open_zarr(file)
+    else:
+        raise EngineResolutionError(f"cannot read points from {engine} file {file}")
+    with ds:
+        yield store["netcdf4"].preprocess(ds) if engine == "netcdf4" else ds
+
+
 @contextmanager
-def unzip(file: StrPath, tmpdir: StrPath = Path(TMPDIR)):
-    """context manager for handling ziped and gziped files"""
+def unzip(
+    file: StrPath,
+    tmpdir: Optional[StrPath] = None,
+    *,
+    in_memory: bool = False,
+    scratch: ScratchSpace = SCRATCH,
+    workers: Optional[int] = None,
+):
+    """
+    context manager for handling ziped and gziped files
+
+    members are streamed straight from the archive through gzip, so no
+    compressed intermediate copies are written. with `in_memory` the members
+    are yielded as named io.BytesIO buffers and no directory is created.
+    members are decompressed concurrently by up to `workers` threads and
+    yielded in archive order, so levels and times stay sorted.
+
+    otherwise every call writes to a unique directory of `scratch` that is
+    removed on exit, so unzip is safe to drive from a thread or process pool.
+    the unpacked size counts against the scratch budget while the context is
+    open. an explicit `tmpdir` must not exist yet and is removed on exit.
+    """
     # create path objects
-    file, tmpdir = __to_path(file, tmpdir)
+    (file,) = __to_path(file)
+    if in_memory:
+        yield __iterunpacked(partial(__buffer, file), file, workers)
+        return
+    nbytes = unpacked_size(file)
+    if tmpdir is None:
+        with scratch.directory(nbytes) as tmpdir:
+            yield unpack(file, tmpdir, workers=workers)
+        return
+    (tmpdir,) = __to_path(tmpdir)
     # tmpdir will be deleted, so make sure it doesnt exsist
     assert not tmpdir.exists()
-    # if not ZIP in file.suffixes:
-    #     raise FileNotFoundError
-    # make the temp directory
-    # unzip
-    tmpdir.mkdir()
-    if ZIP in file.suffixes:
-        with zipfile.ZipFile(file, "r") as zref:
-            # dump every thing into the tmpdir
-            zref.extractall(tmpdir)
-    else:
-        __gzip(file, tmpdir)
+    with scratch.reserve(nbytes):
+        tmpdir.mkdir()
+        try:
+            yield unpack(file, tmpdir, workers=workers)
+        finally:
+            shutil.rmtree(tmpdir)
 
-    try:
-        yield __iterfiles(tmpdir)
-    finally:
-        shutil.rmtree(tmpdir)
+
+def unpack(
+    file: StrPath, tmpdir: StrPath, *, workers: Optional[int] = None
+) -> Iterator[Path]:
+    """
+    decompress every member of `file` into the existing `tmpdir` using a pool
+    of `workers` threads (zlib releases the gil), yielding paths in archive
+    order
+    """
+    file, tmpdir = Path(file), Path(tmpdir)
+    return __iterunpacked(partial(__extract, file, tmpdir), file, workers)
+
+
+def unpacked_size(file: StrPath) -> int:
+    """
+    estimate the bytes `file` unpacks to without decompressing it; gzip
+    members read their size from the gzip trailer when it can be seeked to
+    cheaply, deflated zip members count as their uncompressed zip size
+    """
+    file = Path(file)
+    if zipfile.is_zipfile(file):
+        with zipfile.ZipFile(file, "r") as zref:
+            return sum(__member_size(zref, info) for info in zref.infolist())
+    with file.open("rb") as f:
+        return __gzip_size(f, file.stat().st_size)
 
 
 def __to_path(*args: StrPath):
@@ -223,23 +505,84 @@ def __to_path(*args: StrPath):
             yield arg
 
 
-def __gzip(file: Path, tmpdir: StrPath) -> Iterable[Path]:
-    if GZ in file.suffixes:
-        with gzip.open(file, "rb") as zref:
-            file = tmpdir / file.name.removesuffix(GZ)
-            with file.open("wb") as fout:
-                shutil.copyfileobj(zref, fout)
+def __members(file: Path) -> list[Optional[str]]:
+    """names of the zip members in `file`, [None] if it is not a zip archive"""
+    if not zipfile.is_zipfile(file):
+        return [None]
+    with zipfile.ZipFile(file, "r") as zref:
+        return [info.filename for info in zref.infolist() if not info.is_dir()]
 
 
-def __iterfiles(tmpdir: StrPath) -> Iterable[Path]:
-    for file in tmpdir.glob("*"):
-        # handle any gziped files
-        if GZ in file.suffixes:
-            with gzip.open(file, "rb") as zref:
-                file = tmpdir / file.name.removesuffix(GZ)
-                with file.open("wb") as fout:
-                    shutil.copyfileobj(zref, fout)
-        yield file
+@contextmanager
+def __open_member(file: Path, member: Optional[str]) -> Iterator[tuple[str, BinaryIO]]:
+    """the name and a decompressed stream of a zip member or of `file` itself"""
+    if member is None:
+        with file.open("rb") as src:
+            yield __gunzip(file.name, src)
+        return
+    # a handle per member so that members can be read from several threads
+    with zipfile.ZipFile(file, "r") as zref, zref.open(member, "r") as src:
+        yield __gunzip(Path(member).name, src)
+
+
+def __iterunpacked(
+    unpack_member: Callable[[Optional[str]], T], file: Path, workers: Optional[int]
+) -> Iterator[T]:
+    members = __members(file)
+    if workers == 1 or len(members) == 1:
+        yield from map(unpack_member, members)
+        return
+    with ThreadPoolExecutor(workers) as pool:
+        futures = [pool.submit(unpack_member, member) for member in members]
+        try:
+            # in archive order, later members keep decompressing meanwhile
+            for future in futures:
+                yield future.result()
+        finally:
+            # the consumer stopped early, drop what has not started
+            for future in futures:
+                future.cancel()
+
+
+def __member_size(zref: zipfile.ZipFile, info: zipfile.ZipInfo) -> int:
+    if info.is_dir():
+        return 0
+    if info.compress_type != zipfile.ZIP_STORED:
+        return info.file_size
+    with zref.open(info, "r") as f:
+        return __gzip_size(f, info.file_size)
+
+
+def __gzip_size(f: BinaryIO, size: int) -> int:
+    """the ISIZE trailer of a gzip stream (modulo 2**32) or `size` if not gzip"""
+    if size < 18 or f.read(len(GZIP_MAGIC)) != GZIP_MAGIC:
+        return size
+    f.seek(size - 4)
+    return int.from_bytes(f.read(4), "little")
+
+
+def __gunzip(name: str, src: BinaryIO) -> tuple[str, BinaryIO]:
+    # gzipped members are recognized by magic bytes rather than the suffix
+    head = src.read(len(GZIP_MAGIC))
+    src.seek(0)
+    if head == GZIP_MAGIC:
+        return name.removesuffix(GZ), gzip.GzipFile(fileobj=src, mode="rb")
+    return name, src
+
+
+def __extract(file: Path, tmpdir: Path, member: Optional[str]) -> Path:
+    with __open_member(file, member) as (name, src):
+        target = tmpdir / name
+        with target.open("wb") as fout:
+            shutil.copyfileobj(src, fout)
+    return target
+
+
+def __buffer(file: Path, member: Optional[str]) -> io.BytesIO:
+    with __open_member(file, member) as (name, src):
+        buffer = io.BytesIO(src.read())
+    buffer.name = name
+    return buffer
 
 
 # def __iterlevels(baseurl: str) -> Iterator[str]:
@@ -0,0 +1,53 @@
+"""
+max-pooled overviews of mosaic grids, for plots at a fraction of the full
+resolution that still show every storm core
+"""
+__all__ = ["max_pool", "mean_pool", "overview_factor"]
+
+from typing import Sequence
+
+import numpy as np
+
+
+def max_pool(data: np.ndarray, factor: int) -> np.ndarray:
+    """
+    the max of every `factor` x `factor` block of the last two axes; blocks
+    on the far edges may be smaller. NaN is ignored, and so are masked values
+    unless a whole block is masked.
+    """
+    if factor == 1:
+        return data
+    if np.ma.isMaskedArray(data):
+        mask = np.ma.getmaskarray(data)
+        # the fill never wins a block that has any valid value
+        fill = data.min() if data.count() else 0
+        pooled = __reduce_blocks(np.fmax, data.filled(fill), factor)
+        return np.ma.masked_array(pooled, __reduce_blocks(np.logical_and, mask, factor))
+    return __reduce_blocks(np.fmax, np.asarray(data), factor)
+
+
+def mean_pool(data: np.ndarray, factor: int) -> np.ndarray:
+    """the mean of every block, see max_pool; for grid coordinates"""
+    if factor == 1:
+        return data
+    ones = np.ones(np.shape(data)[-2:])
+    counts = __reduce_blocks(np.add, ones, factor)
+    return __reduce_blocks(np.add, np.asarray(data, dtype="f8"), factor) / counts
+
+
+def overview_factor(cells: Sequence[float], pixels: Sequence[float]) -> int:
+    """
+    the largest power of two that leaves at least as many cells as `pixels`
+    along every axis, 1 if the grid is not finer than the output
+    """
+    factor = 1
+    while all(n // (2 * factor) >= p for n, p in zip(cells, pixels)):
+        factor *= 2
+    return factor
+
+
+def __reduce_blocks(ufunc: np.ufunc, data: np.ndarray, factor: int) -> np.ndarray:
+    for axis in (-2, -1):
+        starts = np.arange(0, data.shape[axis], factor)
+        data = ufunc.reduceat(data, starts, axis=axis)
+    return data
@@ -0,0 +1,347 @@
+"""
+area-weighted reflectivity statistics inside polygons, e.g. counties or
+watersheds. polygons are rasterized once per grid into a label array, and
+every frame after that is a gather and a few bincounts over the labeled cells.
+exceedance does the same for the whole grid and many thresholds at once
+"""
+__all__ = [
+    "Exceedance",
+    "Regions",
+    "RegionMask",
+    "exceedance",
+    "rasterize",
+    "row_areas",
+]
+
+from functools import lru_cache
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Hashable, Iterable, Optional, Sequence, Union
+
+import numpy as np
+import xarray as xr
+
+from .constants import CELL_EARTH_RADIUS, DEFAULT_VAR
+from .sample import Grid
+
+# a ring is an (n, 2) array of lon, lat vertices; a polygon is a ring, a list
+# of rings (the first the exterior, the rest holes) or anything with a
+# __geo_interface__ (shapely, geopandas) or a GeoJSON geometry dict
+Polygon = Any
+# grids a Regions keeps the rasterized masks of
+MASK_CACHE_SIZE = 8
+# dBZ, cells at or above this are echo
+DEFAULT_THRESHOLD = 30.0
+# gridpoints, over all levels, exceedance works through at a time
+BLOCK_SIZE = 1 << 20
+# from this many thresholds on, values are binned by searchsorted
+SEARCH_THRESHOLDS = 48
+
+
+@lru_cache(maxsize=MASK_CACHE_SIZE)
+def row_areas(grid: Grid) -> np.ndarray:
+    """
+    the area (km**2) of the cells of every row of grid, read only; on the
+    sphere compute_grid_attributes uses, so the two agree
+    """
+    lat = np.deg2rad(grid.start_lat + grid.lat_spacing * np.arange(grid.nlat))
+    half = np.deg2rad(abs(grid.lat_spacing)) / 2
+    dlon = np.deg2rad(abs(grid.lon_spacing))
+    areas = CELL_EARTH_RADIUS**2 * dlon * (np.sin(lat + half) - np.sin(lat - half))
+    areas.setflags(write=False)
+    return areas
+
+
+def rasterize(polygons: Sequence[Polygon], grid: Grid) -> np.ndarray:
+    """
+    label every cell of grid with the 1-based index of the polygon its center
+    falls in, 0 outside all of them, using the smallest unsigned dtype that
+    holds the labels. rings are filled even-odd, so holes and the parts of a
+    multipolygon need no special care; where polygons overlap the later wins.
+    """
+    dtype = np.min_scalar_type(len(polygons))
+    labels = np.zeros(grid.shape, dtype=dtype)
+    for label, polygon in enumerate(polygons, start=1):
+        for row, start, stop in _spans(_rings(polygon), grid):
+            labels[row, start:stop] = label
+    return labels
+
+
+@dataclass(eq=False)
+class RegionMask:
+    """
+    polygons rasterized on a grid; the labeled cells are kept with their
+    labels, areas and the order that groups them by region, so statistics
+    only ever touch cells inside a region
+    """
+
+    grid: Grid
+    labels: np.ndarray
+    nregions: int
+    cells: np.ndarray = field(init=False, repr=False)
+    cell_labels: np.ndarray = field(init=False, repr=False)
+    cell_areas: np.ndarray = field(init=False, repr=False)
+    order: np.ndarray = field(init=False, repr=False)
+    starts: np.ndarray = field(init=False, repr=False)
+    areas: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        flat = self.labels.ravel()
+        # in grid order, so gathering them from a level reads memory forward
+        self.cells = np.flatnonzero(flat)
+        self.cell_labels = flat[self.cells].astype(np.intp) - 1
+        self.order = np.argsort(self.cell_labels, kind="stable")
+        self.cell_areas = row_areas(self.grid)[self.cells // self.grid.nlon]
+        counts = np.bincount(self.cell_labels, minlength=self.nregions)
+        self.starts = np.cumsum(counts) - counts
+        self.areas = self._sum(self.cell_areas)
+
+    def statistics(
+        self,
+        data: np.ndarray,
+        height: np.ndarray,
+        threshold: float = DEFAULT_THRESHOLD,
+    ) -> dict[str, np.ndarray]:
+        """
+        statistics of a (height, lat, lon) reflectivity volume in every region:
+        max_dbz, the maximum composite, mean_dbz, the area-weighted mean
+        composite of echo cells (composite >= threshold), NaN without echo,
+        echo_area (km**2) and echo_volume (km**3), cells >= threshold times
+        their depth. levels are as deep as the gap to the level below, the
+        first one reaches down to 0, as in compute_grid_attributes.
+        """
+        data = np.asanyarray(data)
+        if np.ma.isMaskedArray(data):
+            data = data.astype(np.result_type(data.dtype, "f4")).filled(np.nan)
+        # a level at a time into preallocated buffers of the labeled cells, so
+        # nothing grows with the number of levels
+        levels = np.diff(np.asarray(height, dtype="f8"), prepend=0.0)
+        values = np.empty(self.cells.size, np.result_type(data.dtype, "f4"))
+        composite = np.full_like(values, np.nan)
+        exceeds = np.empty(self.cells.size, bool)
+        depth, increment = np.zeros(self.cells.size), np.empty(self.cells.size)
+        for level, data2d in zip(levels, data):
+            np.take(np.ravel(data2d), self.cells, out=values)
+            np.fmax(composite, values, out=composite)
+            np.greater_equal(values, threshold, out=exceeds)
+            np.multiply(exceeds, level, out=increment)
+            np.add(depth, increment, out=depth)
+        echo = composite >= threshold
+
+        maxima = np.full(self.nregions, np.nan)
+        nonempty = np.bincount(self.cell_labels, minlength=self.nregions) > 0
+        if nonempty.any():
+            maxima[nonempty] = np.fmax.reduceat(
+                composite[self.order], self.starts[nonempty]
+            )
+
+        echo_area = self._sum(self.cell_areas * echo)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self._sum(self.cell_areas * np.where(echo, composite, 0)) / echo_area
+        return {
+            "max_dbz": maxima,
+            "mean_dbz": mean,
+            "echo_area": echo_area,
+            "echo_volume": self._sum(self.cell_areas * depth),
+        }
+
+    def _sum(self, weights: np.ndarray) -> np.ndarray:
+        return np.bincount(self.cell_labels, weights, minlength=self.nregions)
+
+
+class Regions:
+    """
+    a set of named polygons to compute statistics in. masks are rasterized on
+    first use with a grid and kept per grid definition, so every later frame
+    on the same grid (any tile, any time) reuses them
+    """
+
+    def __init__(
+        self,
+        polygons: Sequence[Polygon],
+        names: Optional[Sequence[Hashable]] = None,
+    ) -> None:
+        self.polygons = list(polygons)
+        if names is None:
+            names = range(len(self.polygons))
+        self.names = list(names)
+        if len(self.names) != len(self.polygons):
+            raise ValueError("there must be a name for every polygon")
+        self._masks: "OrderedDict[Grid, RegionMask]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.polygons)
+
+    def mask(self, grid: Grid) -> RegionMask:
+        """the RegionMask of the polygons on grid, rasterized once"""
+        if grid in self._masks:
+            self._masks.move_to_end(grid)
+        else:
+            labels = rasterize(self.polygons, grid)
+            self._masks[grid] = RegionMask(grid, labels, len(self))
+            while len(self._masks) > MASK_CACHE_SIZE:
+                self._masks.popitem(last=False)
+        return self._masks[grid]
+
+    def statistics(
+        self,
+        mosaics: Union[Any, Iterable[Any]],
+        threshold: float = DEFAULT_THRESHOLD,
+        var: str = DEFAULT_VAR,
+    ) -> xr.Dataset:
+        """
+        RegionMask.statistics of a MosaicTile (or MosaicStitch) along a region
+        dimension, or of every mosaic in an iterable along a time dimension
+        too, labeled with the mosaic Time
+        """
+        if hasattr(mosaics, var):
+            return self._statistics(mosaics, threshold, var)
+        frames = [self._statistics(mosaic, threshold, var) for mosaic in mosaics]
+        return xr.concat(frames, dim="time")
+
+    def _statistics(self, mosaic: Any, threshold: float, var: str) -> xr.Dataset:
+        mask = self.mask(Grid.from_tile(mosaic))
+        stats = mask.statistics(getattr(mosaic, var), mosaic.Height, threshold)
+        ds = xr.Dataset(
+            {name: ("region", values) for name, values in stats.items()},
+            coords={"region": self.names, "area": ("region", mask.areas)},
+            attrs={"threshold": threshold},
+        )
+        if getattr(mosaic, "Time", None) is not None:
+            ds.coords["time"] = np.datetime64(int(mosaic.Time), "s")
+        return ds
+
+
+@dataclass
+class Exceedance:
+    """
+    area (km**2) where the composite is at or above each threshold (dBZ) and
+    volume (km**3) of the gridpoints at or above it
+    """
+
+    thresholds: np.ndarray
+    area: np.ndarray
+    volume: np.ndarray
+
+
+def exceedance(
+    data: np.ndarray,
+    grid: Grid,
+    height: np.ndarray,
+    thresholds: Sequence[float],
+    *,
+    block_size: int = BLOCK_SIZE,
+) -> Exceedance:
+    """
+    the Exceedance of a (height, lat, lon) volume for every threshold, cells
+    sized as in compute_grid_attributes. the grid is read once, a block of
+    rows at a time: every value is binned among the sorted thresholds, by a
+    compare per threshold or, for many of them, searchsorted, and the bins
+    are counted per row (and level) with bincount, so cell sizes are applied
+    to counts rather than gridpoints and the only temporaries are block
+    sized. NaN and masked values never exceed.
+    """
+    thresholds = np.asarray(thresholds, dtype="f8")
+    order = np.argsort(thresholds.ravel())
+    edges = thresholds.ravel()[order]
+    nbins = edges.size + 1
+    levels = np.diff(np.asarray(height, dtype="f8"), prepend=0.0)
+    areas = row_areas(grid)
+    nz, nlat, nlon = np.shape(data)
+    step = max(1, block_size // (nz * nlon))
+
+    area, volume = np.zeros(nbins), np.zeros(nbins)
+    for start in range(0, nlat, step):
+        block = data[:, start : start + step]
+        if np.ma.isMaskedArray(block):
+            block = block.astype("f8").filled(np.nan)
+        rows = areas[start : start + step]
+        composite = np.fmax.reduce(block, axis=0)
+        # counts[..., k] are the gridpoints at or above exactly k thresholds
+        counts = _count_bins(composite, edges)
+        area += rows @ counts
+        counts = _count_bins(block, edges)
+        volume += np.einsum("k,r,krb->b", levels, rows, counts)
+
+    # at or above threshold i means in bin i + 1 or higher
+    area = np.cumsum(area[::-1])[::-1][1:]
+    volume = np.cumsum(volume[::-1])[::-1][1:]
+    unsort = np.empty_like(order)
+    unsort[order] = np.arange(order.size)
+    return Exceedance(
+        thresholds,
+        area[unsort].reshape(thresholds.shape),
+        volume[unsort].reshape(thresholds.shape),
+    )
+
+
+def _count_bins(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """counts of values in each bin between sorted edges, for every row"""
+    nbins = edges.size + 1
+    if edges.size < SEARCH_THRESHOLDS:
+        # a compare per edge is far cheaper than a binary search per value
+        bins = np.zeros(values.shape, np.uint8)
+        for edge in edges:
+            bins += values >= edge
+        bins = bins.astype(np.intp)
+    else:
+        bins = np.searchsorted(edges, values, side="right")
+        if values.dtype.kind == "f":
+            # NaN sorts above every edge
+            bins[np.isnan(values)] = 0
+    # a distinct range of bins for every row (and level)
+    bins += nbins * np.arange(values[..., 0].size).reshape(values.shape[:-1] + (1,))
+    counts = np.bincount(bins.ravel(), minlength=values[..., 0].size * nbins)
+    return counts.reshape(values.shape[:-1] + (nbins,))
+
+
+def _rings(polygon: Polygon) -> list[np.ndarray]:
+    if hasattr(polygon, "__geo_interface__"):
+        polygon = polygon.__geo_interface__
+    if isinstance(polygon, dict):
+        if polygon.get("type") == "Feature":
+            polygon = polygon["geometry"]
+        if polygon["type"] == "Polygon":
+            return [
+                np.asarray(ring, dtype="f8")[:, :2] for ring in polygon["coordinates"]
+            ]
+        if polygon["type"] == "MultiPolygon":
+            return [
+                np.asarray(ring, dtype="f8")[:, :2]
+                for part in polygon["coordinates"]
+                for ring in part
+            ]
+        raise TypeError(f"cannot rasterize a {polygon['type']}")
+    vertices = np.asarray(polygon[0], dtype="f8")
+    if vertices.ndim == 1:
+        return [np.asarray(polygon, dtype="f8")]
+    return [np.asarray(ring, dtype="f8") for ring in polygon]
+
+
+def _spans(rings: list[np.ndarray], grid: Grid) -> Iterable[tuple[int, int, int]]:
+    """the row, start and stop column of every run of cell centers inside"""
+    rows, cols = zip(*(grid.fractional_index(ring[:, 1], ring[:, 0]) for ring in rings))
+    # edges run from every vertex to the next one of its ring
+    r0, c0 = np.concatenate(rows), np.concatenate(cols)
+    r1 = np.concatenate([np.roll(row, -1) for row in rows])
+    c1 = np.concatenate([np.roll(col, -1) for col in cols])
+    # an edge crosses the centers of rows min(r0, r1) <= row < max(r0, r1),
+    # half open so a vertex on a row center is counted once
+    first = np.clip(np.ceil(np.minimum(r0, r1)), 0, grid.nlat)
+    last = np.clip(np.ceil(np.maximum(r0, r1)), 0, grid.nlat)
+    counts = (last - first).astype(np.intp)
+    total = counts.sum()
+    if not total:
+        return []
+    edge = np.repeat(np.arange(counts.size), counts)
+    offset = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    row = first[edge] + offset
+    col = c0[edge] + (row - r0[edge]) / (r1[edge] - r0[edge]) * (c1 - c0)[edge]
+    # every row is crossed an even number of times, pairs of crossings sorted
+    # along it bound the runs inside
+    order = np.lexsort((col, row))
+    row, col = row[order], col[order]
+    start = np.clip(np.ceil(col[0::2]), 0, grid.nlon).astype(np.intp)
+    stop = np.clip(np.ceil(col[1::2]), 0, grid.nlon).astype(np.intp)
+    inside = start < stop
+    return zip(row[0::2][inside].astype(np.intp), start[inside], stop[inside])
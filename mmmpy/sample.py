@@ -0,0 +1,355 @@
+"""
+sample mosaic volumes at arbitrary points of their regular lat/lon grid, e.g.
+along a great-circle cross section. grid indices come from the grid origin
+and spacing, never from a search of the 2D Latitude/Longitude arrays
+"""
+__all__ = [
+    "Grid",
+    "Weights",
+    "CrossSection",
+    "CrossSections",
+    "great_circle",
+    "cross_section",
+    "cross_sections",
+    "point_weights",
+]
+
+import multiprocessing
+from pathlib import Path
+from functools import lru_cache, partial
+from dataclasses import dataclass
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Iterable, Literal, Optional, Sequence
+
+import numpy as np
+
+from .constants import DEFAULT_VAR, EARTH_RADIUS
+
+Method = Literal["nearest", "bilinear"]
+# (lat, lon) of the start and end of a cross section
+Line = tuple[tuple[float, float], tuple[float, float]]
+# grids, line or point sets and methods a process keeps the weights of
+WEIGHTS_CACHE_SIZE = 16
+
+
+@dataclass(frozen=True)
+class Grid:
+    """
+    a regular lat/lon grid; spacings are signed, so rows that run north to
+    south have a negative `lat_spacing`. hashable, to key cached weights by
+    """
+
+    start_lat: float
+    start_lon: float
+    lat_spacing: float
+    lon_spacing: float
+    nlat: int
+    nlon: int
+
+    @classmethod
+    def from_tile(cls, tile) -> "Grid":
+        """the grid of a MosaicTile or MosaicStitch, rows run north to south"""
+        return cls(
+            float(tile.StartLat),
+            float(tile.StartLon),
+            -float(tile.LatGridSpacing),
+            float(tile.LonGridSpacing),
+            int(tile.nlat),
+            int(tile.nlon),
+        )
+
+    @classmethod
+    def from_coords(cls, latitude: np.ndarray, longitude: np.ndarray) -> "Grid":
+        """the grid of 1D, evenly spaced latitude and longitude coordinates"""
+        latitude, longitude = np.asarray(latitude), np.asarray(longitude)
+        return cls(
+            float(latitude[0]),
+            float(longitude[0]),
+            float((latitude[-1] - latitude[0]) / max(latitude.size - 1, 1)),
+            float((longitude[-1] - longitude[0]) / max(longitude.size - 1, 1)),
+            latitude.size,
+            longitude.size,
+        )
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.nlat, self.nlon
+
+    def fractional_index(
+        self, lat: np.ndarray, lon: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """row and column of every point, in units of gridpoints"""
+        row = (np.asarray(lat, dtype="f8") - self.start_lat) / self.lat_spacing
+        # longitudes are compared modulo 360, so -100 and 260 are the same
+        dlon = np.asarray(lon, dtype="f8") - self.start_lon
+        dlon = (dlon * np.sign(self.lon_spacing) + 180.0) % 360.0 - 180.0
+        return row, dlon / abs(self.lon_spacing)
+
+    def weights(
+        self, lat: np.ndarray, lon: np.ndarray, method: Method = "bilinear"
+    ) -> "Weights":
+        """the Weights that sample this grid at lat, lon"""
+        row, col = self.fractional_index(np.ravel(lat), np.ravel(lon))
+        nlat, nlon = self.shape
+        if method == "nearest":
+            r, c = np.rint(row), np.rint(col)
+            valid = (r >= 0) & (r < nlat) & (c >= 0) & (c < nlon)
+            index = np.where(valid, r * nlon + c, 0).astype("i8")
+            return Weights(index[np.newaxis], np.ones((1, index.size)), valid, self)
+        if method != "bilinear":
+            raise ValueError(f"unknown sampling method {method!r}")
+        valid = (row >= 0) & (row <= nlat - 1) & (col >= 0) & (col <= nlon - 1)
+        # the upper left corner of the cell, kept one short of the last
+        # row/column so points on the far edge still have four corners
+        r0 = np.clip(np.floor(row), 0, max(nlat - 2, 0))
+        c0 = np.clip(np.floor(col), 0, max(nlon - 2, 0))
+        fr = np.where(valid, row - r0, 0.0)
+        fc = np.where(valid, col - c0, 0.0)
+        r1 = np.minimum(r0 + 1, nlat - 1)
+        c1 = np.minimum(c0 + 1, nlon - 1)
+        index = np.stack(
+            [r0 * nlon + c0, r0 * nlon + c1, r1 * nlon + c0, r1 * nlon + c1]
+        )
+        weights = np.stack([(1 - fr) * (1 - fc), (1 - fr) * fc, fr * (1 - fc), fr * fc])
+        return Weights(index.astype("i8"), weights, valid, self)
+
+
+@dataclass(frozen=True)
+class Weights:
+    """
+    precomputed sampling of a grid at n points: the flat (row * nlon + column)
+    index and weight of every contributing gridpoint, shaped (k, n), and the
+    points that fall on the grid. reusable for every volume on the same grid
+    """
+
+    index: np.ndarray
+    weights: np.ndarray
+    valid: np.ndarray
+    grid: Grid
+
+    def __call__(self, data: np.ndarray) -> np.ndarray:
+        """
+        sample `data`, shaped (..., nlat, nlon), at every point in one gather,
+        across all leading axes (e.g. heights) at once. returns (..., n) with
+        NaN at points off the grid
+        """
+        data = np.asanyarray(data)
+        if data.shape[-2:] != self.grid.shape:
+            raise ValueError(f"data {data.shape} is not on the grid {self.grid.shape}")
+        # gather first, only the sampled gridpoints are converted to float
+        return self._weigh(data.reshape(*data.shape[:-2], -1)[..., self.index])
+
+    @property
+    def gridpoints(self) -> np.ndarray:
+        """sorted flat indices of the gridpoints the valid points are sampled from"""
+        return np.unique(self.index[:, self.valid])
+
+    def combine(self, values: np.ndarray) -> np.ndarray:
+        """
+        the samples from `values` (..., gridpoints.size) read at `gridpoints`
+        alone, for readers that fetch only those rather than the whole grid
+        """
+        gridpoints = self.gridpoints
+        if not gridpoints.size:
+            return np.full(np.shape(values)[:-1] + self.valid.shape, np.nan)
+        # invalid points may index gridpoints that were not read, masked below
+        position = np.searchsorted(gridpoints, self.index)
+        position = np.minimum(position, gridpoints.size - 1)
+        return self._weigh(np.asanyarray(values)[..., position])
+
+    def _weigh(self, gathered: np.ndarray) -> np.ndarray:
+        gathered = np.ma.filled(np.ma.asarray(gathered, dtype="f8"), np.nan)
+        values = (gathered * self.weights).sum(axis=-2)
+        values[..., ~self.valid] = np.nan
+        return values
+
+
+@dataclass(frozen=True)
+class CrossSection:
+    """
+    a vertical section of a volume: `values` are (height, distance), distance
+    is along the path from its start (km), height is as in the volume
+    """
+
+    distance: np.ndarray
+    height: np.ndarray
+    values: np.ndarray
+    latitude: np.ndarray
+    longitude: np.ndarray
+
+
+@dataclass(frozen=True)
+class CrossSections:
+    """
+    the same cross sections through many volumes: `values` are (time, line,
+    height, distance); distance, latitude and longitude are (line, distance)
+    """
+
+    time: np.ndarray
+    height: np.ndarray
+    distance: np.ndarray
+    latitude: np.ndarray
+    longitude: np.ndarray
+    values: np.ndarray
+
+
+def great_circle(
+    start: tuple[float, float], end: tuple[float, float], npoints: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    latitude, longitude and distance (km) from `start` of `npoints` evenly
+    spaced along the great circle from `start` to `end`, both (lat, lon)
+    """
+    v0, v1 = __unit_vector(*start), __unit_vector(*end)
+    angle = np.arccos(np.clip(np.dot(v0, v1), -1.0, 1.0))
+    t = np.linspace(0.0, 1.0, npoints)[:, np.newaxis]
+    if angle < 1e-12:
+        points = np.repeat(v0[np.newaxis], npoints, axis=0)
+    else:
+        points = (np.sin((1 - t) * angle) * v0 + np.sin(t * angle) * v1) / np.sin(angle)
+    x, y, z = points.T
+    lat = np.degrees(np.arcsin(np.clip(z, -1.0, 1.0)))
+    lon = np.degrees(np.arctan2(y, x))
+    return lat, lon, EARTH_RADIUS * angle * t[:, 0]
+
+
+def cross_section(
+    volume: np.ndarray,
+    grid: Grid,
+    height: np.ndarray,
+    start: tuple[float, float],
+    end: tuple[float, float],
+    npoints: Optional[int] = None,
+    method: Method = "bilinear",
+) -> CrossSection:
+    """
+    the section of `volume`, shaped (height, nlat, nlon) on `grid`, along the
+    great circle from `start` to `end` (lat, lon). `npoints` defaults to about
+    one sample per gridpoint along the path
+    """
+    if npoints is None:
+        npoints = section_points(grid, start, end)
+    lat, lon, distance = great_circle(start, end, npoints)
+    values = grid.weights(lat, lon, method)(volume)
+    return CrossSection(distance, np.asarray(height), values, lat, lon)
+
+
+def cross_sections(
+    mosaics: Iterable[Any],
+    lines: Sequence[Line],
+    *,
+    npoints: Optional[int] = None,
+    var: str = DEFAULT_VAR,
+    method: Method = "bilinear",
+    workers: Optional[int] = None,
+) -> CrossSections:
+    """
+    the same great-circle `lines`, each ((lat, lon), (lat, lon)), through
+    every mosaic: a MosaicTile/MosaicStitch, or a file MosaicTile can read.
+
+    the points of all lines are sampled in one gather per volume, with weights
+    computed once per grid. files are read and sampled in a process pool,
+    tiles already in memory in a thread pool. `npoints` defaults to about one
+    per gridpoint along the longest line of the first mosaic's grid.
+    """
+    lines = tuple((tuple(a), tuple(b)) for a, b in lines)
+    mosaics = list(mosaics)
+    if not mosaics or not lines:
+        raise ValueError("need at least one mosaic and one line")
+    # the first mosaic fixes npoints, and on fork the workers inherit its weights
+    first = __load(mosaics[0], var)
+    if npoints is None:
+        grid = Grid.from_tile(first)
+        npoints = max(section_points(grid, a, b) for a, b in lines)
+    extract = partial(__extract, lines=lines, npoints=npoints, var=var, method=method)
+    results = [extract(first)]
+    with __executor(mosaics[1:], workers) as pool:
+        results.extend(pool.map(extract, mosaics[1:]))
+
+    times, heights, values = zip(*results)
+    if any(not np.array_equal(height, heights[0]) for height in heights):
+        raise ValueError("the mosaics do not share the same heights")
+    lat, lon, distance = zip(*(great_circle(a, b, npoints) for a, b in lines))
+    return CrossSections(
+        np.asarray(times),
+        np.asarray(heights[0]),
+        np.stack(distance),
+        np.stack(lat),
+        np.stack(lon),
+        np.stack(values),
+    )
+
+
+def point_weights(
+    grid: Grid, lat: np.ndarray, lon: np.ndarray, method: Method = "nearest"
+) -> Weights:
+    """
+    Weights that sample `grid` at the points lat, lon. cached by the grid,
+    method and the points themselves, so a station list that is sampled
+    frame after frame is only indexed once
+    """
+    lat = np.ascontiguousarray(np.ravel(lat), dtype="f8")
+    lon = np.ascontiguousarray(np.ravel(lon), dtype="f8")
+    if lat.shape != lon.shape:
+        raise ValueError("lat and lon must have the same number of points")
+    return __point_weights(grid, lat.tobytes(), lon.tobytes(), method)
+
+
+def section_points(
+    grid: Grid, start: tuple[float, float], end: tuple[float, float]
+) -> int:
+    """about one point per gridpoint along the great circle from start to end"""
+    row, col = grid.fractional_index(*zip(start, end))
+    crossed = max(abs(row[1] - row[0]), abs(col[1] - col[0]))
+    # rounded first, so float error never adds a point
+    return max(int(np.ceil(np.round(crossed, 6))) + 1, 2)
+
+
+def __unit_vector(lat: float, lon: float) -> np.ndarray:
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.array([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+@lru_cache(maxsize=WEIGHTS_CACHE_SIZE)
+def __section_weights(
+    grid: Grid, lines: tuple[Line, ...], npoints: int, method: Method
+) -> Weights:
+    points = [great_circle(a, b, npoints) for a, b in lines]
+    lat = np.concatenate([lat for lat, _, _ in points])
+    lon = np.concatenate([lon for _, lon, _ in points])
+    return grid.weights(lat, lon, method)
+
+
+@lru_cache(maxsize=WEIGHTS_CACHE_SIZE)
+def __point_weights(grid: Grid, lat: bytes, lon: bytes, method: Method) -> Weights:
+    return grid.weights(np.frombuffer(lat), np.frombuffer(lon), method)
+
+
+def __load(mosaic: Any, var: str) -> Any:
+    from ._mmmpy import MosaicTile
+
+    if isinstance(mosaic, (str, Path)):
+        mosaic = MosaicTile(str(mosaic))
+    if not hasattr(mosaic, var):
+        raise ValueError(f"{var} was not read from {mosaic!r}")
+    return mosaic
+
+
+def __extract(
+    mosaic: Any, *, lines: tuple[Line, ...], npoints: int, var: str, method: Method
+) -> tuple[float, np.ndarray, np.ndarray]:
+    """time, height and (line, height, distance) values of one mosaic"""
+    tile = __load(mosaic, var)
+    weights = __section_weights(Grid.from_tile(tile), lines, npoints, method)
+    values = weights(getattr(tile, var))
+    values = values.reshape(-1, len(lines), npoints).swapaxes(0, 1)
+    return tile.Time, np.asarray(tile.Height), values
+
+
+def __executor(mosaics: Sequence[Any], workers: Optional[int]) -> Executor:
+    """processes for files, which are read in the worker; threads for tiles"""
+    if mosaics and all(isinstance(mosaic, (str, Path)) for mosaic in mosaics):
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        return ProcessPoolExecutor(workers, mp_context=context)
+    return ThreadPoolExecutor(workers)
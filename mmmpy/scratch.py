@@ -0,0 +1,91 @@
+"""
+per call scratch directories for unpacked archives
+"""
+__all__ = ["ScratchSpace", "SCRATCH"]
+
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from .typing import StrPath
+from .constants import SCRATCH_ROOT, SCRATCH_MAX_BYTES
+
+
+class ScratchSpace:
+    """
+    unique, self cleaning scratch directories with a shared size budget.
+
+    every call to `directory` gets a fresh directory below `root`, so threads
+    and processes never share one. callers reserve the number of bytes they
+    are about to write and block until that many bytes are free; the budget
+    is per process, a reservation larger than the whole budget is let through
+    once nothing else is held so it cannot wait forever. a thread that already
+    holds part of the budget (e.g. unpacking several archives to read them
+    together) is never made to wait, since it could only wait on itself.
+    """
+
+    def __init__(
+        self,
+        root: StrPath = SCRATCH_ROOT,
+        max_bytes: int = SCRATCH_MAX_BYTES,
+    ) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._reserved = 0
+        # open reservations of every thread that holds any
+        self._holders: dict[int, int] = {}
+        self._condition = threading.Condition()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({str(self.root)!r}, max_bytes={self.max_bytes})"
+
+    @property
+    def reserved(self) -> int:
+        """bytes currently held by open scratch directories"""
+        return self._reserved
+
+    @contextmanager
+    def reserve(self, nbytes: int) -> Iterator[None]:
+        """hold `nbytes` of the budget for the duration of the context"""
+        thread = threading.get_ident()
+        with self._condition:
+            self._condition.wait_for(
+                lambda: thread in self._holders
+                or not self._reserved
+                or self._reserved + nbytes <= self.max_bytes
+            )
+            self._reserved += nbytes
+            self._holders[thread] = self._holders.get(thread, 0) + 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._reserved -= nbytes
+                self._holders[thread] -= 1
+                if not self._holders[thread]:
+                    del self._holders[thread]
+                self._condition.notify_all()
+
+    @contextmanager
+    def directory(
+        self, nbytes: int = 0, root: Optional[StrPath] = None
+    ) -> Iterator[Path]:
+        """
+        yield a new empty directory below `root` (defaults to self.root),
+        it is removed with everything in it on exit
+        """
+        with self.reserve(nbytes):
+            root = Path(self.root if root is None else root)
+            root.mkdir(parents=True, exist_ok=True)
+            tmpdir = Path(tempfile.mkdtemp(prefix="mmmpy-", dir=root))
+            try:
+                yield tmpdir
+            finally:
+                shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+# shared by the unzip helpers
+SCRATCH = ScratchSpace()
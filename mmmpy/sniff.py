@@ -0,0 +1,73 @@
+"""
+identify mrms file formats from their leading bytes rather than file names
+"""
+__all__ = ["sniff", "Compression"]
+
+import gzip
+import zipfile
+from pathlib import Path
+from typing import Literal, Optional
+
+from .typing import Engine, StrPath
+from .binary import FIXED_HEADER_SIZE, GZIP_MAGIC, is_plausible_header
+
+Compression = Literal["gzip", "zip"]
+
+# enough bytes for every signature below and the fixed binary header
+HEAD_SIZE = FIXED_HEADER_SIZE
+GRIB_MAGIC = b"GRIB"
+HDF5_MAGIC = b"\x89HDF\r\n\x1a\n"
+NETCDF3_MAGIC = (b"CDF\x01", b"CDF\x02", b"CDF\x05")
+ZIP_MAGIC = b"PK\x03\x04"
+ZARR_METADATA = (".zgroup", ".zarray", "zarr.json")
+
+
+def sniff(file: StrPath) -> tuple[Optional[Engine], Optional[Compression]]:
+    """
+    resolve the engine that can read `file` and the compression it is
+    wrapped in, reading only the first few bytes.
+
+    zip archives are resolved by the first member, gzipped members are looked
+    through. (None, None) is returned for anything unrecognized.
+    """
+    file = Path(file)
+    if file.is_dir():
+        # zarr stores are directories with group metadata at the root
+        zarr = any((file / key).exists() for key in ZARR_METADATA)
+        return ("zarr" if zarr else None), None
+
+    with file.open("rb") as f:
+        head = f.read(HEAD_SIZE)
+
+    if head.startswith(ZIP_MAGIC) and zipfile.is_zipfile(file):
+        return __sniff_zip(file), "zip"
+
+    if head.startswith(GZIP_MAGIC):
+        with gzip.open(file, "rb") as f:
+            return __sniff_head(f.read(HEAD_SIZE)), "gzip"
+
+    return __sniff_head(head), None
+
+
+def __sniff_zip(file: Path) -> Optional[Engine]:
+    with zipfile.ZipFile(file, "r") as zref:
+        members = [info for info in zref.infolist() if not info.is_dir()]
+        if not members:
+            return None
+        with zref.open(members[0], "r") as f:
+            head = f.read(HEAD_SIZE)
+            if head.startswith(GZIP_MAGIC):
+                f.seek(0)
+                with gzip.open(f, "rb") as gz:
+                    head = gz.read(HEAD_SIZE)
+    return __sniff_head(head)
+
+
+def __sniff_head(head: bytes) -> Optional[Engine]:
+    if head.startswith(GRIB_MAGIC):
+        return "cfgrib"
+    elif head.startswith(HDF5_MAGIC) or head.startswith(NETCDF3_MAGIC):
+        return "netcdf4"
+    elif is_plausible_header(head):
+        return "binary"
+    return None
@@ -3,5 +3,5 @@ from pathlib import Path
 from typing import TypeVar, Literal
 
 StrPath = TypeVar("StrPath", str, Path)
-Engine = Literal["netcdf4", "cfgrib", "binary"]
+Engine = Literal["netcdf4", "cfgrib", "binary", "zarr"]
 Archive = Literal["zip", "tar", "gztar", "bztar", "xztar"]
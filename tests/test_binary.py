@@ -0,0 +1,71 @@
+import gzip
+from pathlib import Path
+
+import numpy as np
+import pytest
+import xarray as xr
+
+import mmmpy
+from mmmpy.binary import construct_dtype, read_header
+from mmmpy.backends import MRMSBinaryBackendEntrypoint
+
+NZ, NLAT, NLON = 3, 4, 5
+
+
+def write_binary(path: Path, minute: int = 0) -> np.ndarray:
+    """write a small synthetic MRMS binary file and return the stored data3d"""
+    dt = construct_dtype(NZ, NLAT, NLON)
+    data3d = np.arange(NZ * NLAT * NLON, dtype="i2").reshape(NZ, NLAT, NLON)
+    record = np.zeros(1, dtype=dt)
+    fields = dict(year=2014, month=7, day=5, hour=14, minute=minute, second=0)
+    fields.update(nlon=NLON, nlat=NLAT, nz=NZ, map_scale=1000, dxy_scale=100000)
+    fields.update(StartLon=-130000, StartLat=55000, dlon=1000, dlat=1000)
+    fields.update(z_scale=1, var_scale=10, missing_value=-99, NR=1)
+    fields.update(VarName=b"mosaicked_refl1", VarUnit=b"dbz")
+    for key, value in fields.items():
+        record[key] = value
+    record["Height"] = [500, 750, 1000]
+    record["data3d"] = data3d
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "wb") as f:
+        f.write(record.tobytes())
+    return data3d
+
+
+@pytest.mark.parametrize("name", ["MREF3D33L_tile1.dat", "MREF3D33L_tile1.dat.gz"])
+def test_open_dataset(tmp_path: Path, name: str) -> None:
+    file = tmp_path / name
+    data3d = write_binary(file)
+    header = read_header(file)
+    assert header.shape == (NZ, NLAT, NLON)
+    assert header.gzipped == (file.suffix == ".gz")
+
+    ds = xr.open_dataset(file, engine=MRMSBinaryBackendEntrypoint)
+    (name,) = ds
+    assert name == "mosaicked_refl1"
+    # latitude is north to south and the data is flipped to match
+    assert ds.latitude[0] == pytest.approx(55.0)
+    assert np.all(np.diff(ds.latitude) < 0)
+    expected = data3d[:, ::-1, :] / 10.0
+    np.testing.assert_allclose(ds[name].values, expected)
+    np.testing.assert_allclose(
+        ds[name].isel(heightAboveSea=1, longitude=2), expected[1, :, 2]
+    )
+    np.testing.assert_allclose(ds.heightAboveSea, [500, 750, 1000])
+
+
+def test_read_mrms_binary(tmp_path: Path) -> None:
+    files = [tmp_path / f"tile1.{minute:02}.gz" for minute in (0, 2)]
+    for minute, file in zip((0, 2), files):
+        write_binary(file, minute)
+
+    mrms = mmmpy.read_mrms(files, engine="binary", name="mrefl3d")
+    ds = mrms.to_xarray()
+    assert ds.mrefl3d.dims == ("validTime", "heightAboveSea", "latitude", "longitude")
+    # one chunk per height plane and time
+    assert ds.mrefl3d.chunks == ((1, 1), (1, 1, 1), (NLAT,), (NLON,))
+    assert ds.validTime.size == 2
+
+    chunks = {"heightAboveSea": -1}
+    ds = mmmpy.read_mrms(files, engine="binary", parallel=False, chunks=chunks)
+    assert ds.to_xarray()["mosaicked_refl1"].chunks[1] == (NZ,)
@@ -0,0 +1,129 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+from matplotlib import pyplot as plt
+from matplotlib.collections import QuadMesh
+
+import mmmpy
+from test_binary import write_binary
+
+# Basemap is only needed to draw maps
+pytest.importorskip("mpl_toolkits.basemap")
+
+
+@pytest.fixture
+def tile(tmp_path: Path) -> mmmpy.MosaicTile:
+    write_binary(tmp_path / "tile1.dat.gz")
+    return mmmpy.MosaicTile(str(tmp_path / "tile1.dat.gz"))
+
+
+@pytest.mark.parametrize("decimate", [True, False])
+def test_plot_horiz_raster(tile: mmmpy.MosaicTile, decimate: bool) -> None:
+    plt.switch_backend("agg")
+    fig = plt.figure(figsize=(4, 4), dpi=50)
+    display = mmmpy.MosaicDisplay(tile)
+    level = tile.Height[1]
+    ranges = dict(latrange=[54.965, 55.005], lonrange=[-130.005, -129.955])
+    clevs = np.arange(0, 7.5, 0.5)
+    _, ax, m = display.plot_horiz(
+        **ranges,
+        level=level,
+        clevs=clevs,
+        raster=True,
+        decimate=decimate,
+        colorbar_flag=False,
+        return_flag=True,
+        resolution="c",
+    )
+    meshes = [c for c in ax.collections if isinstance(c, QuadMesh)]
+    (artist,) = ax.images if decimate else meshes
+    data = artist.get_array()
+    if decimate:
+        # sampled at the size of the axes in pixels
+        bbox = ax.get_window_extent()
+        assert data.shape == (np.ceil(bbox.height), np.ceil(bbox.width))
+        # the map fits the grid, so the image corners are the grid corners
+        expected = tile.mrefl3d[1]
+        assert data[-1, 0] == expected[0, 0]
+        assert data[0, -1] == expected[-1, -1]
+    else:
+        assert data.size == tile.nlat * tile.nlon
+    plt.close(fig)
+
+
+def test_map_background_cache(tile: mmmpy.MosaicTile) -> None:
+    plt.switch_backend("agg")
+    display = mmmpy.MosaicDisplay(tile)
+    ranges = dict(latrange=[54.965, 55.005], lonrange=[-130.005, -129.955])
+    maps = []
+    for raster in (False, True, False):
+        fig = plt.figure(figsize=(4, 4), dpi=50)
+        _, ax, m = display.plot_horiz(
+            **ranges, raster=raster, cached=True, resolution="c", return_flag=True
+        )
+        maps.append(m)
+        # the boundaries are a single image drawn over the data
+        assert ax.images[-1].get_zorder() > 1
+        plt.close(fig)
+
+    background = mmmpy.display.map_background(
+        np.array(ranges["latrange"]), tuple(ranges["lonrange"]), "c"
+    )
+    assert all(m is background.basemap for m in maps)
+    # rendered once for the one frame size, the grid projected once
+    assert len(background._images) == 1
+    assert len(background._grids) == 1
+
+
+def test_render_frames(tmp_path: Path) -> None:
+    Image = pytest.importorskip("PIL.Image")
+    files = [tmp_path / f"tile1.{minute:02}.dat.gz" for minute in range(3)]
+    for minute, file in enumerate(files):
+        write_binary(file, minute)
+
+    backend = plt.get_backend()
+    frames = mmmpy.animate.render_frames(
+        files,
+        tmp_path / "frames",
+        workers=2,
+        animation=tmp_path / "loop.gif",
+        figsize=(3, 3),
+        dpi=50,
+        latrange=[54.965, 55.005],
+        lonrange=[-130.005, -129.955],
+        resolution="c",
+        raster=True,
+    )
+    assert [frame.name for frame in frames] == [f"frame_{i:04}.png" for i in range(3)]
+    for frame in frames:
+        with Image.open(frame) as image:
+            assert image.size == (150, 150)
+    with Image.open(tmp_path / "loop.gif") as gif:
+        assert gif.n_frames == 3
+    # only the workers switch backends
+    assert plt.get_backend() == backend
+
+    # files MosaicTile cannot read are reported, rather than drawn empty
+    (tmp_path / "tile1.03.dat.gz").write_bytes(b"not a mosaic")
+    with pytest.raises(ValueError, match="tile1.03.dat.gz"):
+        mmmpy.animate.render_frames(
+            [*files[:1], tmp_path / "tile1.03.dat.gz"],
+            tmp_path / "frames",
+            workers=2,
+            figsize=(3, 3),
+            dpi=50,
+            resolution="c",
+        )
+
+
+def test_plot_cross_section(tile: mmmpy.MosaicTile) -> None:
+    plt.switch_backend("agg")
+    fig = plt.figure()
+    display = mmmpy.MosaicDisplay(tile)
+    _, ax, section = display.plot_cross_section(
+        (54.995, -129.995), (54.975, -129.965), return_flag=True
+    )
+    assert ax.get_xlim() == (0, section.distance[-1])
+    assert "UTC (54.99, -130.00) to (54.98, -129.97)" in ax.get_title()
+    plt.close(fig)
@@ -0,0 +1,548 @@
+import os
+import gzip
+import asyncio
+import threading
+from pathlib import Path
+from datetime import datetime
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+import mmmpy
+from mmmpy import extract
+from mmmpy.cache import ListingState
+from test_io import write_grib
+
+VALID_TIME = datetime(2022, 8, 1, 12, 2)
+LEVELS = ("00.50", "01.00", "01.25")
+MINUTES_2 = np.timedelta64(2, "m")
+LISTING = """<html><body><table>
+<tr><th>Name</th><th>Last modified</th><th>Size</th></tr>
+<tr><th colspan="3"><hr></th></tr>
+<tr><td><a href="../">Parent Directory</a></td><td></td><td>-</td></tr>
+{rows}
+<tr><th colspan="3"><hr></th></tr>
+</table></body></html>
+"""
+
+
+class Handler(SimpleHTTPRequestHandler):
+    """
+    serves a directory tree with byte range support, failing or cutting
+    short the first requests to some paths
+    """
+
+    failures: dict[str, int] = {}
+    truncate: dict[str, int] = {}
+    requests: list[str] = []
+    statuses: list[tuple[str, int]] = []
+    ranges: list[tuple[str, str]] = []
+
+    def do_GET(self) -> None:
+        self.requests.append(self.path)
+        if self.failures.get(self.path, 0) > 0:
+            self.failures[self.path] -= 1
+            self.send_error(503)
+            return
+        path = Path(self.translate_path(self.path))
+        if path.is_file() and ("Range" in self.headers or self.path in self.truncate):
+            self.send_range(path.read_bytes())
+            return
+        super().do_GET()
+
+    def send_range(self, data: bytes) -> None:
+        byte_range = self.headers.get("Range", "bytes=0-")
+        self.ranges.append((self.path, byte_range))
+        start = int(byte_range.removeprefix("bytes=").split("-")[0])
+        if start >= len(data):
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(data)}")
+            self.end_headers()
+            return
+        body = data[start:]
+        if "Range" in self.headers:
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}"
+            )
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.truncate.get(self.path, 0) > 0:
+            # the connection drops half way through the body
+            self.truncate[self.path] -= 1
+            body = body[: len(body) // 2]
+            self.close_connection = True
+        self.wfile.write(body)
+
+    def log_request(self, code="-", size="-") -> None:
+        self.statuses.append((self.path, int(code)))
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def write_listing(directory: Path, names: list[str], latest: str = "") -> None:
+    """an index page laid out like the ncep directory listings"""
+    rows = []
+    if latest:
+        rows.append(
+            f'<tr><td><a href="{latest}">{latest}</a></td><td></td><td>1</td></tr>'
+        )
+    rows += [
+        f'<tr><td><a href="{name}">{name}</a></td><td>2022-08-01 12:00</td><td>1</td></tr>'
+        for name in names
+    ]
+    (directory / "index.html").write_text(LISTING.format(rows="\n".join(rows)))
+
+
+def write_3drefl(root: Path) -> dict[str, bytes]:
+    """mirror of the 3DRefl tree, returns the payload of every recent file"""
+    base = root / "data" / "3DRefl"
+    base.mkdir(parents=True)
+    levels = [f"MergedReflectivityQC_{level}/" for level in LEVELS]
+    write_listing(base, levels)
+    payloads = {}
+    for level in LEVELS:
+        directory = base / f"MergedReflectivityQC_{level}"
+        directory.mkdir()
+        names = []
+        for stamp in ("20220801-112039", "20220801-120039", "20220801-120239"):
+            name = f"MRMS_MergedReflectivityQC_{level}_{stamp}.grib2"
+            payload = f"GRIB {level} {stamp}".encode() * 100
+            (directory / f"{name}.gz").write_bytes(gzip.compress(payload))
+            names.append(f"{name}.gz")
+            if stamp != "20220801-112039":
+                payloads[name] = payload
+        write_listing(directory, names, latest=names[-1].replace("2022", "latest"))
+    return payloads
+
+
+@pytest.fixture
+def server(tmp_path: Path):
+    """a local stand in for the mrms web servers, yields (root, url)"""
+    root = tmp_path / "www"
+    root.mkdir()
+    Handler.failures, Handler.truncate = {}, {}
+    Handler.requests, Handler.statuses, Handler.ranges = [], [], []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), partial(Handler, directory=root))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield root, f"http://127.0.0.1:{httpd.server_port}"
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_from_ncep(tmp_path: Path, server) -> None:
+    root, url = server
+    payloads = write_3drefl(root)
+    flaky = "/data/3DRefl/MergedReflectivityQC_01.00/"
+    flaky += "MRMS_MergedReflectivityQC_01.00_20220801-120039.grib2.gz"
+    Handler.failures[flaky] = 2
+
+    destination = tmp_path / "3DRefl"
+    files = extract.from_ncep(
+        destination,
+        input_dt=VALID_TIME,
+        baseurl=f"{url}/data/3DRefl/",
+        workers=4,
+        backoff=0.01,
+    )
+    assert sorted(file.name for file in files) == sorted(payloads)
+    for file in files:
+        assert file.read_bytes() == payloads[file.name]
+    # the failed requests were retried and nothing partial was left behind
+    assert Handler.requests.count(flaky) == 3
+    assert not list(destination.glob("*.part"))
+
+
+def test_from_ncep_gives_up(tmp_path: Path, server) -> None:
+    root, url = server
+    payloads = write_3drefl(root)
+    broken = "/data/3DRefl/MergedReflectivityQC_00.50/"
+    broken += "MRMS_MergedReflectivityQC_00.50_20220801-120239.grib2.gz"
+    Handler.failures[broken] = 10
+
+    files = extract.from_ncep(
+        tmp_path / "3DRefl",
+        input_dt=VALID_TIME,
+        baseurl=f"{url}/data/3DRefl/",
+        retries=1,
+        backoff=0.01,
+    )
+    assert len(files) == len(payloads) - 1
+    assert Handler.requests.count(broken) == 2
+
+
+def test_from_ncep_raises_local_errors(tmp_path: Path, server) -> None:
+    root, url = server
+    write_3drefl(root)
+    name = "MRMS_MergedReflectivityQC_00.50_20220801-120239.grib2"
+    destination = tmp_path / "3DRefl"
+    # the part file cannot be written, another request would not help
+    (destination / f"{name}.part").mkdir(parents=True)
+
+    with pytest.raises(IsADirectoryError):
+        extract.from_ncep(
+            destination,
+            input_dt=VALID_TIME,
+            baseurl=f"{url}/data/3DRefl/",
+            backoff=0.01,
+        )
+    path = f"/data/3DRefl/MergedReflectivityQC_00.50/{name}.gz"
+    assert Handler.requests.count(path) == 1
+
+
+def test_from_ncep_retries_listings(tmp_path: Path, server) -> None:
+    root, url = server
+    payloads = write_3drefl(root)
+    level = "/data/3DRefl/MergedReflectivityQC_01.00/"
+    Handler.failures["/data/3DRefl/"] = 1
+    Handler.failures[level] = 2
+
+    files = extract.from_ncep(
+        tmp_path / "3DRefl",
+        input_dt=VALID_TIME,
+        baseurl=f"{url}/data/3DRefl/",
+        backoff=0.01,
+    )
+    assert sorted(file.name for file in files) == sorted(payloads)
+    assert Handler.requests.count("/data/3DRefl/") == 2
+    assert Handler.requests.count(level) == 3
+
+    # a level listing that keeps failing skips that level only
+    Handler.failures[level] = 10
+    files = extract.from_ncep(
+        tmp_path / "retry",
+        input_dt=VALID_TIME,
+        baseurl=f"{url}/data/3DRefl/",
+        retries=1,
+        backoff=0.01,
+    )
+    assert len(files) == len(payloads) - 2
+    assert not any("_01.00_" in file.name for file in files)
+
+
+async def collect(**kwargs) -> list[extract.Level]:
+    return [level async for level in extract.stream_ncep(**kwargs)]
+
+
+def test_stream_ncep(tmp_path: Path, server) -> None:
+    pytest.importorskip("aiohttp")
+    root, url = server
+    payloads = write_3drefl(root)
+    flaky = "/data/3DRefl/MergedReflectivityQC_00.50/"
+    flaky += "MRMS_MergedReflectivityQC_00.50_20220801-120239.grib2.gz"
+    Handler.failures[flaky] = 1
+    # listings are retried too
+    Handler.failures["/data/3DRefl/MergedReflectivityQC_01.00/"] = 1
+
+    baseurl = f"{url}/data/3DRefl/"
+    levels = asyncio.run(collect(input_dt=VALID_TIME, baseurl=baseurl, backoff=0.01))
+    assert {level.name: level.data for level in levels} == payloads
+    assert all(level.values is None for level in levels)
+
+    async def first() -> set[asyncio.Task]:
+        levels = extract.stream_ncep(input_dt=VALID_TIME, baseurl=baseurl, workers=1)
+        async for _ in levels:
+            break
+        await levels.aclose()
+        return asyncio.all_tasks() - {asyncio.current_task()}
+
+    # stopping early leaves no download pending
+    assert asyncio.run(first()) == set()
+
+
+def test_stream_ncep_decode(tmp_path: Path, server) -> None:
+    pytest.importorskip("aiohttp")
+    pytest.importorskip("pygrib")
+    root, url = server
+    directory = root / "3DRefl" / "MergedReflectivityQC_00.50"
+    directory.mkdir(parents=True)
+    write_listing(root / "3DRefl", ["MergedReflectivityQC_00.50/"])
+    name = "MRMS_MergedReflectivityQC_00.50_20220801-120039.grib2"
+    write_grib(tmp_path / name, 500)
+    (directory / f"{name}.gz").write_bytes(
+        gzip.compress((tmp_path / name).read_bytes())
+    )
+    write_listing(directory, [f"{name}.gz"], latest="latest.grib2.gz")
+
+    baseurl = f"{url}/3DRefl/"
+    (level,) = asyncio.run(collect(input_dt=VALID_TIME, baseurl=baseurl, decode=True))
+    assert level.name == name
+    np.testing.assert_allclose(level.values, np.arange(20.0).reshape(4, 5) + 500)
+
+
+def test_poll_ncep(tmp_path: Path, server) -> None:
+    root, url = server
+    write_3drefl(root)
+    baseurl = f"{url}/data/3DRefl/"
+    state = tmp_path / "state.json"
+    # every file counts as recent
+    kwargs = dict(interval=0, max_seconds=10**10, baseurl=baseurl, state=state)
+
+    polling = extract.poll_ncep(tmp_path / "3DRefl", **kwargs)
+    first = [next(polling) for _ in range(9)]
+    assert len(set(first)) == 9
+
+    # a new file shows up on a single level page
+    directory = root / "data" / "3DRefl" / "MergedReflectivityQC_01.25"
+    name = "MRMS_MergedReflectivityQC_01.25_20220801-120439.grib2"
+    (directory / f"{name}.gz").write_bytes(gzip.compress(b"GRIB new"))
+    names = sorted(file.name for file in directory.glob("*.gz"))
+    write_listing(directory, names, latest="latest.grib2.gz")
+    index = directory / "index.html"
+    future = index.stat().st_mtime + 10
+    os.utime(index, (future, future))
+
+    Handler.statuses.clear()
+    assert next(polling).name == name
+    polling.close()
+    listings = [code for path, code in Handler.statuses if path.endswith("/")]
+    # the root and two level pages were unchanged
+    assert sorted(listings) == [200, 304, 304, 304]
+
+    # a new process picks up where the last one stopped
+    assert not list(extract.poll_ncep(tmp_path / "3DRefl", cycles=1, **kwargs))
+    assert len(ListingState(state).listing(baseurl)) == 3
+
+
+def write_mtarchive(root: Path) -> dict[str, bytes]:
+    """two days of a mirrored archive, returns payloads around midnight"""
+    payloads = {}
+    for day, stamps in (
+        ("2022/08/01", ("20220801-234039", "20220801-235839")),
+        ("2022/08/02", ("20220802-000039", "20220802-002039")),
+    ):
+        for product in ("MergedReflectivityQC", "PrecipRate"):
+            directory = root / day / "mrms" / "ncep" / product
+            directory.mkdir(parents=True)
+            names = []
+            for stamp in stamps:
+                name = f"{product}_00.50_{stamp}.grib2.gz"
+                payload = gzip.compress(os.urandom(256 * 1024))
+                (directory / name).write_bytes(payload)
+                names.append(name)
+                if product == "MergedReflectivityQC" and stamp[9:] in (
+                    "235839",
+                    "000039",
+                ):
+                    payloads[f"{day}/mrms/ncep/{product}/{name}"] = payload
+            write_listing(directory, names)
+    return payloads
+
+
+def test_from_mtarchive(tmp_path: Path, server) -> None:
+    root, url = server
+    payloads = write_mtarchive(root)
+    (cut,) = [name for name in payloads if name.startswith("2022/08/02")]
+    Handler.truncate["/" + cut] = 1
+
+    destination = tmp_path / "mtarchive"
+    kwargs = dict(baseurl=f"{url}/", backoff=0.01)
+    start, stop = datetime(2022, 8, 1, 23, 50), datetime(2022, 8, 2, 0, 10)
+    files = extract.from_mtarchive(start, stop, destination, **kwargs)
+    assert sorted(files) == sorted(destination / name for name in payloads)
+    for name, payload in payloads.items():
+        assert (destination / name).read_bytes() == payload
+    # the dropped transfer was resumed where it stopped
+    (first, resumed) = [rng for path, rng in Handler.ranges if path == "/" + cut]
+    assert first == "bytes=0-"
+    assert resumed == f"bytes={len(payloads[cut]) // 2}-"
+    assert not list(destination.rglob("*.part"))
+
+    # restarting downloads nothing that is already present
+    Handler.requests.clear()
+    files = extract.from_mtarchive(start, stop, destination, **kwargs)
+    assert len(files) == len(payloads)
+    assert all(path.endswith("/") for path in Handler.requests)
+
+
+def test_from_mtarchive_verifies(tmp_path: Path, server) -> None:
+    root, url = server
+    payloads = write_mtarchive(root)
+    name = next(iter(payloads))
+    destination = tmp_path / "mtarchive"
+    # a leftover part from an earlier run that does not match the file
+    part = destination / (name + ".part")
+    part.parent.mkdir(parents=True)
+    part.write_bytes(b"\x1f\x8b" + bytes(len(payloads[name]) - 2))
+
+    valid_time = datetime.strptime(name[-24:-9], "%Y%m%d-%H%M%S")
+    files = extract.from_mtarchive(
+        valid_time, valid_time, destination, baseurl=f"{url}/", backoff=0.01
+    )
+    assert files == [destination / name]
+    assert files[0].read_bytes() == payloads[name]
+
+
+def test_from_mtarchive_skips_listing(tmp_path: Path, server) -> None:
+    root, url = server
+    payloads = write_mtarchive(root)
+    flaky = "/2022/08/01/mrms/ncep/MergedReflectivityQC/"
+    broken = "/2022/08/02/mrms/ncep/MergedReflectivityQC/"
+    Handler.failures[flaky], Handler.failures[broken] = 1, 10
+
+    start, stop = datetime(2022, 8, 1, 23, 50), datetime(2022, 8, 2, 0, 10)
+    with pytest.warns(UserWarning, match=broken):
+        files = extract.from_mtarchive(
+            start, stop, tmp_path, baseurl=f"{url}/", retries=1, backoff=0.01
+        )
+    # the day that could be listed is still fetched
+    assert files == [tmp_path / name for name in payloads if "08/01" in name]
+    assert Handler.requests.count(flaky) == 2
+    assert Handler.requests.count(broken) == 2
+
+
+def write_volumes(
+    root: Path, tmp_path: Path, unlisted: tuple[str, ...] = ()
+) -> dict[str, bytes]:
+    """
+    three two level grib volumes laid out like 3DRefl, the `unlisted` file
+    names are left off the listings; returns the payload of every file
+    """
+    base = root / "data" / "3DRefl"
+    base.mkdir(parents=True, exist_ok=True)
+    levels = {"00.50": 500, "01.00": 1000}
+    write_listing(base, [f"MergedReflectivityQC_{level}/" for level in levels])
+    payloads = {}
+    for level, height in levels.items():
+        directory = base / f"MergedReflectivityQC_{level}"
+        directory.mkdir(exist_ok=True)
+        names = []
+        for minute in (0, 2, 4):
+            name = f"MRMS_MergedReflectivityQC_{level}_20070323-12{minute:02}00.grib2"
+            write_grib(tmp_path / name, height, minute)
+            payloads[name] = (tmp_path / name).read_bytes()
+            (directory / f"{name}.gz").write_bytes(gzip.compress(payloads[name]))
+            if name not in unlisted:
+                names.append(f"{name}.gz")
+        write_listing(directory, names, latest="latest.grib2.gz")
+    return payloads
+
+
+def test_ncep_to_zarr(tmp_path: Path, server) -> None:
+    pytest.importorskip("pygrib")
+    pytest.importorskip("zarr")
+    root, url = server
+    write_volumes(root, tmp_path)
+    # the last volume is missing a level
+    broken = "/data/3DRefl/MergedReflectivityQC_01.00/"
+    broken += "MRMS_MergedReflectivityQC_01.00_20070323-120400.grib2.gz"
+    Handler.failures[broken] = 10
+
+    store = tmp_path / "mrms.zarr"
+    state = ListingState(tmp_path / "state.json")
+    kwargs = dict(
+        baseurl=f"{url}/data/3DRefl/",
+        max_seconds=10**10,
+        retries=0,
+        state=state,
+        queue_size=1,
+    )
+    written = extract.ncep_to_zarr(store, **kwargs)
+    assert written == [
+        np.datetime64("2007-03-23T12:00"),
+        np.datetime64("2007-03-23T12:02"),
+    ]
+    ds = mmmpy.read_mrms(store, engine="zarr").to_xarray()
+    assert ds.mrefl3d.dims == ("validTime", "heightAboveSea", "latitude", "longitude")
+    assert ds.mrefl3d.shape == (2, 2, 4, 5)
+    np.testing.assert_allclose(ds.heightAboveSea, [500, 1000])
+    expected = np.arange(20.0).reshape(4, 5) + 1000
+    np.testing.assert_allclose(ds.mrefl3d.isel(validTime=1, heightAboveSea=1), expected)
+
+    # once the level is back only the incomplete volume is fetched
+    Handler.failures.clear()
+    Handler.requests.clear()
+    written = extract.ncep_to_zarr(store, **kwargs)
+    assert written == [np.datetime64("2007-03-23T12:04")]
+    assert len([path for path in Handler.requests if path.endswith(".gz")]) == 2
+    ds = mmmpy.read_mrms(store, engine="zarr").to_xarray()
+    np.testing.assert_array_equal(
+        ds.validTime, np.datetime64("2007-03-23T12:00") + np.arange(3) * MINUTES_2
+    )
+
+
+def test_ncep_to_zarr_late_level(tmp_path: Path, server) -> None:
+    pytest.importorskip("pygrib")
+    pytest.importorskip("zarr")
+    root, url = server
+    # ncep has published only one level of the first volume so far
+    late = "MRMS_MergedReflectivityQC_01.00_20070323-120000.grib2"
+    write_volumes(root, tmp_path, unlisted=(late,))
+    store = tmp_path / "mrms.zarr"
+    kwargs = dict(
+        baseurl=f"{url}/data/3DRefl/",
+        max_seconds=10**10,
+        state=ListingState(tmp_path / "state.json"),
+    )
+    # nothing after the incomplete volume is written either, times stay ordered
+    assert extract.ncep_to_zarr(store, **kwargs) == []
+    assert not store.exists()
+
+    write_volumes(root, tmp_path)
+    written = extract.ncep_to_zarr(store, **kwargs)
+    assert written == [
+        np.datetime64("2007-03-23T12:00") + i * MINUTES_2 for i in range(3)
+    ]
+    ds = mmmpy.read_mrms(store, engine="zarr").to_xarray()
+    assert ds.mrefl3d.shape == (3, 2, 4, 5)
+
+
+def test_ncep_to_zarr_decode_error(
+    tmp_path: Path, server, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    pytest.importorskip("pygrib")
+    pytest.importorskip("zarr")
+    root, url = server
+    payloads = write_volumes(root, tmp_path)
+    truncated = payloads["MRMS_MergedReflectivityQC_00.50_20070323-120400.grib2"]
+    decode_level = getattr(extract, "__decode_level")
+
+    def decode(data: bytes):
+        if data == truncated:
+            raise OSError("truncated grib message")
+        return decode_level(data)
+
+    monkeypatch.setattr(extract, "__decode_level", decode)
+    written = extract.ncep_to_zarr(
+        tmp_path / "mrms.zarr", baseurl=f"{url}/data/3DRefl/", max_seconds=10**10
+    )
+    assert written == [
+        np.datetime64("2007-03-23T12:00"),
+        np.datetime64("2007-03-23T12:02"),
+    ]
+
+
+def test_listing_state_concurrent_save(tmp_path: Path) -> None:
+    path = tmp_path / "state.json"
+    states = [ListingState(path) for _ in range(4)]
+    for i, state in enumerate(states):
+        state.update(f"http://ncep/{i}/", {}, ["a.grib2.gz"])
+
+    errors = []
+
+    def save(state: ListingState) -> None:
+        try:
+            for _ in range(50):
+                state.save()
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(state,)) for state in states]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # every save replaced the file whole, and no temporary files are left
+    assert not errors
+    loaded = ListingState(path)
+    listings = [loaded.listing(f"http://ncep/{i}/") for i in range(4)]
+    assert listings.count(["a.grib2.gz"]) == 1
+    assert [file.name for file in tmp_path.iterdir()] == ["state.json"]
@@ -0,0 +1,60 @@
+import sys
+import subprocess
+
+import pytest
+
+import mmmpy
+
+# modules `import mmmpy` must not load, they are imported on first use
+HEAVY = ("numpy", "xarray", "pandas", "dask", "matplotlib", "netCDF4", "requests")
+# generous ceiling for the cumulative import time of mmmpy alone
+MAX_IMPORT_MICROSECONDS = 100_000
+
+
+def import_mmmpy(code: str = "") -> subprocess.CompletedProcess:
+    """import mmmpy in a fresh interpreter, -X importtime reports on stderr"""
+    args = [sys.executable, "-X", "importtime", "-c", f"import mmmpy\n{code}"]
+    return subprocess.run(args, capture_output=True, text=True, check=True)
+
+
+def test_import_is_lazy() -> None:
+    code = f"import sys\nprint(sorted(set({HEAVY!r}) & set(sys.modules)))"
+    assert import_mmmpy(code).stdout.strip() == "[]"
+
+
+def test_import_time() -> None:
+    timings = {}
+    for line in import_mmmpy().stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.removeprefix("import time:").split("|")
+            if cumulative.strip().isdigit():
+                timings[name.strip()] = int(cumulative)
+    assert timings["mmmpy"] < MAX_IMPORT_MICROSECONDS
+
+
+def test_lazy_attributes() -> None:
+    code = "print(mmmpy.read_mrms.__module__, mmmpy.extract.__name__)"
+    assert import_mmmpy(code).stdout.split() == ["mmmpy.io", "mmmpy.extract"]
+    assert "read_mrms" in dir(mmmpy)
+    with pytest.raises(AttributeError):
+        mmmpy.not_an_attribute
+
+
+def test_plotting_is_optional() -> None:
+    # reading, stitching and writing never need the plotting stack
+    code = "import sys, mmmpy._mmmpy\nprint('matplotlib' in sys.modules)"
+    assert import_mmmpy(code).stdout.split() == ["False"]
+    # and Basemap is left alone until a map is drawn
+    code = (
+        "import sys\nmmmpy.MosaicDisplay\nprint('mpl_toolkits.basemap' in sys.modules)"
+    )
+    assert import_mmmpy(code).stdout.split() == ["False"]
+
+
+def test_default_cmap() -> None:
+    np = pytest.importorskip("numpy")
+    cm = pytest.importorskip("mpl_toolkits.basemap.cm")
+    x = np.linspace(0, 1, 1001)
+    np.testing.assert_allclose(
+        mmmpy.display.DEFAULT_CMAP(x), cm.GMT_wysiwyg(x), atol=1e-6
+    )
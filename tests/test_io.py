@@ -0,0 +1,419 @@
+import os
+import sys
+import gzip
+import zipfile
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+import xarray as xr
+from netCDF4 import Dataset
+
+import mmmpy
+from mmmpy.backends import MRMSBinaryBackendEntrypoint
+from mmmpy.cache import IndexCache
+from mmmpy.scratch import ScratchSpace
+from mmmpy.sniff import sniff
+from test_binary import write_binary
+
+NZ, NLAT, NLON = 3, 4, 5
+# grib messages are encoded in a subprocess; loading the eccodes bindings next
+# to the copy bundled with pygrib can corrupt the heap at interpreter exit
+GRIB_SCRIPT = """
+import sys
+import eccodes
+import numpy as np
+
+path, level, minute = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+gid = eccodes.codes_grib_new_from_samples("regular_ll_sfc_grib2")
+keys = dict(
+    typeOfFirstFixedSurface=102,
+    scaleFactorOfFirstFixedSurface=0,
+    scaledValueOfFirstFixedSurface=level,
+    minute=minute,
+    Ni=5,
+    Nj=4,
+    latitudeOfFirstGridPointInDegrees=55.0,
+    longitudeOfFirstGridPointInDegrees=230.0,
+    latitudeOfLastGridPointInDegrees=54.97,
+    longitudeOfLastGridPointInDegrees=230.04,
+    iDirectionIncrementInDegrees=0.01,
+    jDirectionIncrementInDegrees=0.01,
+)
+for key, value in keys.items():
+    eccodes.codes_set(gid, key, value)
+eccodes.codes_set_values(gid, np.arange(20.0) + level)
+with open(path, "wb") as f:
+    eccodes.codes_write(gid, f)
+"""
+
+
+def write_grib(path: Path, level: int, minute: int = 0) -> None:
+    """write a single level 4x5 grib2 message at `level` meters above sea"""
+    args = [sys.executable, "-c", GRIB_SCRIPT, str(path), str(level), str(minute)]
+    subprocess.run(args, check=True)
+
+
+def write_netcdf(path: Path, version: int, epoch: int = 1370043300) -> np.ndarray:
+    """write a small synthetic v1 or v2 MRMS netcdf mosaic, returns dBZ"""
+    dbz = np.arange(NZ * NLAT * NLON, dtype="f4").reshape(NZ, NLAT, NLON) / 2
+    with Dataset(path, "w") as ds:
+        ds.createDimension("Height", NZ)
+        ds.createDimension("Lat", NLAT)
+        ds.createDimension("Lon", NLON)
+        if version == 1:
+            ds.Latitude = 40.0
+            ds.Longitude = -110.0
+            ds.LatGridSpacing = 0.01
+            ds.LonGridSpacing = 0.01
+            ds.Time = epoch
+            ds.createVariable("Height", "i4", ("Height",))[:] = [500, 750, 1000]
+            ref = ds.createVariable("mrefl_mosaic", "i2", ("Height", "Lat", "Lon"))
+            ref.Scale = 10
+            ref[:] = dbz * 10
+        else:
+            ds.LatGridSpacing = 0.01
+            ds.LonGridSpacing = 0.01
+            ds.createDimension("time", 1)
+            ds.createVariable("Ht", "f4", ("Height",))[:] = [500, 750, 1000]
+            ds.createVariable("Lat", "f4", ("Lat",))[:] = 40 - 0.01 * np.arange(NLAT)
+            ds.createVariable("Lon", "f4", ("Lon",))[:] = -110 + 0.01 * np.arange(NLON)
+            ds.createVariable("time", "f8", ("time",))[:] = [epoch]
+            ds.createVariable("MREFL", "f4", ("Height", "Lat", "Lon"))[:] = dbz
+    return dbz
+
+
+@pytest.mark.parametrize("version", [1, 2])
+def test_read_mrms_netcdf4(tmp_path: Path, version: int) -> None:
+    files = [tmp_path / f"mosaic3d_tile6_{i}.netcdf" for i in range(2)]
+    for i, file in enumerate(files):
+        dbz = write_netcdf(file, version, epoch=1370043300 + 120 * i)
+
+    ds = mmmpy.read_mrms(files, engine="netcdf4").to_xarray()
+    assert ds.mrefl3d.dims == ("validTime", "heightAboveSea", "latitude", "longitude")
+    # the data is dask backed until it is computed
+    assert ds.mrefl3d.chunks is not None
+    assert ds.validTime.size == 2
+    np.testing.assert_allclose(ds.latitude, 40 - 0.01 * np.arange(NLAT), rtol=1e-6)
+    np.testing.assert_allclose(ds.heightAboveSea, [500, 750, 1000])
+    np.testing.assert_allclose(ds.mrefl3d.isel(validTime=1).values, dbz)
+
+
+@pytest.mark.parametrize("version", [1, 2])
+def test_read_mrms_netcdf4_plane_chunks(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, version: int
+) -> None:
+    reads = []
+    wrapper = xr.backends.netCDF4_.NetCDF4ArrayWrapper
+    getitem = wrapper._getitem
+
+    def read(self, key):
+        reads.append(key)
+        return getitem(self, key)
+
+    monkeypatch.setattr(wrapper, "_getitem", read)
+    dbz = write_netcdf(tmp_path / "v.netcdf", version)
+
+    ds = mmmpy.read_mrms(tmp_path / "v.netcdf", engine="netcdf4").to_xarray()
+    assert ds.mrefl3d.chunks[1] == (1,) * NZ
+    reads.clear()
+    np.testing.assert_allclose(ds.mrefl3d.isel(validTime=0, heightAboveSea=1), dbz[1])
+    # a single height plane is read from the file
+    (key,) = [key for key in reads if len(key) == 3]
+    assert np.arange(NZ)[key[0]].tolist() == [1]
+
+
+def test_sniff(tmp_path: Path) -> None:
+    write_binary(tmp_path / "tile1.dat")
+    write_binary(tmp_path / "tile1.dat.gz")
+    write_netcdf(tmp_path / "v2.netcdf", version=2)
+    (tmp_path / "level.grib2").write_bytes(b"GRIB" + bytes(96))
+    with gzip.open(tmp_path / "level.grib2.gz", "wb") as f:
+        f.write(b"GRIB" + bytes(96))
+    with zipfile.ZipFile(tmp_path / "levels.zip", "w") as zref:
+        zref.write(tmp_path / "level.grib2.gz", "level.grib2.gz")
+    (tmp_path / "notes.txt").write_text("not an mrms file")
+
+    assert sniff(tmp_path / "tile1.dat") == ("binary", None)
+    assert sniff(tmp_path / "tile1.dat.gz") == ("binary", "gzip")
+    assert sniff(tmp_path / "v2.netcdf") == ("netcdf4", None)
+    assert sniff(tmp_path / "level.grib2") == ("cfgrib", None)
+    assert sniff(tmp_path / "level.grib2.gz") == ("cfgrib", "gzip")
+    assert sniff(tmp_path / "levels.zip") == ("cfgrib", "zip")
+    assert sniff(tmp_path / "notes.txt") == (None, None)
+
+
+def test_read_mrms_infers_engine(tmp_path: Path) -> None:
+    # names carry no hint of the format
+    write_binary(tmp_path / "a")
+    write_binary(tmp_path / "b", minute=2)
+    ds = mmmpy.read_mrms([tmp_path / "a", tmp_path / "b"]).to_xarray()
+    assert ds.validTime.size == 2
+
+    dbz = write_netcdf(tmp_path / "v1", version=1)
+    with zipfile.ZipFile(tmp_path / "archive", "w") as zref:
+        zref.write(tmp_path / "v1", "mosaic3d_tile6.netcdf")
+    ds = mmmpy.read_mrms(str(tmp_path / "archive")).to_xarray()
+    np.testing.assert_allclose(ds.mrefl3d.isel(validTime=0).values, dbz)
+
+    with pytest.raises(mmmpy.io.EngineResolutionError):
+        mmmpy.read_mrms([tmp_path / "a", tmp_path / "v1"])
+
+
+def test_read_mrms_index_cache(tmp_path: Path) -> None:
+    data = tmp_path / "data"
+    data.mkdir()
+    files = [data / f"MergedRefl_{level:05}.grib2" for level in (500, 750, 1000)]
+    for level, file in zip((500, 750, 1000), files):
+        write_grib(file, level)
+
+    cache = IndexCache(tmp_path / "cache")
+    ds = mmmpy.read_mrms(files, engine="cfgrib", index_cache=cache).to_xarray()
+    np.testing.assert_allclose(ds.heightAboveSea, [500, 750, 1000])
+    assert ds.t.chunks == ((1, 1, 1), (4,), (5,))
+    # no index files are written next to the data
+    assert not list(data.glob("*.idx"))
+    indexes = sorted(cache.directory.rglob("*.idx"))
+    assert len(indexes) == 3
+    assert indexes[0].name.startswith(files[0].name)
+
+    before = [index.stat() for index in indexes]
+    contents = [index.read_bytes() for index in indexes]
+    mmmpy.read_mrms(files, engine="cfgrib", index_cache=cache)
+    # reused and touched rather than rewritten
+    assert sorted(cache.directory.rglob("*.idx")) == indexes
+    for index, stat, content in zip(indexes, before, contents):
+        assert index.stat().st_ino == stat.st_ino
+        assert index.read_bytes() == content
+        assert index.stat().st_mtime_ns >= stat.st_mtime_ns
+
+
+def test_index_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache = IndexCache(tmp_path, max_bytes=250)
+    for i, name in enumerate("abc"):
+        index = tmp_path / "data" / f"{name}.grib2.12345.idx"
+        index.parent.mkdir(exist_ok=True)
+        index.write_bytes(bytes(100))
+        os.utime(index, (i, i))
+    cache.touch([Path("/data/a.grib2")])
+
+    cache.evict()
+    remaining = sorted(index.name[0] for index in tmp_path.rglob("*.idx"))
+    assert remaining == ["a", "c"]
+
+
+def test_unzip_in_memory(tmp_path: Path) -> None:
+    data3d = write_binary(tmp_path / "tile1.dat.gz")
+    dbz = write_netcdf(tmp_path / "v2.netcdf", version=2)
+    with zipfile.ZipFile(tmp_path / "archive.zip", "w") as zref:
+        zref.write(tmp_path / "tile1.dat.gz", "tile1.dat.gz")
+        zref.write(tmp_path / "v2.netcdf", "v2.netcdf")
+
+    scratch = tmp_path / "scratch"
+    with mmmpy.unzip(tmp_path / "archive.zip", scratch, in_memory=True) as members:
+        binary, netcdf = sorted(members, key=lambda member: member.name)
+        assert not scratch.exists()
+    # gzipped members are decompressed while streaming out of the archive
+    assert binary.name == "tile1.dat"
+    ds = xr.open_dataset(binary, engine=MRMSBinaryBackendEntrypoint)
+    np.testing.assert_allclose(ds.mosaicked_refl1.values, data3d[:, ::-1] / 10)
+    assert netcdf.getvalue() == (tmp_path / "v2.netcdf").read_bytes()
+
+    with mmmpy.unzip(tmp_path / "archive.zip", scratch) as members:
+        assert sorted(file.name for file in members) == ["tile1.dat", "v2.netcdf"]
+        assert sorted(file.name for file in scratch.iterdir()) == [
+            "tile1.dat",
+            "v2.netcdf",
+        ]
+    assert not scratch.exists()
+
+    with zipfile.ZipFile(tmp_path / "netcdf.zip", "w") as zref:
+        zref.write(tmp_path / "v2.netcdf", "v2.netcdf")
+    ds = mmmpy.read_mrms(tmp_path / "netcdf.zip").to_xarray()
+    np.testing.assert_allclose(ds.mrefl3d.isel(validTime=0).values, dbz)
+
+
+def test_unzip_concurrent_scratch(tmp_path: Path) -> None:
+    for i in range(4):
+        write_binary(tmp_path / f"tile{i}.dat.gz", minute=i)
+    archives = [tmp_path / f"tile{i}.dat.gz" for i in range(4)]
+    size = mmmpy.io.unpacked_size(archives[0])
+    assert size == len(gzip.decompress(archives[0].read_bytes()))
+
+    # room for two archives at a time
+    scratch = ScratchSpace(tmp_path / "scratch", max_bytes=2 * size)
+    peak = []
+
+    def unpack(file: Path) -> bytes:
+        with mmmpy.unzip(file, scratch=scratch) as members:
+            (member,) = members
+            peak.append(scratch.reserved)
+            return member.read_bytes()
+
+    with ThreadPoolExecutor(4) as pool:
+        unpacked = list(pool.map(unpack, archives))
+    assert unpacked == [gzip.decompress(file.read_bytes()) for file in archives]
+    assert max(peak) <= 2 * size
+    assert scratch.reserved == 0
+    assert not list((tmp_path / "scratch").iterdir())
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_unzip_members_concurrently(tmp_path: Path, workers: int) -> None:
+    expected = {}
+    with zipfile.ZipFile(tmp_path / "levels.zip", "w") as zref:
+        for level in range(8):
+            name = f"MergedReflectivityQC_{level:02}.grib2"
+            expected[name] = os.urandom(1024) * level
+            zref.writestr(name + ".gz", gzip.compress(expected[name]))
+
+    with mmmpy.unzip(tmp_path / "levels.zip", workers=workers) as members:
+        unpacked = {file.name: file.read_bytes() for file in members}
+    assert unpacked == expected
+
+    archive = tmp_path / "levels.zip"
+    with mmmpy.unzip(archive, in_memory=True, workers=workers) as members:
+        assert {buffer.name: buffer.getvalue() for buffer in members} == expected
+
+
+def test_read_points(tmp_path: Path) -> None:
+    # one raw and one gzipped file, both are read in place
+    binary = [tmp_path / "tile1.dat", tmp_path / "tile1_2.dat.gz"]
+    for i, file in enumerate(binary):
+        write_binary(file, minute=2 * i)
+    ds = xr.concat(
+        [xr.open_dataset(file, engine=MRMSBinaryBackendEntrypoint) for file in binary],
+        dim="validTime",
+    )
+    lat, lon = ds.latitude.values[[0, 2, 2]], ds.longitude.values[[1, 0, 3]]
+
+    points = mmmpy.read_points(binary, lat, lon)
+    assert points.dims == ("validTime", "point", "heightAboveSea")
+    expected = ds.mosaicked_refl1.sel(
+        latitude=xr.DataArray(lat, dims="point"),
+        longitude=xr.DataArray(lon, dims="point"),
+    ).transpose("validTime", "point", "heightAboveSea")
+    np.testing.assert_allclose(points.values, expected.values)
+    np.testing.assert_array_equal(points.validTime, ds.validTime)
+
+    file = tmp_path / "v2.netcdf"
+    dbz = write_netcdf(file, version=2)
+    lat = 40 - 0.01 * np.array([1, 3])
+    lon = -110 + 0.01 * np.array([4, 0])
+    points = mmmpy.read_points(file, lat, lon, workers=1)
+    np.testing.assert_allclose(points.isel(validTime=0), dbz[:, [1, 3], [4, 0]].T)
+
+    # outside the grid
+    points = mmmpy.read_points(file, [10.0], [0.0])
+    assert points.shape == (1, 1, NZ) and np.isnan(points).all()
+
+    # a zarr store holds every validTime
+    pytest.importorskip("zarr")
+    store = tmp_path / "mrms.zarr"
+    ds.to_zarr(store)
+    lat, lon = ds.latitude.values[[3, 1]], ds.longitude.values[[2, 2]]
+    points = mmmpy.read_points(store, lat, lon)
+    expected = ds.mosaicked_refl1.sel(
+        latitude=xr.DataArray(lat, dims="point"),
+        longitude=xr.DataArray(lon, dims="point"),
+    ).transpose("validTime", "point", "heightAboveSea")
+    np.testing.assert_allclose(points.values, expected.values)
+    np.testing.assert_array_equal(points.validTime, ds.validTime)
+
+
+def test_read_mrms_zip_keeps_order(tmp_path: Path) -> None:
+    with zipfile.ZipFile(tmp_path / "levels.zip", "w") as zref:
+        for level in range(500, 2500, 250):
+            write_grib(tmp_path / "level.grib2", level)
+            zref.write(tmp_path / "level.grib2", f"MergedRefl_{level:05}.grib2")
+    with zipfile.ZipFile(tmp_path / "times.zip", "w") as zref:
+        for minute in range(8):
+            write_binary(tmp_path / "tile1.dat.gz", minute=minute)
+            zref.write(tmp_path / "tile1.dat.gz", f"tile1_{minute:02}.dat.gz")
+
+    # members finish decompressing in any order, they are read in archive order
+    ds = mmmpy.read_mrms(tmp_path / "levels.zip").to_xarray()
+    np.testing.assert_array_equal(ds.heightAboveSea, np.arange(500, 2500, 250))
+    ds = mmmpy.read_mrms(tmp_path / "times.zip").to_xarray()
+    assert ds.validTime.size == 8
+    assert (ds.validTime.diff("validTime") > np.timedelta64(0)).all()
+
+
+def test_read_mrms_archives_over_scratch_budget(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    archives = [tmp_path / f"levels{i}.zip" for i in range(2)]
+    for i, archive in enumerate(archives):
+        level = 500 + 250 * i
+        write_grib(tmp_path / "level.grib2", level)
+        with zipfile.ZipFile(archive, "w") as zref:
+            zref.write(tmp_path / "level.grib2", f"MergedRefl_{level:05}.grib2")
+    # both archives are held unpacked at once, together over the budget
+    monkeypatch.setattr(mmmpy.scratch.SCRATCH, "max_bytes", 1)
+    ds = mmmpy.read_mrms(archives).to_xarray()
+    np.testing.assert_allclose(ds.heightAboveSea, [500, 750])
+    assert mmmpy.scratch.SCRATCH.reserved == 0
+
+    # other threads still wait for the budget
+    scratch = ScratchSpace(tmp_path / "scratch", max_bytes=10)
+
+    def reserve() -> None:
+        with scratch.reserve(1):
+            pass
+
+    with scratch.reserve(8), scratch.reserve(8):
+        waiter = threading.Thread(target=reserve)
+        waiter.start()
+        waiter.join(0.2)
+        assert waiter.is_alive()
+    waiter.join(1)
+    assert not waiter.is_alive() and scratch.reserved == 0
+
+
+def test_mosaic_tile_skips_zip(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    write_binary(tmp_path / "tile1.dat.gz")
+    with zipfile.ZipFile(tmp_path / "tile1.zip", "w") as zref:
+        zref.write(tmp_path / "tile1.dat.gz", "tile1.dat.gz")
+    # sniffed as binary, but only unzip can read it
+    tile = mmmpy.MosaicTile(str(tmp_path / "tile1.zip"))
+    assert not hasattr(tile, "mrefl3d")
+    assert "Unknown file format" in capsys.readouterr().out
+
+
+def test_read_points_reads_only_rows(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    reads = []
+
+    def spy(method):
+        def read(self, key):
+            reads.append(key)
+            return method(self, key)
+
+        return read
+
+    wrapper = xr.backends.netCDF4_.NetCDF4ArrayWrapper
+    monkeypatch.setattr(wrapper, "_getitem", spy(wrapper._getitem))
+    backend = mmmpy.backends.MRMSBinaryBackendArray
+    monkeypatch.setattr(
+        backend, "_raw_indexing_method", spy(backend._raw_indexing_method)
+    )
+
+    write_netcdf(tmp_path / "v2.netcdf", version=2)
+    write_binary(tmp_path / "tile1.dat")
+    # binary files store their rows south to north
+    stored_rows = {"v2.netcdf": [1, 3], "tile1.dat": [NLAT - 4, NLAT - 2]}
+    for file in (tmp_path / "v2.netcdf", tmp_path / "tile1.dat"):
+        ds = mmmpy.read_mrms(file).to_xarray()
+        lat = ds.latitude.values[[1, 3, 3]]
+        lon = ds.longitude.values[[4, 0, 2]]
+        reads.clear()
+        mmmpy.read_points(file, lat, lon)
+        # a hyperslab of every level of each row that holds a point, besides
+        # the 1D coordinates
+        volume = [key for key in reads if len(key) == 3]
+        rows = sorted(int(np.arange(NLAT)[key[1]]) for key in volume)
+        assert len(volume) == 2 and rows == stored_rows[file.name]
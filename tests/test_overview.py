@@ -0,0 +1,74 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import mmmpy
+from mmmpy.overview import max_pool, mean_pool, overview_factor
+from test_binary import write_binary
+
+
+def test_max_pool() -> None:
+    data = np.arange(20.0).reshape(4, 5)
+    data[0, 0] = np.nan
+    # the last column is a block of its own
+    np.testing.assert_array_equal(max_pool(data, 2), [[6, 8, 9], [16, 18, 19]])
+    np.testing.assert_array_equal(mean_pool(data[1:], 2)[:, -1], [11.5, 19])
+
+    masked = np.ma.masked_array(data, mask=data >= 12)
+    pooled = max_pool(masked, 2)
+    np.testing.assert_array_equal(pooled.mask, [[0, 0, 0], [0, 1, 1]])
+    assert pooled[1, 0] == 11
+    assert max_pool(data, 1) is data
+
+
+def test_overview_factor() -> None:
+    assert overview_factor((3500, 7000), (400, 800)) == 8
+    assert overview_factor((3500, 7000), (3500, 800)) == 1
+    assert overview_factor((100, 100), (400, 800)) == 1
+
+
+def test_tile_overview(tmp_path: Path) -> None:
+    data3d = write_binary(tmp_path / "tile1.dat.gz")
+    tile = mmmpy.MosaicTile(str(tmp_path / "tile1.dat.gz"))
+    overview = tile.get_overview(2)
+    assert tile.get_overview(2) is overview
+    assert tile.get_overview(1) is tile
+    assert (overview.nlat, overview.nlon) == (2, 3)
+    assert overview.mrefl3d.shape == (3, 2, 3)
+    # rows of the tile run north to south
+    assert overview.mrefl3d[1, 0, 0] == tile.mrefl3d[1, :2, :2].max()
+    np.testing.assert_allclose(overview.Latitude[:, 0], [54.995, 54.975])
+    np.testing.assert_allclose(
+        overview.mrefl3d.max(axis=(1, 2)), data3d.max(axis=(1, 2)) / 10
+    )
+    tile.subsection(latrange=[54.97, 54.99])
+    assert tile.get_overview(2) is not overview
+
+
+def test_plot_horiz_overview(tmp_path: Path) -> None:
+    pytest.importorskip("mpl_toolkits.basemap")
+    from matplotlib import pyplot as plt
+
+    write_binary(tmp_path / "tile1.dat.gz")
+    tile = mmmpy.MosaicTile(str(tmp_path / "tile1.dat.gz"))
+    plt.switch_backend("agg")
+    # a map a couple of pixels across needs no more than half the grid
+    fig = plt.figure(figsize=(0.5, 0.5), dpi=4)
+    display = mmmpy.MosaicDisplay(tile)
+    ranges = dict(latrange=[54.965, 55.005], lonrange=[-130.005, -129.955])
+    display.plot_horiz(**ranges, raster=True, resolution="c", colorbar_flag=False)
+    plt.close(fig)
+    assert tile._overviews
+
+
+def test_dataset_overview(tmp_path: Path) -> None:
+    write_binary(tmp_path / "tile1.dat.gz")
+    mrms = mmmpy.read_mrms(tmp_path / "tile1.dat.gz", engine="binary")
+    overview = mrms.plot.overview((2, 2))
+    assert mrms.overview(2) is overview
+    values = mrms.to_xarray().mosaicked_refl1.values
+    pooled = overview.to_xarray().mosaicked_refl1
+    assert pooled.shape[-2:] == (2, 3)
+    np.testing.assert_allclose(pooled.values, max_pool(values, 2))
+    assert mrms.plot.overview((4, 5)) is mrms
@@ -0,0 +1,107 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import mmmpy
+from mmmpy._mmmpy import compute_grid_attributes
+from mmmpy.regions import Regions, rasterize, row_areas
+from mmmpy.sample import Grid
+from test_binary import write_binary
+
+
+def box(south: float, west: float, north: float, east: float) -> np.ndarray:
+    """the lon, lat vertices of a box"""
+    return np.array([[west, south], [east, south], [east, north], [west, north]])
+
+
+def test_rasterize() -> None:
+    # cell centers at whole degrees
+    grid = Grid(10.0, -100.0, -1.0, 1.0, 10, 10)
+    hole = box(3.5, -96.5, 5.5, -94.5)
+    polygons = [
+        box(0.5, -99.5, 3.5, -96.5),
+        [box(1.5, -97.5, 7.5, -91.5), hole],
+        {"type": "Polygon", "coordinates": [box(7.5, -92.5, 17.5, -82.5).tolist()]},
+    ]
+    labels = rasterize(polygons, grid)
+    assert labels.dtype == np.uint8
+    rows, cols = np.nonzero(labels == 1)
+    assert set(10 - rows) == {1, 2, 3} and set(cols) == {1, 2, 3}
+    # the hole is cut out, the third square is clipped to the grid
+    assert (labels == 2).sum() == 36 - 4
+    assert labels[10 - 4, 4] == labels[10 - 5, 5] == 0
+    assert (labels == 3).sum() == 3 * 2
+
+    np.testing.assert_allclose(
+        row_areas(grid)[:, None] * np.ones(grid.nlon),
+        compute_grid_attributes(
+            np.zeros((1, 10, 10)),
+            *np.meshgrid(10.0 - np.arange(10), -100.0 + np.arange(10), indexing="ij"),
+            np.ones(1),
+        )[1],
+    )
+
+
+def test_region_statistics(tmp_path: Path) -> None:
+    write_binary(tmp_path / "tile1.dat.gz")
+    tile = mmmpy.MosaicTile(str(tmp_path / "tile1.dat.gz"))
+    tile.mrefl3d = np.random.default_rng(0).uniform(0, 60, tile.mrefl3d.shape)
+    # the two western and three eastern columns of the 4x5 tile
+    west = box(54.965, -130.005, 55.005, -129.985)
+    east = box(54.965, -129.985, 55.005, -129.955)
+    regions = Regions([west, east, box(0, 0, 1, 1)], names=["w", "e", "away"])
+
+    ds = regions.statistics(tile, threshold=30)
+    assert regions.mask(Grid.from_tile(tile)) is regions.mask(Grid.from_tile(tile))
+    vol, area = compute_grid_attributes(
+        tile.mrefl3d, tile.Latitude, tile.Longitude, tile.Height
+    )
+    comp = tile.mrefl3d.max(axis=0)
+    echo = comp >= 30
+    for name, cols in [("w", slice(0, 2)), ("e", slice(2, 5))]:
+        stats = ds.sel(region=name)
+        assert stats.area == pytest.approx(area[:, cols].sum())
+        assert stats.max_dbz == pytest.approx(comp[:, cols].max())
+        assert stats.echo_area == pytest.approx(area[:, cols][echo[:, cols]].sum())
+        expected = (comp * area)[:, cols][echo[:, cols]].sum() / stats.echo_area
+        assert stats.mean_dbz == pytest.approx(expected)
+        exceed = tile.mrefl3d[:, :, cols] >= 30
+        assert stats.echo_volume == pytest.approx(vol[:, :, cols][exceed].sum())
+    away = ds.sel(region="away")
+    assert away.area == 0 and np.isnan(away.max_dbz) and np.isnan(away.mean_dbz)
+
+    frames = regions.statistics([tile, tile])
+    assert frames.max_dbz.dims == ("time", "region")
+    assert frames.time.size == 2
+
+
+def test_get_exceedance(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    write_binary(tmp_path / "tile1.dat.gz")
+    tile = mmmpy.MosaicTile(str(tmp_path / "tile1.dat.gz"))
+    tile.mrefl3d = np.random.default_rng(0).uniform(0, 60, tile.mrefl3d.shape)
+    tile.mrefl3d[0, 0, 0] = np.nan
+    vol, area = compute_grid_attributes(
+        tile.mrefl3d, tile.Latitude, tile.Longitude, tile.Height
+    )
+    comp = np.nanmax(tile.mrefl3d, axis=0)
+
+    thresholds = [40.0, 10.0, 30.0, 0.0, 70.0]
+    # a row at a time
+    result = mmmpy.regions.exceedance(
+        tile.mrefl3d, Grid.from_tile(tile), tile.Height, thresholds, block_size=1
+    )
+    assert result.area.shape == result.volume.shape == (5,)
+    for threshold, exceeded, volume in zip(thresholds, result.area, result.volume):
+        assert exceeded == pytest.approx(area[comp >= threshold].sum(), abs=1e-9)
+        assert volume == pytest.approx(vol[tile.mrefl3d >= threshold].sum(), abs=1e-9)
+
+    whole = tile.get_exceedance(thresholds)
+    np.testing.assert_allclose(whole.area, result.area)
+    np.testing.assert_allclose(whole.volume, result.volume)
+
+    # many thresholds are binned by searchsorted instead
+    monkeypatch.setattr(mmmpy.regions, "SEARCH_THRESHOLDS", 0)
+    searched = tile.get_exceedance(thresholds)
+    np.testing.assert_allclose(searched.area, result.area)
+    np.testing.assert_allclose(searched.volume, result.volume)
@@ -0,0 +1,115 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import mmmpy
+from mmmpy.sample import Grid, great_circle
+from test_binary import write_binary
+
+
+@pytest.fixture
+def tile(tmp_path: Path) -> mmmpy.MosaicTile:
+    """a 4x5 tile whose values are linear in height, latitude and longitude"""
+    write_binary(tmp_path / "tile1.dat.gz")
+    tile = mmmpy.MosaicTile(str(tmp_path / "tile1.dat.gz"))
+    tile.mrefl3d = tile.Height[:, None, None] + 200 * tile.Latitude + tile.Longitude
+    return tile
+
+
+def test_great_circle() -> None:
+    lat, lon, distance = great_circle((30.0, -100.0), (31.0, -100.0), 11)
+    np.testing.assert_allclose(lat, np.linspace(30, 31, 11))
+    np.testing.assert_allclose(lon, -100)
+    assert distance[-1] == pytest.approx(111.19, abs=0.01)
+
+    lat, lon, _ = great_circle((40.0, -120.0), (40.0, -80.0), 3)
+    # the great circle bows toward the pole
+    assert lat[1] > 40 and lon[1] == pytest.approx(-100)
+
+
+def test_get_cross_section(tile: mmmpy.MosaicTile) -> None:
+    start, end = (54.995, -129.995), (54.975, -129.965)
+    section = tile.get_cross_section(start, end, npoints=7)
+    assert section.values.shape == (3, 7)
+    np.testing.assert_allclose(section.height, tile.Height)
+    expected = tile.Height[:, None] + 200 * section.latitude + section.longitude
+    np.testing.assert_allclose(section.values, expected, atol=1e-6)
+    assert section.distance[0] == 0 and np.all(np.diff(section.distance) > 0)
+
+    section = tile.get_cross_section(start, end, npoints=7, method="nearest")
+    row = np.rint((55.0 - section.latitude) / 0.01).astype(int)
+    col = np.rint((section.longitude + 130.0) / 0.01).astype(int)
+    np.testing.assert_allclose(section.values, tile.mrefl3d[:, row, col])
+
+    # about a sample per gridpoint, NaN once the path leaves the grid
+    section = tile.get_cross_section((54.99, -129.99), (54.99, -129.9))
+    assert section.values.shape == (3, 10)
+    assert np.isnan(section.values[:, -1]).all()
+    assert not np.isnan(section.values[:, :3]).any()
+
+
+def test_grid_from_coords() -> None:
+    grid = Grid.from_coords(20 + 0.01 * np.arange(4), 230 + 0.01 * np.arange(5))
+    assert grid.shape == (4, 5)
+    # longitudes east of the origin match modulo 360
+    row, col = grid.fractional_index(20.015, -129.98)
+    assert (row, col) == pytest.approx((1.5, 2.0))
+
+
+@pytest.mark.parametrize("from_files", [True, False])
+def test_cross_sections(tmp_path: Path, from_files: bool) -> None:
+    files = [tmp_path / f"tile1.{minute:02}.dat.gz" for minute in range(3)]
+    for minute, file in enumerate(files):
+        write_binary(file, minute)
+    tiles = [mmmpy.MosaicTile(str(file)) for file in files]
+    lines = [
+        ((54.995, -129.995), (54.975, -129.965)),
+        ((54.97, -129.99), (55.0, -129.99)),
+    ]
+
+    mosaics = files if from_files else tiles
+    sections = mmmpy.sample.cross_sections(mosaics, lines, workers=2)
+    # the longest line crosses three gridpoints
+    assert sections.values.shape == (3, 2, 3, 4)
+    assert sections.distance.shape == sections.latitude.shape == (2, 4)
+    np.testing.assert_allclose(np.diff(sections.time), 60)
+    for t, tile in enumerate(tiles):
+        for i, (start, end) in enumerate(lines):
+            section = tile.get_cross_section(start, end, npoints=4)
+            np.testing.assert_allclose(sections.values[t, i], section.values)
+            np.testing.assert_allclose(sections.distance[i], section.distance)
+
+
+def test_sample_points(tile: mmmpy.MosaicTile) -> None:
+    lat = np.array([54.99, 54.975, 54.0])
+    lon = np.array([-129.99, -129.965, -129.99])
+    nearest = tile.sample_points(lat, lon)
+    assert nearest.shape == (3, 3)
+    np.testing.assert_allclose(nearest[:, 0], tile.mrefl3d[:, 1, 1])
+    assert np.isnan(nearest[:, 2]).all()
+    bilinear = tile.sample_points(lat[:2], lon[:2], method="bilinear")
+    np.testing.assert_allclose(
+        bilinear, tile.Height[:, None] + 200 * lat[:2] + lon[:2], atol=1e-6
+    )
+    # the index of a repeated point list is reused
+    weights = mmmpy.sample.point_weights(Grid.from_tile(tile), lat, lon)
+    assert mmmpy.sample.point_weights(Grid.from_tile(tile), list(lat), lon) is weights
+
+
+def test_dataset_sample_points(tmp_path: Path) -> None:
+    files = [tmp_path / f"tile1.{minute:02}.dat.gz" for minute in (0, 2)]
+    for minute, file in zip((0, 2), files):
+        data3d = write_binary(file, minute)
+    mrms = mmmpy.read_mrms(files, engine="binary")
+    lat, lon = np.array([54.99, 54.97]), np.array([-129.99, -129.96])
+    sampled = mrms.sample_points(lat, lon).compute()
+    values = sampled.mosaicked_refl1
+    assert values.dims == ("validTime", "point", "heightAboveSea")
+    np.testing.assert_allclose(values.latitude, lat)
+    # storage rows run south to north from 54.97
+    expected = data3d[:, [2, 0], [1, 4]] / 10
+    np.testing.assert_allclose(values.isel(validTime=1), expected.T)
+    # laid out like the columns read_points reads
+    points = mmmpy.read_points(files, lat, lon)
+    np.testing.assert_allclose(values, points)